@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+# Benchmark AES-128 CBC decryption of HLS-fragment-sized payloads with the
+# table-driven aes_cbc_decrypt_bytes against the block by block decryption
+# on int lists it replaced.
+
+from __future__ import unicode_literals
+
+import optparse
+import os
+import sys
+import timeit
+
+# Import youtube_dl
+ROOT_DIR = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, ROOT_DIR)
+from youtube_dl.aes import (
+    aes_cbc_decrypt_bytes,
+    aes_decrypt,
+    key_expansion,
+    xor,
+)
+from youtube_dl.utils import bytes_to_intlist, intlist_to_bytes
+
+
+def reference_cbc_decrypt(data, key, iv):
+    expanded_key = key_expansion(key)
+    decrypted_data = []
+    previous_cipher_block = iv
+    for i in range(0, len(data), 16):
+        block = data[i:i + 16]
+        decrypted_data += xor(aes_decrypt(block, expanded_key), previous_cipher_block)
+        previous_cipher_block = block
+    return decrypted_data
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [OPTIONS]')
+    parser.add_option(
+        '--size', type=int, default=64,
+        help='Size of the decrypted data in KiB (default is %default)')
+    parser.add_option(
+        '--rounds', type=int, default=3,
+        help='Number of times the data is decrypted (default is %default)')
+    options, args = parser.parse_args()
+
+    size = options.size * 1024
+    data = bytes(bytearray(i * 7 % 256 for i in range(size)))
+    key = iv = bytes(bytearray(range(16)))
+    int_data, int_key, int_iv = bytes_to_intlist(data), bytes_to_intlist(key), bytes_to_intlist(iv)
+    assert aes_cbc_decrypt_bytes(data, key, iv) == intlist_to_bytes(
+        reference_cbc_decrypt(int_data, int_key, int_iv))
+
+    for label, run in (
+            ('int lists', lambda: reference_cbc_decrypt(int_data, int_key, int_iv)),
+            ('table-driven', lambda: aes_cbc_decrypt_bytes(data, key, iv))):
+        elapsed = min(timeit.repeat(run, number=1, repeat=options.rounds))
+        print('%-13s %d KiB %8.2fms (%.2f MiB/s)' % (
+            label, options.size, elapsed * 1000, size / elapsed / 1024 / 1024))
+
+
+if __name__ == '__main__':
+    main()
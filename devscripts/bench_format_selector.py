@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+# Benchmark format selection on synthetic videos with many formats, as done
+# by YoutubeDL.process_video_result for every video of a playlist.
+
+from __future__ import unicode_literals
+
+import optparse
+import os
+import sys
+import timeit
+
+# Import youtube_dl
+ROOT_DIR = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, ROOT_DIR)
+from youtube_dl import YoutubeDL
+
+
+SPECS = (
+    'best',
+    'bestvideo+bestaudio/best',
+    'bestvideo[height<=1080][vcodec^=avc1]+bestaudio[ext=m4a]/best[height<=1080]',
+    '(bestvideo[fps>30]/bestvideo)+bestaudio,worst',
+)
+
+
+def make_formats(count):
+    formats = []
+    for i in range(count):
+        kind = i % 3
+        height = (144, 240, 360, 480, 720, 1080, 1440, 2160)[i % 8]
+        f = {
+            'format_id': '%d' % i,
+            'url': 'https://example.com/%d.mp4' % i,
+            'ext': ('mp4', 'webm', 'm4a')[kind],
+            'protocol': 'https',
+            'tbr': 100 + i,
+            'http_headers': {'User-Agent': 'Mozilla/5.0', 'Referer': 'https://example.com/'},
+        }
+        if kind == 2:
+            f.update({'vcodec': 'none', 'acodec': 'mp4a.40.2', 'abr': 48 + i % 200})
+        else:
+            f.update({
+                'width': height * 16 // 9,
+                'height': height,
+                'fps': 60 if i % 5 == 0 else 30,
+                'vcodec': 'avc1.64001F' if kind == 0 else 'vp9',
+                'acodec': 'none' if i % 2 else 'mp4a.40.2',
+            })
+        formats.append(f)
+    return formats
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [OPTIONS]')
+    parser.add_option(
+        '--videos', type=int, default=200,
+        help='Number of videos processed per spec (default is %default)')
+    options, args = parser.parse_args()
+
+    ydl = YoutubeDL({'quiet': True, 'simulate': True})
+    for count in (20, 200, 1000):
+        info_dict = {
+            'id': 'video',
+            'title': 'video',
+            'extractor': 'bench',
+            'webpage_url': 'https://example.com/video',
+            'formats': make_formats(count),
+        }
+        for spec in SPECS:
+            ydl.params['format'] = spec
+
+            def run():
+                ydl.process_video_result(dict(info_dict, formats=list(info_dict['formats'])), download=False)
+
+            elapsed = timeit.timeit(run, number=options.videos)
+            print('%4d formats %-80s %.3fms per video' % (count, spec, elapsed * 1000 / options.videos))
+
+
+if __name__ == '__main__':
+    main()
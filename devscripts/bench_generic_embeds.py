@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+# Benchmark the embed detection of GenericIE._real_extract on saved pages,
+# with the _EmbedMarkers guards and with every detection run regardless of
+# the markers, as before the guards were introduced.
+#
+# Pages are read from the files given as arguments, test/testdata/html by
+# default, and served to the extractor without any network access. Use
+# --scale to concatenate the body of each page with itself, which is what
+# large pages without embeds look like to the detections.
+
+from __future__ import unicode_literals
+
+import io
+import optparse
+import os
+import sys
+import timeit
+
+# Import youtube_dl
+ROOT_DIR = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, ROOT_DIR)
+from youtube_dl import YoutubeDL
+from youtube_dl.extractor import generic
+from youtube_dl.utils import ExtractorError
+
+
+PAGE_URL = 'http://example.com/news/article.html'
+
+
+class SavedPage(object):
+    def __init__(self, webpage):
+        self._data = io.BytesIO(webpage.encode('utf-8'))
+        self.headers = {'Content-Type': 'text/html; charset=utf-8'}
+
+    def geturl(self):
+        return PAGE_URL
+
+    def info(self):
+        return self.headers
+
+    def read(self, size=-1):
+        return self._data.read(size)
+
+
+class OfflineGenericIE(generic.GenericIE):
+    webpage = None
+
+    def _request_webpage(self, url_or_request, *args, **kwargs):
+        return SavedPage(self.webpage)
+
+
+class AllMarkers(generic._EmbedMarkers):
+    def has_word(self, *words):
+        return True
+
+    def has_text(self, *strings):
+        return True
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [OPTIONS] [PAGE...]')
+    parser.add_option(
+        '--rounds', type=int, default=5,
+        help='Number of extractions of every page (default is %default)')
+    parser.add_option(
+        '--scale', type=int, default=1,
+        help='Number of times the body of every page is repeated (default is %default)')
+    options, args = parser.parse_args()
+
+    if not args:
+        pages_dir = os.path.join(ROOT_DIR, 'test', 'testdata', 'html')
+        args = [os.path.join(pages_dir, fn) for fn in sorted(os.listdir(pages_dir))]
+
+    ie = OfflineGenericIE(YoutubeDL({'quiet': True, 'no_warnings': True, 'test': True}))
+
+    def run():
+        try:
+            ie._real_extract(PAGE_URL)
+        except ExtractorError:
+            pass
+
+    guarded_markers = generic._EmbedMarkers
+    for fn in args:
+        with io.open(fn, encoding='utf-8') as f:
+            webpage = f.read()
+        if options.scale > 1:
+            head, sep, body = webpage.partition('<body')
+            webpage = head + (sep + body) * options.scale
+        ie.webpage = webpage
+        results = []
+        for markers in (AllMarkers, guarded_markers):
+            generic._EmbedMarkers = markers
+            try:
+                results.append(timeit.timeit(run, number=options.rounds) / options.rounds)
+            finally:
+                generic._EmbedMarkers = guarded_markers
+        print('%-24s %7d KiB  unguarded %8.2fms  guarded %8.2fms' % (
+            os.path.basename(fn), len(webpage) // 1024,
+            results[0] * 1000, results[1] * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+
+# Benchmark calls of a signature function like the ones of the
+# html5player-*.js files compiled once by JSInterpreter against
+# interpreting its statements again on every call, as was done before
+# functions were compiled.
+
+from __future__ import unicode_literals
+
+import optparse
+import os
+import sys
+import timeit
+
+# Import youtube_dl
+ROOT_DIR = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, ROOT_DIR)
+from youtube_dl.jsinterp import JSInterpreter
+
+
+SIG_JS = '''
+var Xy={Ab:function(a){a.reverse()},cD:function(a,b){a.splice(0,b)},
+eF:function(a,b){var c=a[0];a[0]=a[b%a.length];a[b%a.length]=c}};
+function sig(a){a=a.split("");Xy.eF(a,3);Xy.Ab(a,12);Xy.cD(a,2);Xy.eF(a,45);Xy["Ab"](a,1);return a.join("")}
+'''
+SIG_CODE = 'a=a.split("");Xy.eF(a,3);Xy.Ab(a,12);Xy.cD(a,2);Xy.eF(a,45);Xy["Ab"](a,1);return a.join("")'
+SIG_INPUT = '0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+def interpret_function(jsi, argnames, code, args):
+    local_vars = dict(zip(argnames, args))
+    for stmt in code.split(';'):
+        res, abort = jsi.interpret_statement(stmt, local_vars)
+        if abort:
+            break
+    return res
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [OPTIONS]')
+    parser.add_option(
+        '--calls', type=int, default=200,
+        help='Number of calls of the signature function (default is %default)')
+    options, args = parser.parse_args()
+
+    sig = JSInterpreter(SIG_JS).extract_function('sig')
+    assert sig([SIG_INPUT]) == interpret_function(JSInterpreter(SIG_JS), ['a'], SIG_CODE, [SIG_INPUT])
+
+    for label, run in (
+            ('interpreted', lambda: interpret_function(JSInterpreter(SIG_JS), ['a'], SIG_CODE, [SIG_INPUT])),
+            ('compiled', lambda: sig([SIG_INPUT]))):
+        elapsed = min(timeit.repeat(run, number=options.calls, repeat=3))
+        print('%-12s %d calls %8.2fms (%.1fus per call)' % (
+            label, options.calls, elapsed * 1000, elapsed * 1e6 / options.calls))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+# Benchmark the parsing of synthetic HLS media playlists into M3U8Playlist
+# and fragments by the native HLS downloader, as done on every download and
+# on every reload of a live playlist, and of a master playlist by the
+# extractor helper.
+
+from __future__ import unicode_literals
+
+import optparse
+import os
+import sys
+import timeit
+
+# Import youtube_dl
+ROOT_DIR = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, ROOT_DIR)
+from youtube_dl import YoutubeDL
+from youtube_dl.downloader.hls import HlsFD
+from youtube_dl.extractor.common import InfoExtractor
+
+
+MANIFEST_URL = 'https://example.com/hls/stream/1080p/index.m3u8?token=0123456789abcdef'
+
+
+def make_media_playlist(count, absolute=False, byte_ranges=False, key_every=0):
+    lines = ['#EXTM3U', '#EXT-X-VERSION:4', '#EXT-X-TARGETDURATION:6', '#EXT-X-MEDIA-SEQUENCE:0']
+    for i in range(count):
+        if key_every and i % key_every == 0:
+            lines.append('#EXT-X-KEY:METHOD=AES-128,URI="key/%d.bin",IV=0x%032x' % (i // key_every, i))
+        lines.append('#EXTINF:6.006,')
+        if byte_ranges:
+            lines.append('#EXT-X-BYTERANGE:1048576@%d' % (i * 1048576))
+            lines.append('media.ts')
+        else:
+            lines.append('%ssegment_%05d.ts' % ('https://cdn.example.com/hls/' if absolute else '', i))
+    lines.append('#EXT-X-ENDLIST')
+    return '\n'.join(lines) + '\n'
+
+
+def make_master_playlist(count):
+    lines = ['#EXTM3U']
+    for i in range(count):
+        lines.append('#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="audio-%d",NAME="English",LANGUAGE="en",URI="audio/%d.m3u8"' % (i, i))
+        lines.append(
+            '#EXT-X-STREAM-INF:BANDWIDTH=%d,RESOLUTION=1920x1080,CODECS="avc1.640028,mp4a.40.2",AUDIO="audio-%d"'
+            % (1000000 + i, i))
+        lines.append('video/%d.m3u8' % i)
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [OPTIONS]')
+    parser.add_option(
+        '--segments', type=int, default=10000,
+        help='Number of segments of the media playlists (default is %default)')
+    parser.add_option(
+        '--rounds', type=int, default=20,
+        help='Number of times every playlist is parsed (default is %default)')
+    options, args = parser.parse_args()
+
+    ydl = YoutubeDL({'quiet': True})
+    fd = HlsFD(ydl, {})
+    info_dict = {'url': MANIFEST_URL}
+    playlists = (
+        ('relative URLs', make_media_playlist(options.segments)),
+        ('absolute URLs', make_media_playlist(options.segments, absolute=True)),
+        ('byte ranges', make_media_playlist(options.segments, byte_ranges=True)),
+        ('AES-128 keys', make_media_playlist(options.segments, key_every=100)),
+    )
+    for label, manifest in playlists:
+        def run():
+            playlist = fd._parse_playlist(manifest, MANIFEST_URL, info_dict)
+            fd.can_download(playlist, info_dict)
+            fd._playlist_fragments(playlist, info_dict)
+
+        elapsed = timeit.timeit(run, number=options.rounds)
+        print('%-14s %d segments %8.2fms per playlist' % (
+            label, options.segments, elapsed * 1000 / options.rounds))
+
+    ie = InfoExtractor(ydl)
+    master = make_master_playlist(200)
+    elapsed = timeit.timeit(
+        lambda: ie._parse_m3u8_formats(master, MANIFEST_URL, 'mp4', m3u8_id='hls'),
+        number=options.rounds)
+    print('%-14s %d variants %8.2fms per playlist' % (
+        'master', 200, elapsed * 1000 / options.rounds))
+
+
+if __name__ == '__main__':
+    main()
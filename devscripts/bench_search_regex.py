@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+# Benchmark the InfoExtractor regex helpers on the pages saved in
+# test/testdata/html, with and without the compiled pattern cache.
+#
+# Every round looks up the usual OpenGraph and meta properties and searches
+# for as many distinct extractor-like patterns as given with --patterns, which
+# is what a long batch over many extractors looks like to the re module.
+
+from __future__ import unicode_literals
+
+import io
+import optparse
+import os
+import re
+import sys
+import timeit
+
+# Import youtube_dl
+ROOT_DIR = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, ROOT_DIR)
+from youtube_dl import YoutubeDL
+from youtube_dl.extractor import common
+from youtube_dl.extractor.common import InfoExtractor
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [OPTIONS]')
+    parser.add_option(
+        '--rounds', type=int, default=20,
+        help='Number of rounds over the pages (default is %default)')
+    parser.add_option(
+        '--patterns', type=int, default=800,
+        help='Number of distinct patterns searched per round (default is %default)')
+    options, args = parser.parse_args()
+
+    pages_dir = os.path.join(ROOT_DIR, 'test', 'testdata', 'html')
+    pages = []
+    for fn in sorted(os.listdir(pages_dir)):
+        with io.open(os.path.join(pages_dir, fn), encoding='utf-8') as f:
+            pages.append(f.read())
+
+    ie = InfoExtractor(YoutubeDL({'quiet': True, 'no_color': True}))
+    patterns = [
+        r'<div[^>]+id=["\']player%d["\'][^>]+data-video-id=["\'](\d+)' % i
+        for i in range(options.patterns)]
+
+    def run():
+        for webpage in pages:
+            ie._og_search_title(webpage)
+            ie._og_search_description(webpage)
+            ie._og_search_thumbnail(webpage)
+            ie._og_search_video_url(webpage)
+            for name in ('description', 'keywords', 'author', 'duration', 'uploadDate', 'twitter:player'):
+                ie._html_search_meta(name, webpage)
+            for pattern in patterns:
+                ie._search_regex(pattern, webpage, 'video id', default=None)
+
+    cache_size = common._REGEX_CACHE_SIZE
+    for label, size in (('without cache', 0), ('with cache', cache_size)):
+        common._REGEX_CACHE_SIZE = size
+        common._REGEX_CACHE.clear()
+        re.purge()
+        elapsed = timeit.timeit(run, number=options.rounds)
+        print('%-14s %.3fs (%.2fms per round)' % (
+            label, elapsed, elapsed * 1000 / options.rounds))
+    common._REGEX_CACHE_SIZE = cache_size
+
+
+if __name__ == '__main__':
+    main()
@@ -16,6 +16,7 @@ if os.path.exists(lazy_extractors_filename):
 
 from youtube_dl.extractor import _ALL_CLASSES
 from youtube_dl.extractor.common import InfoExtractor, SearchInfoExtractor
+from youtube_dl.YoutubeDL import YoutubeDL
 
 with open('devscripts/lazy_load_template.py', 'rt') as f:
     module_template = f.read()
@@ -94,6 +95,19 @@ for ie in ordered_cls:
 module_contents.append(
     '_ALL_CLASSES = [{0}]'.format(', '.join(names)))
 
+
+def url_pattern_keys_repr(ie):
+    keys = YoutubeDL._ie_url_pattern_keys(ie)
+    return repr(sorted(keys)) if keys is not None else 'None'
+
+
+# The URL dispatch index of YoutubeDL is built from these instead of
+# analysing every _VALID_URL on startup
+module_contents.append(
+    '_URL_PATTERN_KEYS = {{\n{0}}}'.format(''.join(
+        '    {0!r}: {1},\n'.format(ie.ie_key(), url_pattern_keys_repr(ie))
+        for ie in _ALL_CLASSES)))
+
 module_src = '\n'.join(module_contents) + '\n'
 
 with io.open(lazy_extractors_filename, 'wt', encoding='utf-8') as f:
@@ -5,21 +5,27 @@ from __future__ import unicode_literals
 # Allow direct execution
 import io
 import os
+import re
+import shutil
 import sys
 import unittest
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from test.helper import FakeYDL, expect_dict, expect_value, http_server_port
 from youtube_dl.compat import compat_etree_fromstring, compat_http_server
+from youtube_dl.extractor import common
 from youtube_dl.extractor.common import InfoExtractor
 from youtube_dl.extractor import YoutubeIE, get_info_extractor
-from youtube_dl.utils import encode_data_uri, strip_jsonp, ExtractorError, RegexNotFoundError
+from youtube_dl.utils import encode_data_uri, strip_jsonp, ExtractorError, FragmentSequence, RegexNotFoundError
 import threading
 
 
 TEAPOT_RESPONSE_STATUS = 418
 TEAPOT_RESPONSE_BODY = "<h1>418 I'm a teapot</h1>"
 
+# Number of requests received for each cacheable path
+CACHE_REQUESTS = {}
+
 
 class InfoExtractorTestRequestHandler(compat_http_server.BaseHTTPRequestHandler):
     def log_message(self, format, *args):
@@ -31,6 +37,32 @@ class InfoExtractorTestRequestHandler(compat_http_server.BaseHTTPRequestHandler)
             self.send_header('Content-Type', 'text/html; charset=utf-8')
             self.end_headers()
             self.wfile.write(TEAPOT_RESPONSE_BODY.encode())
+        elif self.path in ('/fresh', '/etag', '/no-store', '/cookie', '/set-cookie'):
+            count = CACHE_REQUESTS[self.path] = CACHE_REQUESTS.get(self.path, 0) + 1
+            if self.path == '/etag' and self.headers.get('If-None-Match') == '"v1"':
+                self.send_response(304)
+                self.send_header('ETag', '"v1"')
+                self.end_headers()
+                return
+            body = ('%s %d' % (self.path, count)).encode()
+            if self.path == '/cookie':
+                body = ('/cookie %s' % self.headers.get('Cookie', '')).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Cache-Control', {
+                '/fresh': 'public, max-age=3600',
+                '/etag': 'no-cache',
+                '/no-store': 'no-store',
+                '/cookie': 'max-age=3600',
+                '/set-cookie': 'max-age=3600',
+            }[self.path])
+            if self.path == '/etag':
+                self.send_header('ETag', '"v1"')
+            if self.path == '/set-cookie':
+                self.send_header('Set-Cookie', 'session=1; Path=/')
+            self.end_headers()
+            self.wfile.write(body)
         else:
             assert False
 
@@ -98,6 +130,25 @@ class TestInfoExtractor(unittest.TestCase):
         self.assertRaises(RegexNotFoundError, ie._html_search_meta, 'z', html, None, fatal=True)
         self.assertRaises(RegexNotFoundError, ie._html_search_meta, ('z', 'x'), html, None, fatal=True)
 
+    def test_search_regex_cache(self):
+        ie = self.ie
+        common._REGEX_CACHE.clear()
+        self.assertEqual(ie._search_regex(r'(?P<x>b+)', 'aBbc', 'x', flags=re.I), 'Bb')
+        self.assertEqual(ie._search_regex(r'(?P<x>b+)', 'aBbc', 'x'), 'b')
+        self.assertEqual(ie._search_regex(re.compile(r'(b+)'), 'aBbc', 'x'), 'b')
+        self.assertEqual(len(common._REGEX_CACHE), 2)
+        self.assertTrue(
+            common._compile_regex(r'(?P<x>b+)', re.I) is common._compile_regex(r'(?P<x>b+)', re.I))
+        self.assertEqual(ie._og_regexes('title'), ie._og_regexes('title'))
+        self.assertTrue(ie._meta_regex('title') is ie._meta_regex('title'))
+
+        with io.open('./test/testdata/html/video_page.html', encoding='utf-8') as f:
+            webpage = f.read()
+        self.assertEqual(ie._og_search_title(webpage), 'Sunset over the bay & harbour')
+        self.assertEqual(
+            ie._og_search_video_url(webpage), 'https://cdn.example-video.com/videos/84512/720p.mp4')
+        self.assertEqual(ie._html_search_meta('duration', webpage), 'PT4M27S')
+
     def test_search_json_ld_realworld(self):
         # https://github.com/ytdl-org/youtube-dl/issues/23306
         expect_dict(
@@ -1032,6 +1083,22 @@ jwplayer("mediaplayer").setup({"abouttext":"Visit Indie DB","aboutlink":"http:\/
                 self.ie._sort_formats(formats)
                 expect_value(self, formats, expected_formats, None)
 
+    def test_parse_mpd_formats_lazy_fragments(self):
+        with io.open('./test/testdata/mpd/float_duration.mpd', mode='r', encoding='utf-8') as f:
+            formats = self.ie._parse_mpd_formats(
+                compat_etree_fromstring(f.read().encode('utf-8')),
+                mpd_base_url='http://unknown/', mpd_url='http://unknown/manifest.mpd')
+        fragments = formats[0]['fragments']
+        self.assertTrue(isinstance(fragments, FragmentSequence))
+        # Initialization fragment, then 6014s in 2s segments numbered from 0
+        self.assertEqual(len(fragments), 1 + 3007)
+        self.assertEqual(fragments[:3], [
+            {'path': 'ai_318597.mp4d'},
+            {'path': 'a_318597_0.mp4d', 'duration': 2.0},
+            {'path': 'a_318597_1.mp4d', 'duration': 2.0},
+        ])
+        self.assertEqual(fragments[-1], {'path': 'a_318597_3006.mp4d', 'duration': 2.0})
+
     def test_parse_f4m_formats(self):
         _TEST_CASES = [
             (
@@ -1127,6 +1194,47 @@ jwplayer("mediaplayer").setup({"abouttext":"Visit Indie DB","aboutlink":"http:\/
             expected_status=TEAPOT_RESPONSE_STATUS)
         self.assertEqual(content, TEAPOT_RESPONSE_BODY)
 
+    def test_response_cache(self):
+        cache_dir = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), 'testdata', 'http_cache_test')
+        httpd = compat_http_server.HTTPServer(
+            ('127.0.0.1', 0), InfoExtractorTestRequestHandler)
+        port = http_server_port(httpd)
+        server_thread = threading.Thread(target=httpd.serve_forever)
+        server_thread.daemon = True
+        server_thread.start()
+
+        ie = TestIE(FakeYDL({'cachedir': cache_dir, 'http_cache': True}))
+        url = 'http://127.0.0.1:%d' % port
+        CACHE_REQUESTS.clear()
+        try:
+            for _ in range(3):
+                # Fresh for an hour, served without a request
+                self.assertEqual(ie._download_webpage(url + '/fresh', None), '/fresh 1')
+                # Revalidated each time, the body is reused on 304
+                content, urlh = ie._download_webpage_handle(url + '/etag', None)
+                self.assertEqual(content, '/etag 1')
+                self.assertEqual(urlh.headers.get('Content-Type'), 'text/plain')
+                self.assertEqual(urlh.geturl(), url + '/etag')
+                self.assertEqual(ie._download_webpage(url + '/no-store', None), '/no-store %d' % CACHE_REQUESTS['/no-store'])
+            self.assertEqual(CACHE_REQUESTS, {'/fresh': 1, '/etag': 3, '/no-store': 3})
+            # Opting out bypasses the cache
+            self.assertEqual(ie._download_webpage(url + '/fresh', None, cache=False), '/fresh 2')
+            self.assertEqual(ie._download_webpage(url + '/fresh', None), '/fresh 1')
+            # Responses setting cookies are not stored, the cookies sent are
+            # part of the key
+            self.assertEqual(ie._download_webpage(url + '/cookie', None), '/cookie ')
+            self.assertEqual(ie._download_webpage(url + '/set-cookie', None), '/set-cookie 1')
+            self.assertEqual(ie._download_webpage(url + '/set-cookie', None), '/set-cookie 2')
+            self.assertEqual(ie._download_webpage(url + '/cookie', None), '/cookie session=1')
+            self.assertEqual(ie._download_webpage(url + '/cookie', None), '/cookie session=1')
+            self.assertEqual(CACHE_REQUESTS['/cookie'], 2)
+            # Disabled by default
+            ie = TestIE(FakeYDL({'cachedir': cache_dir}))
+            self.assertEqual(ie._download_webpage(url + '/fresh', None), '/fresh 3')
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -10,14 +10,19 @@ import unittest
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import copy
+import io
+import threading
+import time
 
 from test.helper import FakeYDL, assertRegexpMatches
 from youtube_dl import YoutubeDL
 from youtube_dl.compat import compat_str, compat_urllib_error
+from youtube_dl.downloader import PROTOCOL_MAP
+from youtube_dl.downloader.common import FileDownloader
 from youtube_dl.extractor import YoutubeIE
 from youtube_dl.extractor.common import InfoExtractor
 from youtube_dl.postprocessor.common import PostProcessor
-from youtube_dl.utils import ExtractorError, match_filter_func
+from youtube_dl.utils import ExtractorError, PostProcessingError, match_filter_func
 
 TEST_URL = 'http://localhost/sample.mp4'
 
@@ -454,6 +459,23 @@ class TestFormatSelection(unittest.TestCase):
         ydl.process_ie_result(info_dict.copy())
         self.assertEqual(ydl.downloaded_info_dicts[0]['format_id'], 'video+audio')
 
+    def test_format_selector_reuse(self):
+        formats = [
+            {'format_id': 'video', 'height': 720, 'acodec': 'none', 'url': TEST_URL},
+            {'format_id': 'audio', 'vcodec': 'none', 'url': TEST_URL},
+        ]
+        ydl = YDL({'format': 'bestvideo+bestaudio,bestaudio'})
+        for video_id in ('a', 'b'):
+            info_dict = _make_result(formats, id=video_id)
+            ydl.process_ie_result(info_dict)
+        self.assertEqual(list(ydl._format_selectors), ['bestvideo+bestaudio,bestaudio'])
+        self.assertEqual(
+            [d['format_id'] for d in ydl.downloaded_info_dicts],
+            ['video+audio', 'audio', 'video+audio', 'audio'])
+        # The selected formats are copies
+        ydl.downloaded_info_dicts[0]['requested_formats'][0]['filepath'] = 'video.mp4'
+        self.assertFalse('filepath' in formats[0])
+
     def test_invalid_format_specs(self):
         def assert_syntax_error(format_spec):
             ydl = YDL({'format': format_spec})
@@ -713,6 +735,228 @@ class TestYoutubeDL(unittest.TestCase):
         self.assertTrue(os.path.exists(filename), '%s doesn\'t exist' % filename)
         os.unlink(filename)
 
+    def test_parallel_formats(self):
+        cond = threading.Condition()
+        started = []
+        concurrent = []
+
+        class TestFD(FileDownloader):
+            def real_download(self, filename, info_dict):
+                size = int(info_dict['filesize'])
+                self._hook_progress({
+                    'status': 'downloading',
+                    'filename': filename,
+                    'downloaded_bytes': 0,
+                    'total_bytes': size,
+                })
+                # Both formats must be downloading at the same time
+                with cond:
+                    started.append(info_dict['format_id'])
+                    cond.notify_all()
+                    if len(started) < 2:
+                        cond.wait(10)
+                    concurrent.append(len(started))
+                with open(filename, 'wb') as f:
+                    f.write(b'x' * size)
+                self._hook_progress({
+                    'status': 'finished',
+                    'filename': filename,
+                    'downloaded_bytes': size,
+                    'total_bytes': size,
+                })
+                return True
+
+        class _YDL(YoutubeDL):
+            def __init__(self, *args, **kwargs):
+                super(_YDL, self).__init__(*args, **kwargs)
+                self.msgs = []
+
+            def to_screen(self, msg, skip_eol=False):
+                self.msgs.append(msg)
+
+            def report_warning(self, msg):
+                pass
+
+        statuses = []
+        ydl = _YDL({
+            'outtmpl': 'parallel-formats-%(id)s.%(ext)s',
+            'parallel_formats': True,
+            'progress_hooks': [statuses.append],
+        })
+        formats = [
+            {'format_id': 'video', 'ext': 'mp4', 'filesize': 3000},
+            {'format_id': 'audio', 'ext': 'm4a', 'filesize': 1000},
+        ]
+        for f in formats:
+            f.update({'url': 'test:%s' % f['format_id'], 'protocol': 'test_parallel'})
+        PROTOCOL_MAP['test_parallel'] = TestFD
+        filenames = ['parallel-formats-testid.f%s.%s' % (f['format_id'], f['ext']) for f in formats]
+        try:
+            ydl.process_info({
+                'id': 'testid',
+                'title': 'testtitle',
+                'ext': 'mp4',
+                'format': 'video+audio',
+                'requested_formats': formats,
+                'extractor': 'test',
+                'extractor_key': 'Test',
+            })
+            self.assertEqual(sorted(started), ['audio', 'video'])
+            self.assertEqual(concurrent, [2, 2])
+            self.assertEqual(os.path.getsize(filenames[0]), 3000)
+            self.assertEqual(os.path.getsize(filenames[1]), 1000)
+            # The progress of each file still reaches the hooks ...
+            self.assertEqual(
+                sorted(s['filename'] for s in statuses if s['status'] == 'finished'),
+                sorted(filenames))
+            # ... but is printed for both at once
+            progress = [msg for msg in ydl.msgs if '%' in msg]
+            self.assertTrue(progress[-1].endswith('100% of 3.91KiB in 00:00'), progress)
+            self.assertEqual(len([msg for msg in progress if '100%' in msg]), 1)
+        finally:
+            del PROTOCOL_MAP['test_parallel']
+            for fn in filenames:
+                if os.path.exists(fn):
+                    os.unlink(fn)
+
+    def test_postprocessor_workers(self):
+        archive = 'post-processor-workers-archive.txt'
+        release = threading.Event()
+        downloaded = []
+
+        class BlockingPP(PostProcessor):
+            def run(self, info):
+                release.wait(10)
+                if info['id'] == '2':
+                    raise PostProcessingError('Conversion failed')
+                return [], info
+
+        class _YDL(YoutubeDL):
+            def to_screen(self, *args, **kwargs):
+                pass
+
+            def trouble(self, *args, **kwargs):
+                self._download_retcode = 1
+
+            def process_info(self, info_dict):
+                super(_YDL, self).process_info(info_dict)
+                downloaded.append(info_dict['id'])
+
+        ydl = _YDL({
+            'outtmpl': 'post-processor-workers-%(id)s.%(ext)s',
+            'download_archive': archive,
+            'postprocessor_workers': 2,
+        })
+        ydl.add_post_processor(BlockingPP())
+        try:
+            for video_id in ('1', '2', '3'):
+                ydl.process_ie_result({
+                    'id': video_id,
+                    'title': 'Video %s' % video_id,
+                    'ext': 'mp4',
+                    'url': 'data:video/mp4;base64,AAAA',
+                    'extractor': 'test',
+                    'extractor_key': 'Test',
+                })
+            # The downloads did not wait for the post-processing
+            self.assertEqual(downloaded, ['1', '2', '3'])
+            self.assertFalse(os.path.exists(archive))
+            release.set()
+            ydl.wait_for_post_processing()
+            with open(archive) as f:
+                self.assertEqual(sorted(f.read().splitlines()), ['test 1', 'test 3'])
+            self.assertEqual(ydl._download_retcode, 1)
+        finally:
+            release.set()
+            for fn in [archive] + ['post-processor-workers-%s.mp4' % i for i in '123']:
+                if os.path.exists(fn):
+                    os.unlink(fn)
+
+    def test_sidecar_downloads(self):
+        lock = threading.Lock()
+        running = []
+        video_started = threading.Event()
+
+        class TestFD(FileDownloader):
+            def real_download(self, filename, info_dict):
+                video_started.set()
+                with open(filename, 'wb') as f:
+                    f.write(b'video')
+                self._hook_progress({
+                    'status': 'finished',
+                    'filename': filename,
+                    'downloaded_bytes': 5,
+                    'total_bytes': 5,
+                })
+                return True
+
+        class _YDL(YoutubeDL):
+            def __init__(self, *args, **kwargs):
+                super(_YDL, self).__init__(*args, **kwargs)
+                self.max_running = 0
+                self.during_video = []
+
+            def to_screen(self, *args, **kwargs):
+                pass
+
+            def urlopen(self, req):
+                url = req if isinstance(req, compat_str) else req.get_full_url()
+                with lock:
+                    running.append(url)
+                    self.max_running = max(self.max_running, len(running))
+                self.during_video.append(video_started.wait(0.2))
+                time.sleep(0.05)
+                with lock:
+                    running.remove(url)
+                return io.BytesIO(url.encode('utf-8'))
+
+        langs = ('en', 'fr', 'de')
+        sidecar_urls = dict(
+            [('sidecars.%s.vtt' % lang, 'http://localhost/%s.vtt' % lang) for lang in langs]
+            + [('sidecars.mp4_%d.jpg' % i, 'http://localhost/%d.jpg' % i) for i in range(3)])
+
+        def process(params):
+            video_started.clear()
+            ydl = _YDL(dict(params, **{
+                'outtmpl': 'sidecars.%(ext)s',
+                'writesubtitles': True,
+                'write_all_thumbnails': True,
+            }))
+            ydl.process_info({
+                'id': 'sidecars',
+                'title': 'sidecars',
+                'ext': 'mp4',
+                'url': 'test:sidecars',
+                'protocol': 'test_sidecars',
+                'extractor': 'test',
+                'extractor_key': 'Generic',
+                'requested_subtitles': dict(
+                    (lang, {'ext': 'vtt', 'url': 'http://localhost/%s.vtt' % lang}) for lang in langs),
+                'thumbnails': [
+                    {'id': '%d' % i, 'url': 'http://localhost/%d.jpg' % i} for i in range(3)],
+            })
+            for fn, url in sidecar_urls.items():
+                with open(fn, 'rb') as f:
+                    self.assertEqual(f.read().decode('utf-8'), url)
+            os.unlink('sidecars.mp4')
+            return ydl
+
+        PROTOCOL_MAP['test_sidecars'] = TestFD
+        try:
+            ydl = process({'sidecar_workers': 3})
+            self.assertEqual(ydl.max_running, 3)
+            self.assertFalse(any(ydl.during_video))
+
+            ydl = process({'sidecar_workers': 2, 'sidecar_background': True})
+            self.assertEqual(ydl.max_running, 2)
+            self.assertTrue(all(ydl.during_video))
+            self.assertEqual(len(ydl.during_video), 6)
+        finally:
+            del PROTOCOL_MAP['test_sidecars']
+            for fn in ['sidecars.mp4'] + list(sidecar_urls):
+                if os.path.exists(fn):
+                    os.unlink(fn)
+
     def test_match_filter(self):
         class FilterYDL(YDL):
             def __init__(self, *args, **kwargs):
@@ -880,6 +1124,78 @@ class TestYoutubeDL(unittest.TestCase):
         self.assertEqual(result[1]['playlist_index'], 2)
         # @}
 
+    def test_playlist_workers(self):
+        main_thread = threading.current_thread()
+
+        class VideoIE(InfoExtractor):
+            _VALID_URL = r'video:(?P<id>\d+)'
+
+            def _real_initialize(self):
+                self.initialized_in = threading.current_thread()
+                self.extracted = []
+
+            def _real_extract(self, url):
+                video_id = self._match_id(url)
+                self.extracted.append(video_id)
+                self.to_screen('%s: Extracting' % video_id)
+                if video_id == '3':
+                    raise ExtractorError('Unavailable video', expected=True)
+                return {
+                    'id': video_id,
+                    'title': 'Video %s' % video_id,
+                    'url': TEST_URL,
+                }
+
+        playlist = {
+            '_type': 'playlist',
+            'id': 'test',
+            'entries': [{
+                '_type': 'url',
+                'url': 'video:%d' % i,
+                'ie_key': 'Video',
+            } for i in range(1, 9)],
+            'extractor': 'test:playlist',
+            'extractor_key': 'test:playlist',
+            'webpage_url': 'http://example.com',
+        }
+
+        class _YDL(YDL):
+            def __init__(self, *args, **kwargs):
+                super(_YDL, self).__init__(*args, **kwargs)
+                self.lines = []
+
+            to_screen = YoutubeDL.to_screen
+            trouble = YoutubeDL.trouble
+
+            def _write_string(self, s, out=None):
+                self.lines.append(s.strip())
+
+        for playlist_workers in (1, 4):
+            ydl = _YDL({
+                'playlist_workers': playlist_workers,
+                'ignoreerrors': True,
+                'playlistreverse': True,
+            })
+            ie = VideoIE(ydl)
+            ydl.add_info_extractor(ie)
+            result = ydl.process_ie_result(copy.deepcopy(playlist))
+            self.assertIs(ie.initialized_in, main_thread)
+            # Failed entries are not extracted a second time
+            self.assertEqual(sorted(ie.extracted), [str(i) for i in range(1, 9)])
+            # Messages and errors are reported in playlist order
+            self.assertEqual(
+                [line for line in ydl.lines if line.startswith(('[Video]', 'ERROR:'))],
+                ['[Video] %s: Extracting' % i for i in '87654']
+                + ['[Video] 3: Extracting', 'ERROR: Unavailable video']
+                + ['[Video] %s: Extracting' % i for i in '21'])
+            self.assertEqual(
+                [v['id'] for v in ydl.downloaded_info_dicts],
+                ['8', '7', '6', '5', '4', '2', '1'])
+            self.assertEqual(
+                [v['playlist_index'] for v in ydl.downloaded_info_dicts],
+                [1, 2, 3, 4, 5, 7, 8])
+            self.assertEqual(result['entries'][5], None)
+
     def test_urlopen_no_file_protocol(self):
         # see https://github.com/ytdl-org/youtube-dl/issues/8227
         ydl = YDL()
@@ -8,13 +8,35 @@ import sys
 import unittest
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from youtube_dl.aes import aes_decrypt, aes_encrypt, aes_cbc_decrypt, aes_cbc_encrypt, aes_decrypt_text
+from youtube_dl.aes import (
+    aes_decrypt,
+    aes_encrypt,
+    aes_cbc_decrypt,
+    aes_cbc_decrypt_bytes,
+    aes_cbc_encrypt,
+    aes_decrypt_text,
+    key_expansion,
+    xor,
+)
 from youtube_dl.utils import bytes_to_intlist, intlist_to_bytes
 import base64
 
 # the encrypted data can be generate with 'devscripts/generate_aes_testdata.py'
 
 
+def reference_cbc_decrypt(data, key, iv):
+    # Block by block decryption on int lists, as done before the
+    # introduction of the table-driven implementation
+    expanded_key = key_expansion(key)
+    decrypted_data = []
+    previous_cipher_block = iv
+    for i in range(0, len(data), 16):
+        block = data[i:i + 16]
+        decrypted_data += xor(aes_decrypt(block, expanded_key), previous_cipher_block)
+        previous_cipher_block = block
+    return decrypted_data
+
+
 class TestAES(unittest.TestCase):
     def setUp(self):
         self.key = self.iv = [0x20, 0x15] + 14 * [0]
@@ -34,6 +56,21 @@ class TestAES(unittest.TestCase):
         decrypted = intlist_to_bytes(aes_cbc_decrypt(data, self.key, self.iv))
         self.assertEqual(decrypted.rstrip(b'\x08'), self.secret_msg)
 
+    def test_cbc_decrypt_bytes(self):
+        data = b"\x97\x92+\xe5\x0b\xc3\x18\x91ky9m&\xb3\xb5@\xe6'\xc2\x96.\xc8u\x88\xab9-[\x9e|\xf1\xcd"
+        key = iv = intlist_to_bytes(self.key)
+        self.assertEqual(aes_cbc_decrypt_bytes(data, key, iv).rstrip(b'\x08'), self.secret_msg)
+        self.assertEqual(aes_cbc_decrypt_bytes(memoryview(data), key, iv).rstrip(b'\x08'), self.secret_msg)
+        self.assertEqual(aes_cbc_decrypt_bytes(b'', key, iv), b'')
+
+    def test_cbc_decrypt_bytes_reference(self):
+        data = bytes_to_intlist(bytes(bytearray(i * 7 % 256 for i in range(16 * 20))))
+        for key_size in (16, 24, 32):
+            key = list(range(key_size))
+            self.assertEqual(
+                aes_cbc_decrypt_bytes(intlist_to_bytes(data), intlist_to_bytes(key), intlist_to_bytes(self.iv)),
+                intlist_to_bytes(reference_cbc_decrypt(data, key, self.iv)))
+
     def test_cbc_encrypt(self):
         data = bytes_to_intlist(self.secret_msg)
         encrypted = intlist_to_bytes(aes_cbc_encrypt(data, self.key, self.iv))
@@ -12,8 +12,10 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from test.helper import gettestcases
 
+from youtube_dl import YoutubeDL
 from youtube_dl.extractor import (
     FacebookIE,
+    gen_extractor_classes,
     gen_extractors,
     YoutubeIE,
 )
@@ -121,6 +123,29 @@ class TestAllURLsMatching(unittest.TestCase):
         self.assertMatch('http://video.pbs.org/viralplayer/2365173446/', ['pbs'])
         self.assertMatch('http://video.pbs.org/widget/partnerplayer/980042464/', ['pbs'])
 
+    def test_dispatch_index(self):
+        # The indexed lookup must pick the same IE as trying all of them
+        ydl = YoutubeDL({'quiet': True})
+        urls = [tc['url'] for tc in gettestcases(include_onlymatching=True)]
+        urls.extend([
+            'HTTP://WWW.YOUTUBE.COM/watch?v=BaW_jenozKc',
+            'youtube.com/watch?v=BaW_jenozKc',
+            '//vimeo.com/56015672',
+            'http://localhost/?www.youtube.com/watch?v=BaW_jenozKc',
+            'ytsearch5:youtube-dl test video',
+            'BaW_jenozKc',
+        ])
+        # As prebuilt by make_lazy_extractors
+        prebuilt_keys = dict(
+            (ie.ie_key(), YoutubeDL._ie_url_pattern_keys(ie))
+            for ie in gen_extractor_classes())
+        index = ydl._build_ies_index(prebuilt_keys)
+        for url in urls:
+            expected = next(ie for ie in ydl._ies if ie.suitable(url))
+            got = next(ydl._ies[pos] for pos in index.candidates(url) if ydl._ies[pos].suitable(url))
+            self.assertEqual(got.ie_key(), expected.ie_key(), url)
+        self.assertEqual(ydl._ies[index.candidates('https://example.com/')[-1]].ie_key(), 'Generic')
+
     def test_no_duplicated_ie_names(self):
         name_accu = collections.defaultdict(list)
         for ie in self.ies:
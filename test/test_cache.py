@@ -3,7 +3,10 @@
 
 from __future__ import unicode_literals
 
+import email
+import io
 import shutil
+import time
 
 # Allow direct execution
 import os
@@ -13,7 +16,8 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
 from test.helper import FakeYDL
-from youtube_dl.cache import Cache
+from youtube_dl.cache import Cache, ResponseCache
+from youtube_dl.compat import compat_urllib_response
 
 
 def _is_empty(d):
@@ -54,6 +58,37 @@ class TestCache(unittest.TestCase):
         self.assertFalse(os.path.exists(self.test_dir))
         self.assertEqual(c.load('test_cache', 'k.'), None)
 
+    def test_response_cache_eviction(self):
+        ydl = FakeYDL({
+            'cachedir': self.test_dir,
+            'http_cache': True,
+            'http_cache_size': 2500,
+        })
+        c = ResponseCache(ydl)
+
+        def store(url):
+            headers = email.message_from_string('Cache-Control: max-age=60\n')
+            urlh = compat_urllib_response.addinfourl(
+                io.BytesIO(b'x' * 1000), headers, url, 200)
+            return c.store(c.key(url), urlh).read()
+
+        self.assertEqual(store('http://example.com/a'), b'x' * 1000)
+        time.sleep(0.01)
+        store('http://example.com/b')
+        time.sleep(0.01)
+        # Using a makes b the least recently used entry
+        c.response(c.key('http://example.com/a'), *c.load(c.key('http://example.com/a')))
+        time.sleep(0.01)
+        store('http://example.com/c')
+        self.assertNotEqual(c.load(c.key('http://example.com/a')), None)
+        self.assertEqual(c.load(c.key('http://example.com/b')), None)
+        self.assertNotEqual(c.load(c.key('http://example.com/c')), None)
+        # The index is rebuilt from the files by a new process
+        c = ResponseCache(ydl)
+        store('http://example.com/d')
+        self.assertEqual(c.load(c.key('http://example.com/a')), None)
+        self.assertNotEqual(c.load(c.key('http://example.com/d')), None)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python
+# coding: utf-8
+from __future__ import unicode_literals
+
+# Allow direct execution
+import os
+import re
+import sys
+import time
+import unittest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from test.helper import http_server_port, try_rm
+from youtube_dl import YoutubeDL
+from youtube_dl.compat import compat_http_server
+from youtube_dl.downloader.dash import DashSegmentsFD
+from youtube_dl.downloader.hls import HlsFD, M3U8Playlist
+from youtube_dl.utils import DownloadError, encodeFilename, FragmentSequence
+import threading
+
+
+FRAG_COUNT = 20
+LIVE_RELOADS = []
+
+
+def fragment_content(n):
+    return ('%d:' % n).encode('ascii') * (100 + n)
+
+
+class HTTPTestRequestHandler(compat_http_server.BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, body, content_type='video/mp4'):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', len(body))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        mobj = re.match(r'^/frag/(\d+)$', self.path)
+        if mobj:
+            n = int(mobj.group(1))
+            if n == 13:
+                self.send_response(404)
+                self.end_headers()
+                return
+            # Serve later fragments faster so that they complete out of order
+            time.sleep(0.002 * (FRAG_COUNT - n))
+            self.send_body(fragment_content(n))
+        elif self.path == '/live.m3u8':
+            # The live window slides by two fragments on every other reload
+            reload_count = len(LIVE_RELOADS)
+            LIVE_RELOADS.append(time.time())
+            first = (0, 0, 2, 4)[min(reload_count, 3)]
+            lines = [
+                '#EXTM3U', '#EXT-X-TARGETDURATION:1',
+                '#EXT-X-MEDIA-SEQUENCE:%d' % first]
+            for n in range(first, first + 4):
+                lines.extend(['#EXTINF:1,', '/frag/%d' % n])
+            if reload_count >= 3:
+                lines.append('#EXT-X-ENDLIST')
+            self.send_body('\n'.join(lines).encode('utf-8'), 'application/x-mpegURL')
+        elif self.path == '/live-flaky.m3u8':
+            # An ad break in the first load, then a failed reload
+            reload_count = len(LIVE_RELOADS)
+            LIVE_RELOADS.append(time.time())
+            if reload_count == 1:
+                self.send_response(503)
+                self.end_headers()
+                return
+            if reload_count == 0:
+                lines = [
+                    '#EXTM3U', '#EXT-X-TARGETDURATION:1', '#EXT-X-MEDIA-SEQUENCE:0',
+                    '#EXTINF:1,', '/frag/0',
+                    '#UPLYNK-SEGMENT:0,00000000,ad', '#EXTINF:1,', '/frag/13',
+                    '#UPLYNK-SEGMENT:0,00000000,segment', '#EXTINF:1,', '/frag/2']
+            else:
+                lines = ['#EXTM3U', '#EXT-X-TARGETDURATION:1', '#EXT-X-MEDIA-SEQUENCE:2']
+                for n in range(2, 5):
+                    lines.extend(['#EXTINF:1,', '/frag/%d' % n])
+                lines.append('#EXT-X-ENDLIST')
+            self.send_body('\n'.join(lines).encode('utf-8'), 'application/x-mpegURL')
+        elif self.path == '/index.m3u8':
+            lines = ['#EXTM3U', '#EXT-X-TARGETDURATION:10']
+            for n in range(FRAG_COUNT):
+                lines.extend(['#EXTINF:10,', '/frag/%d' % n])
+            lines.append('#EXT-X-ENDLIST')
+            self.send_body('\n'.join(lines).encode('utf-8'), 'application/x-mpegURL')
+        else:
+            assert False
+
+
+class FakeLogger(object):
+    def debug(self, msg):
+        pass
+
+    def warning(self, msg):
+        pass
+
+    def error(self, msg):
+        pass
+
+
+class TestFragmentFD(unittest.TestCase):
+    def setUp(self):
+        self.httpd = compat_http_server.HTTPServer(
+            ('127.0.0.1', 0), HTTPTestRequestHandler)
+        self.port = http_server_port(self.httpd)
+        self.server_thread = threading.Thread(target=self.httpd.serve_forever)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+
+    def download(self, fd_class, params, info_dict):
+        params['logger'] = FakeLogger()
+        params.setdefault('fragment_retries', 0)
+        ydl = YoutubeDL(params)
+        downloader = fd_class(ydl, params)
+        filename = 'testfile.mp4'
+        try_rm(encodeFilename(filename))
+        try:
+            self.assertTrue(downloader.real_download(filename, info_dict))
+            with open(encodeFilename(filename), 'rb') as f:
+                return f.read()
+        finally:
+            try_rm(encodeFilename(filename))
+
+    def expected_content(self):
+        return b''.join(fragment_content(n) for n in range(FRAG_COUNT) if n != 13)
+
+    def download_dash(self, params):
+        return self.download(DashSegmentsFD, params, {
+            'url': 'http://127.0.0.1:%d/' % self.port,
+            'fragment_base_url': 'http://127.0.0.1:%d/' % self.port,
+            'fragments': [{'path': 'frag/%d' % n} for n in range(FRAG_COUNT)],
+        })
+
+    def download_hls(self, params):
+        return self.download(HlsFD, params, {
+            'url': 'http://127.0.0.1:%d/index.m3u8' % self.port,
+        })
+
+    def test_dash_sequential(self):
+        self.assertEqual(self.download_dash({}), self.expected_content())
+
+    def test_dash_concurrent(self):
+        self.assertEqual(
+            self.download_dash({'concurrent_fragments': 4}), self.expected_content())
+
+    def test_dash_fragment_sequence(self):
+        self.assertEqual(self.download(DashSegmentsFD, {}, {
+            'url': 'http://127.0.0.1:%d/' % self.port,
+            'fragment_base_url': 'http://127.0.0.1:%d/' % self.port,
+            'fragments': FragmentSequence(
+                'frag/%(Number)d', [(0, 0, 1, FRAG_COUNT)], location_key='path'),
+        }), self.expected_content())
+
+    def test_hls_concurrent(self):
+        self.assertEqual(
+            self.download_hls({'concurrent_fragments': 4}), self.expected_content())
+
+    def test_hls_live(self):
+        del LIVE_RELOADS[:]
+        content = self.download(HlsFD, {}, {
+            'url': 'http://127.0.0.1:%d/live.m3u8' % self.port,
+            'is_live': True,
+        })
+        self.assertEqual(content, b''.join(fragment_content(n) for n in range(8)))
+        self.assertEqual(len(LIVE_RELOADS), 4)
+        # The unchanged playlist is reloaded after half the target duration
+        intervals = [b - a for a, b in zip(LIVE_RELOADS, LIVE_RELOADS[1:])]
+        self.assertTrue(intervals[0] >= 1, intervals)
+        self.assertTrue(0.5 <= intervals[1] < 1, intervals)
+        self.assertTrue(intervals[2] >= 1, intervals)
+
+    def test_hls_live_reload_retry(self):
+        info_dict = {
+            'url': 'http://127.0.0.1:%d/live-flaky.m3u8' % self.port,
+            'is_live': True,
+        }
+        del LIVE_RELOADS[:]
+        # Ad segments take media sequence numbers, fragment 2 is not
+        # downloaded again after the reload
+        content = self.download(HlsFD, {'fragment_retries': 1}, info_dict)
+        self.assertEqual(content, b''.join(fragment_content(n) for n in (0, 2, 3, 4)))
+        self.assertEqual(len(LIVE_RELOADS), 3)
+
+        del LIVE_RELOADS[:]
+        ydl = YoutubeDL({'logger': FakeLogger()})
+        try:
+            self.assertRaises(
+                DownloadError, HlsFD(ydl, {'fragment_retries': 0}).real_download,
+                'testfile.mp4', info_dict)
+        finally:
+            try_rm(encodeFilename('testfile.mp4.part'))
+            try_rm(encodeFilename('testfile.mp4.part.ytdl'))
+
+    def test_keep_fragments(self):
+        try:
+            self.assertEqual(
+                self.download_dash({'keep_fragments': True}), self.expected_content())
+            with open(encodeFilename('testfile.mp4.part-Frag2'), 'rb') as f:
+                self.assertEqual(f.read(), fragment_content(2))
+        finally:
+            for fn in os.listdir('.'):
+                if fn.startswith('testfile.mp4'):
+                    try_rm(fn)
+
+    def test_abort_on_unavailable_fragment(self):
+        for concurrent_fragments in (1, 4):
+            params = {
+                'concurrent_fragments': concurrent_fragments,
+                'skip_unavailable_fragments': False,
+                'ignoreerrors': True,
+            }
+            params['logger'] = FakeLogger()
+            ydl = YoutubeDL(params)
+            downloader = HlsFD(ydl, params)
+            filename = 'testfile.mp4'
+            try:
+                self.assertFalse(downloader.real_download(filename, {
+                    'url': 'http://127.0.0.1:%d/index.m3u8' % self.port,
+                }))
+            finally:
+                for fn in os.listdir('.'):
+                    if fn.startswith(filename):
+                        try_rm(fn)
+
+
+class TestM3U8Playlist(unittest.TestCase):
+    def test_media_playlist(self):
+        playlist = M3U8Playlist('''#EXTM3U
+#EXT-X-TARGETDURATION:6
+#EXT-X-MEDIA-SEQUENCE:7
+#EXTINF:6.0,
+seg0.ts?t=1
+#EXT-X-KEY:METHOD=AES-128,URI="../key.bin",IV=0x0000000000000000000000000000002A
+#EXTINF:5.5,
+../other/seg1.ts
+#UPLYNK-SEGMENT:abc,00000000,ad
+#EXTINF:4,
+https://ads.example.com/ad.ts
+#UPLYNK-SEGMENT:abc,00000000,segment
+#EXT-X-BYTERANGE:100@50
+/media.ts
+#EXT-X-BYTERANGE:20
+/media.ts
+#EXT-X-ENDLIST
+''', 'https://example.com/a/b/index.m3u8?token=x', {'q': ['1']})
+        self.assertFalse(playlist.is_master)
+        self.assertEqual(playlist.target_duration, 6)
+        self.assertTrue(playlist.endlist)
+        self.assertEqual(playlist.key_methods, set(['AES-128']))
+        self.assertEqual([s['url'] for s in playlist.segments], [
+            'https://example.com/a/b/seg0.ts?t=1&q=1',
+            'https://example.com/a/other/seg1.ts?q=1',
+            'https://ads.example.com/ad.ts?q=1',
+            'https://example.com/media.ts?q=1',
+            'https://example.com/media.ts?q=1',
+        ])
+        self.assertEqual([s['media_sequence'] for s in playlist.segments], [7, 8, 9, 10, 11])
+        self.assertEqual([s['duration'] for s in playlist.segments], [6.0, 5.5, 4.0, None, None])
+        self.assertEqual([s['ad'] for s in playlist.segments], [False, False, True, False, False])
+        self.assertEqual([s['byte_range'] for s in playlist.segments], [
+            None, None, None, {'start': 50, 'end': 150}, {'start': 150, 'end': 170}])
+        self.assertEqual(playlist.segments[0]['decrypt_info'], {'METHOD': 'NONE'})
+        decrypt_info = playlist.segments[1]['decrypt_info']
+        self.assertEqual(decrypt_info['URI'], 'https://example.com/a/key.bin?q=1')
+        self.assertEqual(decrypt_info['IV'], b'\0' * 15 + b'\x2a')
+        self.assertTrue(playlist.segments[4]['decrypt_info'] is decrypt_info)
+        # Encrypted byte ranges are not supported
+        self.assertFalse(HlsFD.can_download(playlist, {}))
+
+    def test_can_download(self):
+        def can_download(tags):
+            return HlsFD.can_download(
+                '#EXTM3U\n#EXT-X-TARGETDURATION:6\n%s\n#EXTINF:6,\nseg.ts\n' % tags, {})
+
+        self.assertTrue(can_download(''))
+        self.assertTrue(can_download('#EXT-X-KEY:METHOD=NONE'))
+        self.assertTrue(can_download('#EXT-X-KEY:METHOD=AES-128,URI="key.bin"'))
+        self.assertTrue(can_download('#EXT-X-BYTERANGE:100@0'))
+        self.assertFalse(can_download('#EXT-X-KEY:METHOD=SAMPLE-AES,URI="key.bin"'))
+        self.assertFalse(can_download('#EXT-X-MAP:URI="init.mp4"'))
+
+    def test_master_playlist(self):
+        playlist = M3U8Playlist('''#EXTM3U
+#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="aac",NAME="English",URI="audio/en.m3u8"
+#EXT-X-STREAM-INF:BANDWIDTH=1280000,RESOLUTION=640x360
+360p/index.m3u8
+http://cdn.example.com/720p.m3u8
+''', 'http://example.com/master.m3u8')
+        self.assertTrue(playlist.is_master)
+        self.assertEqual(playlist.segments, [])
+        self.assertEqual(playlist.media[0]['URI'], 'audio/en.m3u8')
+        self.assertEqual(playlist.resolve_url(playlist.media[0]['URI']), 'http://example.com/audio/en.m3u8')
+        self.assertEqual(playlist.variants, [
+            ({'BANDWIDTH': '1280000', 'RESOLUTION': '640x360'}, 'http://example.com/360p/index.m3u8'),
+            ({}, 'http://cdn.example.com/720p.m3u8'),
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -20,6 +20,7 @@ TEST_DIR = os.path.dirname(os.path.abspath(__file__))
 
 
 TEST_SIZE = 10 * 1024
+TEST_DATA = bytes(bytearray(i % 251 for i in range(TEST_SIZE)))
 
 
 class HTTPTestRequestHandler(compat_http_server.BaseHTTPRequestHandler):
@@ -53,8 +54,19 @@ class HTTPTestRequestHandler(compat_http_server.BaseHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(b'#' * size)
 
+    def serve_data(self):
+        self.send_response(206)
+        self.send_header('Content-Type', 'video/mp4')
+        size = self.send_content_range(TEST_SIZE)
+        start = int(re.search(r'^bytes=(\d+)', self.headers['Range']).group(1))
+        self.send_header('Content-Length', size)
+        self.end_headers()
+        self.wfile.write(TEST_DATA[start:start + size])
+
     def do_GET(self):
-        if self.path == '/regular':
+        if self.path == '/data':
+            self.serve_data()
+        elif self.path == '/regular':
             self.serve()
         elif self.path == '/no-content-length':
             self.serve(content_length=False)
@@ -110,6 +122,85 @@ class TestHttpFD(unittest.TestCase):
             'http_chunk_size': 1000,
         })
 
+    def test_progress_interval(self):
+        def statuses_for(interval):
+            params = {
+                'logger': FakeLogger(),
+                'buffersize': 256,
+                'noresizebuffer': True,
+                'progress_interval': interval,
+            }
+            statuses = []
+            downloader = HttpFD(YoutubeDL(params), params)
+            downloader.add_progress_hook(statuses.append)
+            filename = 'testfile.mp4'
+            try_rm(encodeFilename(filename))
+            try:
+                self.assertTrue(downloader.real_download(filename, {
+                    'url': 'http://127.0.0.1:%d/regular' % self.port,
+                }))
+            finally:
+                try_rm(encodeFilename(filename))
+            return [s['status'] for s in statuses], statuses[-1]
+
+        kinds, last = statuses_for(0)
+        self.assertEqual(kinds.count('downloading'), TEST_SIZE // 256)
+        self.assertEqual(last['status'], 'finished')
+
+        # Only the first update makes it through, the final one is never dropped
+        kinds, last = statuses_for(3600)
+        self.assertEqual(kinds, ['downloading', 'finished'])
+        self.assertEqual(last['downloaded_bytes'], TEST_SIZE)
+
+    def make_segmented_downloader(self, params):
+        params['logger'] = FakeLogger()
+        params['http_connections'] = 4
+        downloader = HttpFD(YoutubeDL(params), params)
+        downloader._MIN_SEGMENT_SIZE = 1024
+        return downloader
+
+    def test_segmented(self):
+        downloader = self.make_segmented_downloader({})
+        filename = 'testfile.mp4'
+        try_rm(encodeFilename(filename))
+        try:
+            self.assertTrue(downloader.real_download(filename, {
+                'url': 'http://127.0.0.1:%d/data' % self.port,
+            }))
+            with open(encodeFilename(filename), 'rb') as f:
+                self.assertEqual(f.read(), TEST_DATA)
+            self.assertFalse(os.path.exists(encodeFilename(filename + '.ytdl')))
+        finally:
+            try_rm(encodeFilename(filename))
+
+    def test_segmented_resume(self):
+        downloader = self.make_segmented_downloader({})
+        filename = 'testfile.mp4'
+        try_rm(encodeFilename(filename))
+        # Every segment has been partially downloaded before
+        segments = []
+        with open(encodeFilename(filename + '.part'), 'wb') as f:
+            f.write(b'\0' * TEST_SIZE)
+            for start in range(0, TEST_SIZE, TEST_SIZE // 4):
+                f.seek(start)
+                f.write(TEST_DATA[start:start + 100])
+                segments.append({
+                    'start': start,
+                    'end': start + TEST_SIZE // 4 - 1,
+                    'downloaded': 100,
+                })
+        downloader._write_segments_file(filename, TEST_SIZE, segments)
+        try:
+            self.assertTrue(downloader.real_download(filename, {
+                'url': 'http://127.0.0.1:%d/data' % self.port,
+            }))
+            with open(encodeFilename(filename), 'rb') as f:
+                self.assertEqual(f.read(), TEST_DATA)
+        finally:
+            try_rm(encodeFilename(filename))
+            try_rm(encodeFilename(filename + '.part'))
+            try_rm(encodeFilename(filename + '.ytdl'))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# coding: utf-8
+from __future__ import unicode_literals
+
+# Allow direct execution
+import io
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from test.helper import FakeYDL
+import youtube_dl.extractor.generic as generic
+from youtube_dl.extractor.generic import GenericIE, _EmbedMarkers
+from youtube_dl.utils import UnsupportedError
+
+
+class FakeResponse(object):
+    def __init__(self, url, webpage):
+        self._url = url
+        self._data = io.BytesIO(webpage.encode('utf-8'))
+        self.headers = {'Content-Type': 'text/html; charset=utf-8'}
+
+    def geturl(self):
+        return self._url
+
+    def info(self):
+        return self.headers
+
+    def read(self, size=-1):
+        return self._data.read(size)
+
+
+class OfflineGenericIE(GenericIE):
+    def __init__(self, webpage):
+        super(OfflineGenericIE, self).__init__(FakeYDL())
+        self._webpage = webpage
+
+    def _request_webpage(self, url_or_request, *args, **kwargs):
+        return FakeResponse('http://example.com/news', self._webpage)
+
+
+class _AllMarkers(_EmbedMarkers):
+    def has_word(self, *words):
+        return True
+
+    def has_text(self, *strings):
+        return True
+
+
+PAGES = [
+    '<iframe src="https://www.youtube.com/embed/BaW_jenozKc" width="640"></iframe>',
+    '<IFRAME SRC="//WWW.YOUTUBE.COM/EMBED/BaW_jenozKc"></IFRAME>',
+    '<iframe src="https://player.vimeo.com/video/76979871" width="640"></iframe>',
+    '<iframe src="https://fast.wistia.net/embed/iframe/807fafadvk"></iframe>',
+    '<script>Wistia.embed("807fafadvk", {});</script>',
+    '<iframe src="https://www.dailymotion.com/embed/video/x5kesuj"></iframe>',
+    '<p>Nothing to see here</p>',
+]
+
+
+class TestGenericEmbeds(unittest.TestCase):
+    def extract(self, webpage):
+        webpage = '<html><head><title>News</title></head><body>%s</body></html>' % webpage
+        try:
+            return OfflineGenericIE(webpage)._real_extract('http://example.com/news')
+        except UnsupportedError:
+            return None
+
+    def test_markers(self):
+        embeds = _EmbedMarkers('<iframe src="https://www.YouTube.com/embed/x">')
+        self.assertTrue(embeds.has_word('youtube'))
+        self.assertTrue(embeds.has_word('vimeo', 'embed'))
+        self.assertFalse(embeds.has_word('tube'))
+        self.assertTrue(embeds.has_text('tube.com/emb'))
+        self.assertFalse(embeds.has_text('vimeo'))
+
+    def test_same_results_as_unguarded(self):
+        for webpage in PAGES:
+            guarded = self.extract(webpage)
+            orig_markers = generic._EmbedMarkers
+            generic._EmbedMarkers = _AllMarkers
+            try:
+                unguarded = self.extract(webpage)
+            finally:
+                generic._EmbedMarkers = orig_markers
+            self.assertEqual(guarded, unguarded, webpage)
+
+    def test_embed_found(self):
+        info = self.extract(PAGES[0])
+        self.assertEqual(info['_type'], 'playlist')
+        self.assertEqual(
+            [entry['url'] for entry in info['entries']],
+            ['https://www.youtube.com/embed/BaW_jenozKc'])
+        info = self.extract(PAGES[4])
+        self.assertEqual(info['entries'][0]['url'], 'wistia:807fafadvk')
+        self.assertEqual(self.extract(PAGES[-1]), None)
+
+    def test_sbn_empty_entry_group(self):
+        # Falls through to the following detections
+        self.assertEqual(self.extract('<script>SBN.VideoLinkset.entryGroup([]);</script>'), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,12 +11,38 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from test.helper import http_server_port
 from youtube_dl import YoutubeDL
 from youtube_dl.compat import compat_http_server, compat_urllib_request
+import socket
 import ssl
 import threading
+import zlib
 
 TEST_DIR = os.path.dirname(os.path.abspath(__file__))
 
 
+def _gzip(data):
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _raw_deflate(data):
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+PLAIN_CONTENT = ''.join('%d\n' % i for i in range(100000)).encode('ascii')
+ENCODED_CONTENT = {
+    'gzip': _gzip(PLAIN_CONTENT),
+    'gzip-junk': _gzip(PLAIN_CONTENT) + b'\0' * 100,
+    'gzip-members': _gzip(PLAIN_CONTENT[:1000]) + _gzip(PLAIN_CONTENT[1000:]),
+    'deflate': zlib.compress(PLAIN_CONTENT),
+    'deflate-raw': _raw_deflate(PLAIN_CONTENT),
+}
+TRUNCATED_CONTENT = {
+    'gzip': _gzip(PLAIN_CONTENT)[:-100],
+    'deflate': zlib.compress(PLAIN_CONTENT)[:-100],
+}
+
+
 class HTTPTestRequestHandler(compat_http_server.BaseHTTPRequestHandler):
     def log_message(self, format, *args):
         pass
@@ -43,6 +69,15 @@ class HTTPTestRequestHandler(compat_http_server.BaseHTTPRequestHandler):
             self.send_response(302)
             self.send_header(b'Location', new_url.encode('utf-8'))
             self.end_headers()
+        elif self.path.startswith(('/encoded/', '/truncated/')):
+            kind, encoding = self.path.split('/')[1:3]
+            body = (ENCODED_CONTENT if kind == 'encoded' else TRUNCATED_CONTENT)[encoding]
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Encoding', encoding.partition('-')[0])
+            self.send_header('Content-Length', len(body))
+            self.end_headers()
+            self.wfile.write(body)
         elif self.path == '/%E4%B8%AD%E6%96%87.html':
             self.send_response(200)
             self.send_header('Content-Type', 'text/html; charset=utf-8')
@@ -72,6 +107,23 @@ class TestHTTP(unittest.TestCase):
         self.server_thread.daemon = True
         self.server_thread.start()
 
+    def test_content_encoding(self):
+        ydl = YoutubeDL({'logger': FakeLogger()})
+        for encoding in ENCODED_CONTENT:
+            resp = ydl.urlopen('http://127.0.0.1:%d/encoded/%s' % (self.port, encoding))
+            self.assertEqual(resp.read(7), PLAIN_CONTENT[:7])
+            self.assertEqual(resp.read(), PLAIN_CONTENT[7:], encoding)
+            self.assertEqual(resp.info().get('Content-Encoding'), None)
+
+    def test_truncated_content_encoding(self):
+        if sys.version_info < (3, 3):
+            return
+
+        ydl = YoutubeDL({'logger': FakeLogger()})
+        for encoding in TRUNCATED_CONTENT:
+            resp = ydl.urlopen('http://127.0.0.1:%d/truncated/%s' % (self.port, encoding))
+            self.assertRaises(IOError, resp.read)
+
     def test_unicode_path_redirection(self):
         # XXX: Python 3 http server does not allow non-ASCII header values
         if sys.version_info[0] == 3:
@@ -82,6 +134,108 @@ class TestHTTP(unittest.TestCase):
         self.assertEqual(r['entries'][0]['url'], 'http://127.0.0.1:%d/vid.mp4' % self.port)
 
 
+class KeepAliveRequestHandler(compat_http_server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _drop(self):
+        # Read the request and close the connection without responding
+        self.server.dropped.append(self.command)
+        if self.headers.get('Content-Length'):
+            self.rfile.read(int(self.headers['Content-Length']))
+        self.close_connection = True
+
+    def do_POST(self):
+        self.server.client_ports.add(self.client_address[1])
+        self._drop()
+
+    def do_GET(self):
+        self.server.client_ports.add(self.client_address[1])
+        if self.path == '/drop':
+            self._drop()
+            return
+        if self.path == '/close':
+            self.send_response(200)
+            self.send_header('Content-Length', 6)
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.wfile.write(b'/close')
+            self.close_connection = True
+            return
+        if self.path == '/chunked':
+            self.send_response(200)
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            self.wfile.write(b'5\r\nhello\r\n0\r\n\r\n')
+            return
+        body = self.path.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', len(body))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class TestKeepAlive(unittest.TestCase):
+    def setUp(self):
+        self.httpd = compat_http_server.HTTPServer(
+            ('127.0.0.1', 0), KeepAliveRequestHandler)
+        self.httpd.client_ports = set()
+        self.httpd.dropped = []
+        self.port = http_server_port(self.httpd)
+        self.server_thread = threading.Thread(target=self.httpd.serve_forever)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+
+    def test_connection_reuse(self):
+        if sys.version_info < (3, 0):
+            return
+
+        ydl = YoutubeDL({'logger': FakeLogger()})
+        for path in ('/a', '/chunked', '/b', '/c'):
+            data = ydl.urlopen('http://127.0.0.1:%d%s' % (self.port, path)).read()
+            self.assertEqual(data, b'hello' if path == '/chunked' else path.encode('utf-8'))
+        self.assertEqual(len(self.httpd.client_ports), 1)
+
+        # A response that is not read entirely must not be reused
+        ydl.urlopen('http://127.0.0.1:%d/partial' % self.port).close()
+        self.assertEqual(ydl.urlopen('http://127.0.0.1:%d/d' % self.port).read(), b'/d')
+        self.assertEqual(len(self.httpd.client_ports), 2)
+
+        # Reconnect if the server has closed an idle connection
+        for conn, _ in ydl._connection_pool._idle[('http', '127.0.0.1:%d' % self.port, None, None)]:
+            conn.sock.shutdown(socket.SHUT_RDWR)
+        self.assertEqual(ydl.urlopen('http://127.0.0.1:%d/e' % self.port).read(), b'/e')
+
+    def test_connection_close(self):
+        if sys.version_info < (3, 0):
+            return
+
+        ydl = YoutubeDL({'logger': FakeLogger()})
+        pool_key = ('http', '127.0.0.1:%d' % self.port, None, None)
+        self.assertEqual(ydl.urlopen('http://127.0.0.1:%d/close' % self.port).read(), b'/close')
+        self.assertEqual(ydl._connection_pool._idle.get(pool_key, []), [])
+        self.assertEqual(ydl.urlopen('http://127.0.0.1:%d/a' % self.port).read(), b'/a')
+        self.assertEqual(len(self.httpd.client_ports), 2)
+
+    def test_retry_idempotent_only(self):
+        if sys.version_info < (3, 0):
+            return
+
+        ydl = YoutubeDL({'logger': FakeLogger()})
+        url = 'http://127.0.0.1:%d/drop' % self.port
+        # A GET dropped on a reused connection is sent again on a new one
+        ydl.urlopen('http://127.0.0.1:%d/a' % self.port).read()
+        self.assertRaises(Exception, ydl.urlopen, url)
+        self.assertEqual(self.httpd.dropped, ['GET', 'GET'])
+        # A POST is not, the server may have processed it
+        ydl.urlopen('http://127.0.0.1:%d/a' % self.port).read()
+        self.assertRaises(Exception, ydl.urlopen, compat_urllib_request.Request(url, data=b'x=1'))
+        self.assertEqual(self.httpd.dropped, ['GET', 'GET', 'POST'])
+
+
 class TestHTTPS(unittest.TestCase):
     def setUp(self):
         certfn = os.path.join(TEST_DIR, 'testcert.pem')
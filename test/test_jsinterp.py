@@ -10,6 +10,26 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from youtube_dl.jsinterp import JSInterpreter
 
+# Same structure as the signature functions of the html5player-*.js files
+# used in test_youtube_signature.py
+SIG_JS = '''
+var Xy={Ab:function(a){a.reverse()},cD:function(a,b){a.splice(0,b)},
+eF:function(a,b){var c=a[0];a[0]=a[b%a.length];a[b%a.length]=c}};
+function sig(a){a=a.split("");Xy.eF(a,3);Xy.Ab(a,12);Xy.cD(a,2);Xy.eF(a,45);Xy["Ab"](a,1);return a.join("")}
+'''
+SIG_INPUT = '0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+def interpret_function(jsi, argnames, code, args):
+    # Parses every statement again on each call, as the interpreter
+    # used to do before functions were compiled
+    local_vars = dict(zip(argnames, args))
+    for stmt in code.split(';'):
+        res, abort = jsi.interpret_statement(stmt, local_vars)
+        if abort:
+            break
+    return res
+
 
 class TestJSInterpreter(unittest.TestCase):
     def test_basic(self):
@@ -94,6 +114,27 @@ class TestJSInterpreter(unittest.TestCase):
         ''')
         self.assertEqual(jsi.call_function('f'), 3)
 
+    def test_repeated_calls(self):
+        jsi = JSInterpreter('function f(a){var x = [1,2,3]; x[0] = a; return (x);}')
+        self.assertEqual(jsi.call_function('f', 4), [4, 2, 3])
+        self.assertEqual(jsi.call_function('f', 5), [5, 2, 3])
+
+        jsi = JSInterpreter('function f(a){return (a + 1) * 3;}')
+        self.assertEqual([jsi.call_function('f', a) for a in range(4)], [3, 6, 9, 12])
+
+    def test_signature(self):
+        jsi = JSInterpreter(SIG_JS)
+        sig = jsi.extract_function('sig')
+        expected = '3120456789abcdXfghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWe'
+        self.assertEqual(sig([SIG_INPUT]), expected)
+        self.assertEqual(sig([SIG_INPUT]), expected)
+
+    def test_compiled_matches_interpreted(self):
+        jsi = JSInterpreter(SIG_JS)
+        sig = jsi.extract_function('sig')
+        code = 'a=a.split("");Xy.eF(a,3);Xy.Ab(a,12);Xy.cD(a,2);Xy.eF(a,45);Xy["Ab"](a,1);return a.join("")'
+        self.assertEqual(interpret_function(jsi, ['a'], code, [SIG_INPUT]), sig([SIG_INPUT]))
+
     def test_precedence(self):
         jsi = JSInterpreter('''
         function x() {
@@ -8,10 +8,82 @@ import sys
 import unittest
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from youtube_dl.postprocessor import MetadataFromTitlePP
+from test.helper import FakeYDL
+from youtube_dl.postprocessor import (
+    FFmpegCopyEditsPP,
+    FFmpegEmbedSubtitlePP,
+    FFmpegFixupM4aPP,
+    FFmpegMetadataPP,
+    FFmpegSubtitlesConvertorPP,
+    MetadataFromTitlePP,
+)
 
 
 class TestMetadataFromTitle(unittest.TestCase):
     def test_format_to_regex(self):
         pp = MetadataFromTitlePP(None, '%(title)s - %(artist)s')
         self.assertEqual(pp._titleregex, r'(?P<title>.+)\ \-\ (?P<artist>.+)')
+
+
+class TestFFmpegCopyEdits(unittest.TestCase):
+    def setUp(self):
+        self.filename = 'copy-edits-test.mp4'
+        self.sub_filename = 'copy-edits-test.en.vtt'
+        for fn in (self.filename, self.sub_filename):
+            with open(fn, 'wb') as f:
+                f.write(b'\0')
+        self.commands = []
+
+    def tearDown(self):
+        for fn in (self.filename, self.sub_filename):
+            if os.path.exists(fn):
+                os.remove(fn)
+
+    def make_pp(self, cls, *args):
+        commands = self.commands
+
+        class PP(cls):
+            def run_ffmpeg_multiple_files(self, input_paths, out_path, opts):
+                commands.append((input_paths, opts))
+                with open(out_path, 'wb') as f:
+                    f.write(b'\0')
+
+        return PP(FakeYDL(), *args)
+
+    def test_coalesce(self):
+        metadata = self.make_pp(FFmpegMetadataPP)
+        subtitles = self.make_pp(FFmpegEmbedSubtitlePP)
+        fixup = self.make_pp(FFmpegFixupM4aPP)
+        title = MetadataFromTitlePP(None, '%(title)s')
+        convertor = self.make_pp(FFmpegSubtitlesConvertorPP, 'vtt')
+        chain = FFmpegCopyEditsPP.coalesce([title, fixup, metadata, convertor, subtitles, title])
+        self.assertEqual(chain[0], title)
+        self.assertEqual(chain[-1], title)
+        self.assertEqual(len(chain), 3)
+        self.assertEqual(chain[1].pps, [fixup, metadata, convertor, subtitles])
+        # A single copy edit is not worth a batch
+        self.assertEqual(FFmpegCopyEditsPP.coalesce([metadata, title]), [metadata, title])
+
+    def test_single_pass(self):
+        pps = [
+            self.make_pp(FFmpegFixupM4aPP),
+            self.make_pp(FFmpegMetadataPP),
+            self.make_pp(FFmpegEmbedSubtitlePP),
+        ]
+        info = {
+            'filepath': self.filename,
+            'ext': 'mp4',
+            'container': 'm4a_dash',
+            'title': 'Test',
+            'requested_subtitles': {'en': {'ext': 'vtt'}},
+        }
+        files_to_delete, _ = FFmpegCopyEditsPP.coalesce(pps)[0].run(info)
+        self.assertEqual(files_to_delete, [self.sub_filename])
+        self.assertEqual(len(self.commands), 1)
+        input_paths, opts = self.commands[0]
+        self.assertEqual(input_paths, [self.filename, self.sub_filename])
+        self.assertEqual(opts.count('copy'), 1)
+        self.assertEqual(opts.count('-f'), 1)
+        self.assertIn('title=Test', opts)
+        self.assertEqual(opts[opts.index('-c:s') + 2:opts.index('-c:s') + 4], ['-map', '1:0'])
+        self.assertTrue(os.path.exists(self.filename))
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# coding: utf-8
+from __future__ import unicode_literals
+
+# Allow direct execution
+import json
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from test.helper import http_server_port
+from youtube_dl.compat import (
+    compat_http_server,
+    compat_urllib_error,
+    compat_urllib_request,
+)
+from youtube_dl.server import YoutubeDLServer
+import threading
+
+
+class HTTPTestRequestHandler(compat_http_server.BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        if self.path == '/video.mp4':
+            self.send_response(200)
+            self.send_header('Content-Type', 'video/mp4')
+            self.send_header('Content-Length', '10')
+            self.end_headers()
+            if self.command == 'GET':
+                self.wfile.write(b'0' * 10)
+        else:
+            self.send_response(404)
+            self.end_headers()
+
+
+class FakeLogger(object):
+    def debug(self, msg):
+        pass
+
+    def warning(self, msg):
+        pass
+
+    def error(self, msg):
+        pass
+
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        self.httpd = compat_http_server.HTTPServer(
+            ('127.0.0.1', 0), HTTPTestRequestHandler)
+        self.port = http_server_port(self.httpd)
+        self.server_thread = threading.Thread(target=self.httpd.serve_forever)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+
+        self.server = YoutubeDLServer(('127.0.0.1', 0), {'logger': FakeLogger()}, workers=2)
+        self.server_url = 'http://127.0.0.1:%d/' % self.server.server_address[1]
+        self.ydl_thread = threading.Thread(target=self.server.serve_forever)
+        self.ydl_thread.daemon = True
+        self.ydl_thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.httpd.shutdown()
+
+    def query(self, request, headers={'Content-Type': 'application/json'}):
+        if not isinstance(request, bytes):
+            request = json.dumps(request).encode('utf-8')
+        try:
+            response = compat_urllib_request.urlopen(
+                compat_urllib_request.Request(self.server_url, request, headers))
+        except compat_urllib_error.HTTPError as err:
+            return err.code, json.loads(err.read().decode('utf-8'))
+        return response.getcode(), json.loads(response.read().decode('utf-8'))
+
+    def test_request(self):
+        video_url = 'http://127.0.0.1:%d/video.mp4' % self.port
+        missing_url = 'http://127.0.0.1:%d/missing' % self.port
+        status, response = self.query({
+            'urls': [video_url, missing_url],
+            'params': {'format': 'worst'},
+        })
+        self.assertEqual(status, 200)
+        video, missing = response['results']
+        self.assertEqual(video['url'], video_url)
+        self.assertEqual(video['info']['id'], 'video')
+        self.assertEqual(video['info']['format_id'], 'mp4')
+        self.assertEqual(missing['url'], missing_url)
+        self.assertTrue('404' in missing['error'])
+
+        # Overrides only apply to their request
+        for ydl in self.server._instances:
+            self.assertFalse('format' in ydl.params)
+
+        # Requests needing a new opener get a YoutubeDL instance of their own
+        status, response = self.query({'url': video_url, 'params': {'socket_timeout': 5}})
+        self.assertEqual(response['results'][0]['info']['id'], 'video')
+
+    def test_invalid_request(self):
+        self.assertEqual(self.query(b'{')[0], 400)
+        self.assertEqual(self.query([])[0], 400)
+        self.assertEqual(self.query({'urls': 'http://example.com/'})[0], 400)
+        self.assertEqual(self.query({'urls': [], 'params': []})[0], 400)
+
+    def test_workers_limit(self):
+        # Requests with an instance of their own count as well
+        held = [self.server._acquire() for _ in range(2)]
+        results = []
+        t = threading.Thread(target=lambda: results.append(
+            self.server.process_request_data([], {'socket_timeout': 5})))
+        t.daemon = True
+        t.start()
+        t.join(0.2)
+        self.assertTrue(t.is_alive())
+        self.server._release(held.pop())
+        t.join(5)
+        self.assertEqual(results, [[]])
+        self.server._release(held.pop())
+
+    def test_fixed_params(self):
+        self.server._run = lambda ydl, urls, download: [ydl.params.get('postprocessors')]
+        for overrides in ({}, {'socket_timeout': 5}):
+            overrides['postprocessors'] = [{'key': 'ExecAfterDownload', 'exec_cmd': 'true'}]
+            self.assertEqual(self.server.process_request_data([], overrides), [None])
+
+    def test_forbidden_request(self):
+        request = {'urls': []}
+        self.assertEqual(self.query(request)[0], 200)
+        # What a web page can make a browser send without a CORS preflight
+        self.assertEqual(self.query(request, {'Content-Type': 'text/plain'})[0], 415)
+        self.assertEqual(self.query(request, {})[0], 415)
+        self.assertEqual(self.query(request, {
+            'Content-Type': 'application/json',
+            'Origin': 'http://example.com',
+        })[0], 403)
+        # DNS rebinding
+        port = self.server.server_address[1]
+        for host, status in (
+                ('localhost:%d' % port, 200),
+                ('[::1]:%d' % port, 200),
+                ('evil.example.com:%d' % port, 403),
+                ('127.0.0.1:%d' % (port + 1), 403),
+                ('127.0.0.1', 403)):
+            self.assertEqual(self.query(request, {
+                'Content-Type': 'application/json',
+                'Host': host,
+            })[0], status, host)
+
+    def test_status(self):
+        status = json.loads(compat_urllib_request.urlopen(self.server_url).read().decode('utf-8'))
+        self.assertEqual(status['workers'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -13,6 +13,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # Various small unit tests
 import io
 import json
+import time
 import xml.etree.ElementTree
 
 from youtube_dl.utils import (
@@ -25,6 +26,7 @@ from youtube_dl.utils import (
     date_from_str,
     DateRange,
     detect_exe_version,
+    DownloadArchive,
     determine_ext,
     dict_get,
     encode_compat_str,
@@ -36,6 +38,7 @@ from youtube_dl.utils import (
     find_xpath_attr,
     fix_xml_ampersands,
     float_or_none,
+    FragmentSequence,
     get_element_by_class,
     get_element_by_attribute,
     get_elements_by_class,
@@ -45,6 +48,7 @@ from youtube_dl.utils import (
     intlist_to_bytes,
     is_html,
     js_to_json,
+    json_default,
     limit_length,
     merge_dicts,
     mimetype2ext,
@@ -53,6 +57,7 @@ from youtube_dl.utils import (
     ohdave_rsa_encrypt,
     OnDemandPagedList,
     orderedSet,
+    ordered_parallel_map,
     parse_age_limit,
     parse_duration,
     parse_filesize,
@@ -87,6 +92,8 @@ from youtube_dl.utils import (
     lowercase_escape,
     url_basename,
     url_or_none,
+    url_pattern_keys,
+    URLPatternIndex,
     base_url,
     urljoin,
     urlencode_postdata,
@@ -321,6 +328,94 @@ class TestUtil(unittest.TestCase):
         _firstmilenium = DateRange(end="10000101")
         self.assertTrue("07110427" in _firstmilenium)
 
+    def test_download_archive(self):
+        fn = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_archive.txt')
+        try:
+            archive = DownloadArchive(fn)
+            self.assertFalse('youtube abc' in archive)
+            with io.open(fn, 'w', encoding='utf-8') as f:
+                f.write('youtube abc\nyoutube def\n')
+            self.assertTrue('youtube abc' in archive)
+            self.assertFalse('youtube xyz' in archive)
+            archive.add('youtube xyz')
+            self.assertTrue('youtube xyz' in archive)
+            # Lines appended by another process are picked up
+            with io.open(fn, 'a', encoding='utf-8') as f:
+                f.write('vimeo 123\n')
+            self.assertTrue('vimeo 123' in archive)
+            self.assertTrue('youtube def' in archive)
+            with io.open(fn, encoding='utf-8') as f:
+                self.assertEqual(
+                    f.read(), 'youtube abc\nyoutube def\nyoutube xyz\nvimeo 123\n')
+            # Rewritten archives are reloaded
+            with io.open(fn, 'w', encoding='utf-8') as f:
+                f.write('vimeo 1\n')
+            self.assertTrue('vimeo 1' in archive)
+            self.assertFalse('youtube def' in archive)
+        finally:
+            if os.path.exists(fn):
+                os.remove(fn)
+
+    def test_download_archive_index(self):
+        fn = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_archive.txt')
+        archive = DownloadArchive(fn)
+        try:
+            with io.open(fn, 'w', encoding='utf-8') as f:
+                f.write(''.join('youtube %d\n' % i for i in range(1000)))
+            self.assertEqual(archive.write_index(), 1000)
+
+            # Only the lines recorded after the index was written are loaded
+            with io.open(fn, 'a', encoding='utf-8') as f:
+                f.write('vimeo 1\n')
+            archive = DownloadArchive(fn)
+            self.assertTrue('youtube 0' in archive)
+            self.assertTrue('youtube 999' in archive)
+            self.assertTrue('vimeo 1' in archive)
+            self.assertFalse('youtube 1000' in archive)
+            self.assertEqual(archive._ids, set(['vimeo 1']))
+            archive.add('vimeo 2')
+            self.assertTrue('vimeo 2' in DownloadArchive(fn))
+
+            # The index is ignored once the archive has been rewritten
+            with io.open(fn, 'w', encoding='utf-8') as f:
+                f.write(''.join('youtube %d\n' % i for i in range(1000, 2000)))
+            archive = DownloadArchive(fn)
+            self.assertFalse('youtube 0' in archive)
+            self.assertTrue('youtube 1000' in archive)
+        finally:
+            for path in (fn, archive.index_filename):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def test_url_pattern_keys(self):
+        self.assertEqual(
+            url_pattern_keys(r'https?://(?:www\.)?example\.com/(?P<id>\d+)'),
+            set([('/', 'example.com'), ('/', 'www.example.com')]))
+        self.assertEqual(
+            url_pattern_keys(r'(?:https?:)?//(?:[^/?#]+\.)?(?:foo|bar)\.example\.com(?:[/?#]|$)'),
+            set([('/?#', 'foo.example.com'), ('/?#', 'bar.example.com')]))
+        self.assertEqual(
+            url_pattern_keys(r'''(?x)
+                https?://
+                    (?:
+                        (?:www\.)?example\.com/watch|  # comment
+                        example\.org/v
+                    )/(?P<id>\d+)'''),
+            set([('/', 'example.com'), ('/', 'www.example.com'), ('/', 'example.org')]))
+        self.assertEqual(url_pattern_keys(r'foo(?P<n>\d*):'), set([('prefix', 'foo')]))
+        # [^.] may match "/", the host is not necessarily example.com
+        self.assertEqual(url_pattern_keys(r'https?://[^.]+\.example\.com/'), None)
+        # May be followed by ".evil.com"
+        self.assertEqual(url_pattern_keys(r'https?://example\.com'), None)
+        self.assertEqual(url_pattern_keys(r'.*'), None)
+
+        index = URLPatternIndex([
+            r'https?://(?:www\.)?example\.com/', r'.*', None, r'foo:', r'https?://[^/]+\.example\.org/'])
+        self.assertEqual(index.candidates('http://www.example.com/x'), [0, 1, 2])
+        self.assertEqual(index.candidates('http://a.b.example.org/x'), [1, 2, 4])
+        self.assertEqual(index.candidates('FOO:bar'), [1, 2, 3])
+        self.assertEqual(index.candidates('http://example.net/'), [1, 2])
+
     def test_unified_dates(self):
         self.assertEqual(unified_strdate('December 21, 2010'), '20101221')
         self.assertEqual(unified_strdate('8/7/2009'), '20090708')
@@ -631,13 +726,14 @@ class TestUtil(unittest.TestCase):
                 for i in range(firstid, upto):
                     yield i
 
-            pl = OnDemandPagedList(get_page, pagesize)
-            got = pl.getslice(*sliceargs)
-            self.assertEqual(got, expected)
+            for workers in (1, 3):
+                pl = OnDemandPagedList(get_page, pagesize)
+                got = pl.getslice(*sliceargs, workers=workers)
+                self.assertEqual(got, expected)
 
-            iapl = InAdvancePagedList(get_page, size // pagesize + 1, pagesize)
-            got = iapl.getslice(*sliceargs)
-            self.assertEqual(got, expected)
+                iapl = InAdvancePagedList(get_page, size // pagesize + 1, pagesize)
+                got = iapl.getslice(*sliceargs, workers=workers)
+                self.assertEqual(got, expected)
 
         testPL(5, 2, (), [0, 1, 2, 3, 4])
         testPL(5, 2, (1,), [1, 2, 3, 4])
@@ -648,6 +744,86 @@ class TestUtil(unittest.TestCase):
         testPL(5, 2, (2, 99), [2, 3, 4])
         testPL(5, 2, (20, 99), [])
 
+    def test_paged_list_prefetch(self):
+        fetched = []
+
+        def get_page(pagenum):
+            fetched.append(pagenum)
+            return range(pagenum * 10, min(95, pagenum * 10 + 10))
+
+        pl = OnDemandPagedList(get_page, 10, use_cache=False)
+        self.assertEqual(pl.getslice(workers=4), list(range(95)))
+        # Pages past the last one are requested at most once per worker
+        self.assertEqual(sorted(fetched)[:10], list(range(10)))
+        self.assertTrue(len(fetched) <= 10 + 4, fetched)
+
+        del fetched[:]
+        self.assertEqual(pl.getslice(5, 25, workers=4), list(range(5, 25)))
+        self.assertEqual(sorted(fetched), [0, 1, 2])
+
+    def test_ordered_parallel_map(self):
+        self.assertEqual(list(ordered_parallel_map(lambda x: x * 2, range(10), 3)), list(range(0, 20, 2)))
+
+        def fail(x):
+            if x == 5:
+                raise ValueError(x)
+            return x
+
+        results = ordered_parallel_map(fail, range(10), 3)
+        self.assertEqual([next(results) for _ in range(5)], list(range(5)))
+        self.assertRaises(ValueError, next, results)
+
+    def test_ordered_parallel_map_close(self):
+        started, returned = [], []
+
+        def func(x):
+            started.append(x)
+            time.sleep(0.1)
+            returned.append(x)
+            return x
+
+        results = ordered_parallel_map(func, range(100), 4)
+        self.assertEqual(next(results), 0)
+        results.close()
+        # The calls in progress have returned and no other one is made
+        self.assertEqual(sorted(started), sorted(returned))
+        self.assertTrue(len(started) < 100, started)
+        time.sleep(0.2)
+        self.assertEqual(sorted(started), sorted(returned))
+
+    def test_fragment_sequence(self):
+        seq = FragmentSequence(
+            'seg-%(Number)d-%(Time)d-%(Bandwidth)d.m4s',
+            [(1, 0, 2000, 3), (4, 10000, 1000, 2)], timescale=1000, bandwidth=500,
+            location_key='path')
+        expected = [
+            {'path': 'seg-1-0-500.m4s', 'duration': 2.0},
+            {'path': 'seg-2-2000-500.m4s', 'duration': 2.0},
+            {'path': 'seg-3-4000-500.m4s', 'duration': 2.0},
+            {'path': 'seg-4-10000-500.m4s', 'duration': 1.0},
+            {'path': 'seg-5-11000-500.m4s', 'duration': 1.0},
+        ]
+        self.assertEqual(len(seq), 5)
+        self.assertEqual(list(seq), expected)
+        self.assertEqual(seq, expected)
+        for i in range(-5, 5):
+            self.assertEqual(seq[i], expected[i])
+        self.assertEqual(seq[:1], expected[:1])
+        self.assertEqual(seq[2:], expected[2:])
+        self.assertRaises(IndexError, lambda: seq[5])
+
+        init = {'url': 'http://example.com/init.mp4'}
+        with_init = [init] + seq
+        self.assertTrue(isinstance(with_init, FragmentSequence))
+        self.assertEqual(len(with_init), 6)
+        self.assertEqual(with_init[0], init)
+        self.assertEqual(with_init, [init] + expected)
+        self.assertEqual(len(seq), 5)
+
+        self.assertEqual(
+            json.loads(json.dumps({'fragments': with_init}, default=json_default)),
+            {'fragments': [init] + expected})
+
     def test_read_batch_urls(self):
         f = io.StringIO('''\xef\xbb\xbf foo
             bar\r
@@ -9,6 +9,7 @@ import copy
 import datetime
 import errno
 import fileinput
+import functools
 import io
 import itertools
 import json
@@ -21,6 +22,7 @@ import shutil
 import subprocess
 import socket
 import sys
+import threading
 import time
 import tokenize
 import traceback
@@ -45,12 +47,14 @@ from .compat import (
 from .utils import (
     age_restricted,
     args_to_str,
+    BoundedWorkerPool,
     ContentTooShortError,
     date_from_str,
     DateRange,
     DEFAULT_OUTTMPL,
     determine_ext,
     determine_protocol,
+    DownloadArchive,
     DownloadError,
     encode_compat_str,
     encodeFilename,
@@ -60,11 +64,13 @@ from .utils import (
     format_bytes,
     formatSeconds,
     GeoRestrictedError,
+    HTTPConnectionPool,
     int_or_none,
     ISO3166Utils,
-    locked_file,
+    json_default,
     make_HTTPS_handler,
     MaxDownloadsReached,
+    ordered_parallel_map,
     orderedSet,
     PagedList,
     parse_filesize,
@@ -86,6 +92,8 @@ from .utils import (
     subtitles_filename,
     UnavailableVideoError,
     url_basename,
+    url_pattern_keys,
+    URLPatternIndex,
     version_tuple,
     write_json_file,
     write_string,
@@ -94,12 +102,15 @@ from .utils import (
     YoutubeDLHandler,
     YoutubeDLRedirectHandler,
 )
-from .cache import Cache
-from .extractor import get_info_extractor, gen_extractor_classes, _LAZY_LOADER
+from .cache import Cache, ResponseCache
+from .extractor import get_info_extractor, gen_extractor_classes, _LAZY_LOADER, _URL_PATTERN_KEYS
+from .extractor.common import InfoExtractor, SearchInfoExtractor
 from .extractor.openload import PhantomJSwrapper
-from .downloader import get_suitable_downloader
+from .downloader import get_suitable_downloader, FileDownloader
+from .downloader.common import CombinedProgress
 from .downloader.rtmp import rtmpdump_version
 from .postprocessor import (
+    FFmpegCopyEditsPP,
     FFmpegFixupM3u8PP,
     FFmpegFixupM4aPP,
     FFmpegFixupStretchedPP,
@@ -173,6 +184,18 @@ class YoutubeDL(object):
     playlist_items:    Specific indices of playlist to download.
     playlistreverse:   Download playlist items in reverse order.
     playlistrandom:    Download playlist items in random order.
+    playlist_workers:  Number of playlist entries to extract in parallel
+                       ahead of the one being processed. Entries are still
+                       processed and downloaded one after another, in order.
+                       Pages of paged playlists are fetched by as many
+                       threads in parallel, even with extract_flat.
+    parallel_formats:  Download the formats of a merged format (e.g.
+                       bestvideo+bestaudio) at the same time.
+    sidecar_workers:   Number of subtitles and thumbnails of a video to
+                       download at the same time (default is 1).
+    sidecar_background: Download the subtitles and thumbnails of a video
+                       while the video itself is being downloaded. They
+                       are waited for before post-processing.
     matchtitle:        Download only matching titles.
     rejecttitle:       Reject downloads for matching titles.
     logger:            Log messages to a logging.Logger instance.
@@ -194,6 +217,11 @@ class YoutubeDL(object):
     skip_download:     Skip the actual download of the video file
     cachedir:          Location of the cache files in the filesystem.
                        False to disable filesystem cache.
+    http_cache:        Keep the HTTP responses to extractor requests in the
+                       cache directory and revalidate them instead of
+                       downloading them again.
+    http_cache_size:   Maximum size of the HTTP response cache in bytes
+                       (default is 100MiB).
     noplaylist:        Download single video instead of a playlist if in doubt.
     age_limit:         An integer representing the user's age in years.
                        Unsuitable videos for the given age are skipped.
@@ -232,6 +260,12 @@ class YoutubeDL(object):
                                youtube_dl/postprocessor/__init__.py for a list.
                        as well as any further keyword arguments for the
                        postprocessor.
+    postprocessor_workers: Number of downloaded files to post-process at once.
+                       With more than one, files are post-processed in
+                       background threads while the next videos are
+                       being downloaded. The download archive is updated
+                       once the post-processing of a video has succeeded,
+                       download() waits for it before returning.
     progress_hooks:    A list of functions that get called on download
                        progress, with a dictionary with the entries
                        * status: One of "downloading", "error", or "finished".
@@ -256,6 +290,8 @@ class YoutubeDL(object):
 
                        Progress hooks are guaranteed to be called at least once
                        (with status "finished") if the download is successful.
+                       Updates with status "downloading" are rate-limited,
+                       see progress_interval.
     merge_output_format: Extension to use when merging formats.
     fixup:             Automatically correct known faults of the file.
                        One of:
@@ -300,13 +336,14 @@ class YoutubeDL(object):
     hls_prefer_native: Use the native HLS downloader instead of ffmpeg/avconv
                        if True, otherwise use ffmpeg/avconv if False, otherwise
                        use downloader suggested by extractor if None.
+                       Live streams are only downloaded natively if True.
 
     The following parameters are not used by YoutubeDL itself, they are used by
     the downloader (see youtube_dl/downloader/common.py):
     nopart, updatetime, buffersize, ratelimit, min_filesize, max_filesize, test,
     noresizebuffer, retries, continuedl, noprogress, consoletitle,
     xattr_set_filesize, external_downloader_args, hls_use_mpegts,
-    http_chunk_size.
+    http_chunk_size, http_connections, concurrent_fragments, progress_interval.
 
     The following options are used by the post processors:
     prefer_ffmpeg:     If False, use avconv instead of ffmpeg if both are available,
@@ -349,10 +386,19 @@ class YoutubeDL(object):
             params = {}
         self._ies = []
         self._ies_instances = {}
+        self._ies_index = None
+        self._ies_index_lock = threading.Lock()
         self._pps = []
         self._progress_hooks = []
         self._download_retcode = 0
         self._num_downloads = 0
+        self._archive = None
+        self._pp_pool = None
+        self._sidecar_pool = None
+        self._format_selectors = {}
+        # Messages printed by a thread are held back in
+        # _output_buffer.messages when it is set, see __prefetch_playlist_entry
+        self._output_buffer = threading.local()
         self._screen_file = [sys.stdout, sys.stderr][params.get('logtostderr', False)]
         self._err_file = sys.stderr
         self.params = {
@@ -361,6 +407,7 @@ class YoutubeDL(object):
         }
         self.params.update(params)
         self.cache = Cache(self)
+        self.response_cache = ResponseCache(self)
 
         def check_deprecated(param, option, suggestion):
             if self.params.get(param) is not None:
@@ -455,11 +502,68 @@ class YoutubeDL(object):
 
     def add_info_extractor(self, ie):
         """Add an InfoExtractor object to the end of the list."""
-        self._ies.append(ie)
+        with self._ies_index_lock:
+            self._ies.append(ie)
+            self._ies_index = None
         if not isinstance(ie, type):
             self._ies_instances[ie.ie_key()] = ie
             ie.set_downloader(self)
 
+    @staticmethod
+    def _ie_url_pattern(ie):
+        """The regular expression ie.suitable() matches URLs with, if known"""
+        ie_class = ie if isinstance(ie, type) else type(ie)
+        for klass in ie_class.__mro__:
+            if 'suitable' in klass.__dict__:
+                break
+        else:
+            return None
+        if klass is InfoExtractor or klass.__name__ == 'LazyLoadExtractor':
+            return ie._VALID_URL or None
+        elif klass is SearchInfoExtractor:
+            return ie._make_valid_url()
+        return None
+
+    @classmethod
+    def _ie_url_pattern_keys(cls, ie):
+        """The url_pattern_keys of the URL pattern of ie, None if unknown"""
+        pattern = cls._ie_url_pattern(ie)
+        return url_pattern_keys(pattern) if pattern is not None else None
+
+    def _build_ies_index(self, prebuilt_keys):
+        """
+        Build the dispatch index of the registered IEs, using the keys of
+        prebuilt_keys (ie_key -> url_pattern_keys) where available.
+        """
+        keys = []
+        for ie in self._ies:
+            ie_key = ie.ie_key()
+            if ie_key in prebuilt_keys:
+                keys.append(prebuilt_keys[ie_key])
+            else:
+                keys.append(self._ie_url_pattern_keys(ie))
+        return URLPatternIndex(keys=keys)
+
+    def _candidate_ies(self, url):
+        """
+        Return the registered IEs that may be suitable for url, in order.
+
+        IEs whose URL pattern cannot match according to the dispatch index
+        are left out, the ones with a custom suitable() are always included.
+        The index is only used with the keys prebuilt by the lazy extractors
+        module, deriving them from all the patterns takes far longer than
+        trying every IE for a few URLs.
+        """
+        index = self._ies_index
+        if index is None:
+            if _URL_PATTERN_KEYS is None:
+                return list(self._ies)
+            with self._ies_index_lock:
+                index = self._ies_index
+                if index is None:
+                    index = self._ies_index = self._build_ies_index(_URL_PATTERN_KEYS)
+        return [self._ies[pos] for pos in index.candidates(url)]
+
     def get_info_extractor(self, ie_key):
         """
         Get an instance of an IE with name ie_key, it will try to get one from
@@ -508,8 +612,17 @@ class YoutubeDL(object):
     def _write_string(self, s, out=None):
         write_string(s, out=out, encoding=self.params.get('encoding'))
 
+    def __buffer_output(self, write, *args):
+        messages = getattr(self._output_buffer, 'messages', None)
+        if messages is None:
+            return False
+        messages.append((write, args))
+        return True
+
     def to_stdout(self, message, skip_eol=False, check_quiet=False):
         """Print message to stdout if not in quiet mode."""
+        if self.__buffer_output(self.to_stdout, message, skip_eol, check_quiet):
+            return
         if self.params.get('logger'):
             self.params['logger'].debug(message)
         elif not check_quiet or not self.params.get('quiet', False):
@@ -522,6 +635,8 @@ class YoutubeDL(object):
     def to_stderr(self, message):
         """Print message to stderr."""
         assert isinstance(message, compat_str)
+        if self.__buffer_output(self.to_stderr, message):
+            return
         if self.params.get('logger'):
             self.params['logger'].error(message)
         else:
@@ -564,6 +679,7 @@ class YoutubeDL(object):
 
     def __exit__(self, *args):
         self.restore_console_title()
+        self._connection_pool.close()
 
         if self.params.get('cookiefile') is not None:
             self.cookiejar.save(ignore_discard=True, ignore_expires=True)
@@ -785,7 +901,7 @@ class YoutubeDL(object):
         if ie_key:
             ies = [self.get_info_extractor(ie_key)]
         else:
-            ies = self._ies
+            ies = self._candidate_ies(url)
 
         for ie in ies:
             if not ie.suitable(url):
@@ -823,8 +939,17 @@ class YoutubeDL(object):
         return wrapper
 
     @__handle_extraction_exceptions
-    def __extract_info(self, url, ie, download, extra_info, process):
-        ie_result = ie.extract(url)
+    def __extract_info(self, url, ie, download, extra_info, process, prefetched=None):
+        if prefetched is None:
+            ie_result = ie.extract(url)
+        else:
+            # Extracted ahead of time by __prefetch_playlist_entry, its
+            # messages and errors are reported now in playlist order
+            ie_result, err, messages = prefetched
+            for write, args in messages:
+                write(*args)
+            if err is not None:
+                raise err
         if ie_result is None:  # Finished already (backwards compatibility; listformats and friends should be moved here)
             return
         if isinstance(ie_result, list):
@@ -1009,7 +1134,8 @@ class YoutubeDL(object):
                     ))
             else:
                 entries = ie_entries.getslice(
-                    playliststart, playlistend)
+                    playliststart, playlistend,
+                    workers=self.params.get('playlist_workers') or 1)
             n_entries = len(entries)
             report_download(n_entries)
         else:  # iterable
@@ -1030,34 +1156,57 @@ class YoutubeDL(object):
 
         x_forwarded_for = ie_result.get('__x_forwarded_for_ip')
 
-        for i, entry in enumerate(entries, 1):
-            self.to_screen('[download] Downloading video %s of %s' % (i, n_entries))
-            # This __x_forwarded_for_ip thing is a bit ugly but requires
-            # minimal changes
-            if x_forwarded_for:
-                entry['__x_forwarded_for_ip'] = x_forwarded_for
-            extra = {
-                'n_entries': n_entries,
-                'playlist': playlist,
-                'playlist_id': ie_result.get('id'),
-                'playlist_title': ie_result.get('title'),
-                'playlist_uploader': ie_result.get('uploader'),
-                'playlist_uploader_id': ie_result.get('uploader_id'),
-                'playlist_index': playlistitems[i - 1] if playlistitems else i + playliststart,
-                'extractor': ie_result['extractor'],
-                'webpage_url': ie_result['webpage_url'],
-                'webpage_url_basename': url_basename(ie_result['webpage_url']),
-                'extractor_key': ie_result['extractor_key'],
-            }
+        # Entries are extracted ahead of time in parallel while the current
+        # one is being processed, the processing itself stays sequential
+        playlist_workers = self.params.get('playlist_workers') or 1
+        prefetched_entries = None
+        if playlist_workers > 1 and not self.params.get('extract_flat', False):
+            # The IEs are looked up and initialized beforehand in this thread,
+            # the workers only run their extract()
+            prefetched_entries = ordered_parallel_map(
+                self.__prefetch_playlist_entry,
+                [(entry, self.__prefetch_ie(entry)) for entry in entries],
+                playlist_workers)
 
-            reason = self._match_entry(entry, incomplete=True)
-            if reason is not None:
-                self.to_screen('[download] ' + reason)
-                continue
+        try:
+            for i, entry in enumerate(entries, 1):
+                prefetched = next(prefetched_entries) if prefetched_entries else None
+                self.to_screen('[download] Downloading video %s of %s' % (i, n_entries))
+                # This __x_forwarded_for_ip thing is a bit ugly but requires
+                # minimal changes
+                if x_forwarded_for:
+                    entry['__x_forwarded_for_ip'] = x_forwarded_for
+                extra = {
+                    'n_entries': n_entries,
+                    'playlist': playlist,
+                    'playlist_id': ie_result.get('id'),
+                    'playlist_title': ie_result.get('title'),
+                    'playlist_uploader': ie_result.get('uploader'),
+                    'playlist_uploader_id': ie_result.get('uploader_id'),
+                    'playlist_index': playlistitems[i - 1] if playlistitems else i + playliststart,
+                    'extractor': ie_result['extractor'],
+                    'webpage_url': ie_result['webpage_url'],
+                    'webpage_url_basename': url_basename(ie_result['webpage_url']),
+                    'extractor_key': ie_result['extractor_key'],
+                }
+
+                reason = self._match_entry(entry, incomplete=True)
+                if reason is not None:
+                    self.to_screen('[download] ' + reason)
+                    continue
 
-            entry_result = self.__process_iterable_entry(entry, download, extra)
-            # TODO: skip failed (empty) entries?
-            playlist_results.append(entry_result)
+                if prefetched is not None:
+                    url, ie = prefetched[:2]
+                    entry_result = self.__extract_info(
+                        url, ie, download, extra, True, prefetched=prefetched[2:])
+                else:
+                    entry_result = self.__process_iterable_entry(
+                        entry, download, extra)
+                # TODO: skip failed (empty) entries?
+                playlist_results.append(entry_result)
+        finally:
+            if prefetched_entries is not None:
+                prefetched_entries.close()
         ie_result['entries'] = playlist_results
         self.to_screen('[download] Finished downloading playlist: %s' % playlist)
         return ie_result
@@ -1067,6 +1216,55 @@ class YoutubeDL(object):
         return self.process_ie_result(
             entry, download=download, extra_info=extra_info)
 
+    def __prefetch_ie(self, entry):
+        """
+        Return the initialized IE an url entry of a playlist is to be
+        extracted with ahead of time, or None if the entry is to be handled
+        the regular way: it is not an url entry, would be skipped anyway or
+        no working IE could be set up for it, which is then reported in
+        playlist order.
+        """
+        if entry.get('_type') != 'url' or self._match_entry(entry, incomplete=True) is not None:
+            return None
+        url = sanitize_url(entry['url'])
+        try:
+            ie_key = entry.get('ie_key')
+            if not ie_key:
+                ie_key = next((ie.ie_key() for ie in self._candidate_ies(url) if ie.suitable(url)), None)
+                if not ie_key:
+                    return None
+            ie = self.get_info_extractor(ie_key)
+            if not ie.working():
+                return None
+            ie.initialize()
+        except Exception:
+            return None
+        return ie
+
+    def __prefetch_playlist_entry(self, item):
+        """
+        Extract an url entry of a playlist with the IE returned by
+        __prefetch_ie without processing it. Called from worker threads.
+
+        Returns None if the entry is to be handled the regular way, otherwise
+        a tuple of the url, the IE, the raw ie_result, the exception raised
+        by the extraction, if any, and the messages printed meanwhile.
+        """
+        entry, ie = item
+        if ie is None:
+            return None
+        url = sanitize_url(entry['url'])
+        ie_result = err = None
+        self._output_buffer.messages = []
+        try:
+            ie_result = ie.extract(url)
+        except Exception as e:
+            err = e
+        finally:
+            messages = self._output_buffer.messages
+            self._output_buffer.messages = None
+        return url, ie, ie_result, err, messages
+
     def _build_format_filter(self, filter_spec):
         " Returns a function to filter the formats according to the filter_spec "
 
@@ -1264,6 +1462,23 @@ class YoutubeDL(object):
                 selectors.append(current_selector)
             return selectors
 
+        def _formats_by_kind(ctx):
+            # Selectors only read ctx, the classification of its formats is
+            # shared by all the selectors using the same formats
+            formats_by_kind = ctx.get('formats_by_kind')
+            if formats_by_kind is None:
+                formats_by_kind = ctx['formats_by_kind'] = {
+                    'audiovideo': [], 'audio': [], 'video': [],
+                }
+                for f in ctx['formats']:
+                    if f.get('vcodec') == 'none':
+                        formats_by_kind['audio'].append(f)
+                    if f.get('acodec') == 'none':
+                        formats_by_kind['video'].append(f)
+                    if f.get('vcodec') != 'none' and f.get('acodec') != 'none':
+                        formats_by_kind['audiovideo'].append(f)
+            return formats_by_kind
+
         def _build_selector_function(selector):
             if isinstance(selector, list):
                 fs = [_build_selector_function(s) for s in selector]
@@ -1288,7 +1503,7 @@ class YoutubeDL(object):
                 format_spec = selector.selector
 
                 def selector_function(ctx):
-                    formats = list(ctx['formats'])
+                    formats = ctx['formats']
                     if not formats:
                         return
                     if format_spec == 'all':
@@ -1296,9 +1511,7 @@ class YoutubeDL(object):
                             yield f
                     elif format_spec in ['best', 'worst', None]:
                         format_idx = 0 if format_spec == 'worst' else -1
-                        audiovideo_formats = [
-                            f for f in formats
-                            if f.get('vcodec') != 'none' and f.get('acodec') != 'none']
+                        audiovideo_formats = _formats_by_kind(ctx)['audiovideo']
                         if audiovideo_formats:
                             yield audiovideo_formats[format_idx]
                         # for extractors with incomplete formats (audio only (soundcloud)
@@ -1307,27 +1520,19 @@ class YoutubeDL(object):
                         elif ctx['incomplete_formats']:
                             yield formats[format_idx]
                     elif format_spec == 'bestaudio':
-                        audio_formats = [
-                            f for f in formats
-                            if f.get('vcodec') == 'none']
+                        audio_formats = _formats_by_kind(ctx)['audio']
                         if audio_formats:
                             yield audio_formats[-1]
                     elif format_spec == 'worstaudio':
-                        audio_formats = [
-                            f for f in formats
-                            if f.get('vcodec') == 'none']
+                        audio_formats = _formats_by_kind(ctx)['audio']
                         if audio_formats:
                             yield audio_formats[0]
                     elif format_spec == 'bestvideo':
-                        video_formats = [
-                            f for f in formats
-                            if f.get('acodec') == 'none']
+                        video_formats = _formats_by_kind(ctx)['video']
                         if video_formats:
                             yield video_formats[-1]
                     elif format_spec == 'worstvideo':
-                        video_formats = [
-                            f for f in formats
-                            if f.get('acodec') == 'none']
+                        video_formats = _formats_by_kind(ctx)['video']
                         if video_formats:
                             yield video_formats[0]
                     else:
@@ -1380,15 +1585,20 @@ class YoutubeDL(object):
 
                 def selector_function(ctx):
                     for pair in itertools.product(
-                            video_selector(copy.deepcopy(ctx)), audio_selector(copy.deepcopy(ctx))):
+                            video_selector(ctx), audio_selector(ctx)):
                         yield _merge(pair)
 
             filters = [self._build_format_filter(f) for f in selector.filters]
+            if not filters:
+                return selector_function
 
             def final_selector(ctx):
-                ctx_copy = copy.deepcopy(ctx)
+                formats = ctx['formats']
                 for _filter in filters:
-                    ctx_copy['formats'] = list(filter(_filter, ctx_copy['formats']))
+                    formats = list(filter(_filter, formats))
+                # The formats are classified again for the filtered list
+                ctx_copy = dict((k, v) for k, v in ctx.items() if k != 'formats_by_kind')
+                ctx_copy['formats'] = formats
                 return selector_function(ctx_copy)
             return final_selector
 
@@ -1419,7 +1629,15 @@ class YoutubeDL(object):
                 self.counter -= 1
 
         parsed_selector = _parse_format_selection(iter(TokenIterator(tokens)))
-        return _build_selector_function(parsed_selector)
+        selector_function = _build_selector_function(parsed_selector)
+
+        def format_selector(ctx):
+            # The formats are selected from ctx without copying them, only
+            # the selected ones are copied so that they can be altered freely
+            ctx = dict(ctx)
+            for f in selector_function(ctx):
+                yield copy.deepcopy(f)
+        return format_selector
 
     def _calc_headers(self, info_dict):
         res = std_headers.copy()
@@ -1637,7 +1855,10 @@ class YoutubeDL(object):
             if self.params.get('verbose'):
                 self._write_string('[debug] Default format spec: %s\n' % req_format)
 
-        format_selector = self.build_format_selector(req_format)
+        # The same spec is used for all the videos most of the time
+        format_selector = self._format_selectors.get(req_format)
+        if format_selector is None:
+            format_selector = self._format_selectors[req_format] = self.build_format_selector(req_format)
 
         # While in format selection we may need to have an access to the original
         # format set in order to calculate some metrics or do some processing.
@@ -1758,7 +1979,7 @@ class YoutubeDL(object):
             self.to_stdout(formatSeconds(info_dict['duration']))
         print_mandatory('format')
         if self.params.get('forcejson', False):
-            self.to_stdout(json.dumps(info_dict))
+            self.to_stdout(json.dumps(info_dict, default=json_default))
 
     def process_info(self, info_dict):
         """Process a single resolved IE result."""
@@ -1845,6 +2066,9 @@ class YoutubeDL(object):
         subtitles_are_requested = any([self.params.get('writesubtitles', False),
                                        self.params.get('writeautomaticsub')])
 
+        # Subtitles and thumbnails fetched from the network
+        sidecars = []
+
         if subtitles_are_requested and info_dict.get('requested_subtitles'):
             # subtitles download errors are already managed as troubles in relevant IE
             # that way it will silently go on when used with unsupporting IE
@@ -1867,15 +2091,8 @@ class YoutubeDL(object):
                             self.report_error('Cannot write subtitles file ' + sub_filename)
                             return
                     else:
-                        try:
-                            sub_data = ie._request_webpage(
-                                sub_info['url'], info_dict['id'], note=False).read()
-                            with io.open(encodeFilename(sub_filename), 'wb') as subfile:
-                                subfile.write(sub_data)
-                        except (ExtractorError, IOError, OSError, ValueError) as err:
-                            self.report_warning('Unable to download subtitle for "%s": %s' %
-                                                (sub_lang, error_to_compat_str(err)))
-                            continue
+                        sidecars.append(functools.partial(
+                            self._download_subtitle, ie, info_dict, sub_lang, sub_info, sub_filename))
 
         if self.params.get('writeinfojson', False):
             infofn = replace_extension(filename, 'info.json', info_dict.get('ext'))
@@ -1889,14 +2106,17 @@ class YoutubeDL(object):
                     self.report_error('Cannot write metadata to JSON file ' + infofn)
                     return
 
-        self._write_thumbnails(info_dict, filename)
+        sidecars.extend(self._thumbnail_downloads(info_dict, filename))
+        self._download_sidecars(sidecars)
 
         if not self.params.get('skip_download', False):
             try:
-                def dl(name, info):
-                    fd = get_suitable_downloader(info, self.params)(self, self.params)
+                def dl(name, info, params=None, progress_hook=None):
+                    fd = get_suitable_downloader(info, self.params)(self, params or self.params)
                     for ph in self._progress_hooks:
                         fd.add_progress_hook(ph)
+                    if progress_hook is not None:
+                        fd.add_progress_hook(progress_hook)
                     if self.params.get('verbose'):
                         self.to_screen('[debug] Invoking downloader on %r' % info.get('url'))
                     return fd.download(name, info)
@@ -1945,6 +2165,7 @@ class YoutubeDL(object):
                             '[download] %s has already been downloaded and '
                             'merged' % filename)
                     else:
+                        format_downloads = []
                         for f in requested_formats:
                             new_info = dict(info_dict)
                             new_info.update(f)
@@ -1954,8 +2175,13 @@ class YoutubeDL(object):
                             if not ensure_dir_exists(fname):
                                 return
                             downloaded.append(fname)
-                            partial_success = dl(fname, new_info)
-                            success = success and partial_success
+                            format_downloads.append((fname, new_info))
+                        if self.params.get('parallel_formats') and len(format_downloads) > 1:
+                            success = self.__download_formats_in_parallel(dl, format_downloads)
+                        else:
+                            for fname, new_info in format_downloads:
+                                partial_success = dl(fname, new_info)
+                                success = success and partial_success
                         info_dict['__postprocessors'] = postprocessors
                         info_dict['__files_to_merge'] = downloaded
                 else:
@@ -2033,12 +2259,89 @@ class YoutubeDL(object):
                     else:
                         assert fixup_policy in ('ignore', 'never')
 
-                try:
-                    self.post_process(filename, info_dict)
-                except (PostProcessingError) as err:
-                    self.report_error('postprocessing: %s' % str(err))
-                    return
-                self.record_download_archive(info_dict)
+                # Post-processors may need the subtitles and thumbnails
+                self._wait_for_sidecars()
+                pp_workers = self.params.get('postprocessor_workers') or 1
+                if pp_workers > 1:
+                    if self._pp_pool is None:
+                        self._pp_pool = BoundedWorkerPool(pp_workers)
+                    self._pp_pool.submit(self.__post_process_and_record, filename, info_dict)
+                else:
+                    self.__post_process_and_record(filename, info_dict)
+
+    def __download_formats_in_parallel(self, dl, format_downloads):
+        # The downloaders only print their own destination and completion,
+        # the progress of the formats is reported as a whole
+        progress = CombinedProgress(FileDownloader(self, self.params), len(format_downloads))
+        params = dict(self.params, noprogress=True)
+
+        def dl_format(args):
+            i, (fname, info) = args
+            try:
+                return True, dl(fname, info, params, progress.hook(i))
+            except Exception as err:
+                return False, err
+
+        # Every download is waited for before a failure is raised
+        results = list(ordered_parallel_map(
+            dl_format, enumerate(format_downloads), len(format_downloads)))
+        for ok, result in results:
+            if not ok:
+                raise result
+        return all(result for _, result in results)
+
+    def __post_process_and_record(self, filename, info_dict):
+        try:
+            success = self.post_process(filename, info_dict)
+        except (PostProcessingError) as err:
+            self.report_error('postprocessing: %s' % str(err))
+            return
+        if success:
+            self.record_download_archive(info_dict)
+
+    def _download_subtitle(self, ie, info_dict, sub_lang, sub_info, sub_filename):
+        try:
+            sub_data = ie._request_webpage(
+                sub_info['url'], info_dict['id'], note=False).read()
+            with io.open(encodeFilename(sub_filename), 'wb') as subfile:
+                subfile.write(sub_data)
+        except (ExtractorError, IOError, OSError, ValueError) as err:
+            self.report_warning('Unable to download subtitle for "%s": %s' %
+                                (sub_lang, error_to_compat_str(err)))
+
+    def _download_sidecars(self, downloads):
+        """
+        Run the subtitle and thumbnail downloads, sidecar_workers at a time.
+
+        With sidecar_background, the downloads are only started and are
+        waited for by _wait_for_sidecars().
+        """
+        if not downloads:
+            return
+        workers = self.params.get('sidecar_workers') or 1
+        if self.params.get('sidecar_background'):
+            # Left over by a previous video whose download failed
+            self._wait_for_sidecars()
+            self._sidecar_pool = BoundedWorkerPool(workers, max_pending=len(downloads))
+            for download in downloads:
+                self._sidecar_pool.submit(download)
+        elif workers > 1:
+            for _ in ordered_parallel_map(lambda download: download(), downloads, workers):
+                pass
+        else:
+            for download in downloads:
+                download()
+
+    def _wait_for_sidecars(self, reraise=True):
+        if self._sidecar_pool is not None:
+            pool, self._sidecar_pool = self._sidecar_pool, None
+            pool.join(reraise)
+
+    def wait_for_post_processing(self, reraise=True):
+        """Wait for the files being downloaded or post-processed in the background."""
+        self._wait_for_sidecars(reraise)
+        if self._pp_pool is not None:
+            self._pp_pool.join(reraise)
 
     def download(self, url_list):
         """Download a given list of URLs."""
@@ -2049,19 +2352,26 @@ class YoutubeDL(object):
                 and self.params.get('max_downloads') != 1):
             raise SameFileError(outtmpl)
 
-        for url in url_list:
-            try:
-                # It also downloads the videos
-                res = self.extract_info(
-                    url, force_generic_extractor=self.params.get('force_generic_extractor', False))
-            except UnavailableVideoError:
-                self.report_error('unable to download video')
-            except MaxDownloadsReached:
-                self.to_screen('[info] Maximum number of downloaded files reached.')
-                raise
-            else:
-                if self.params.get('dump_single_json', False):
-                    self.to_stdout(json.dumps(res))
+        try:
+            for url in url_list:
+                try:
+                    # It also downloads the videos
+                    res = self.extract_info(
+                        url, force_generic_extractor=self.params.get('force_generic_extractor', False))
+                except UnavailableVideoError:
+                    self.report_error('unable to download video')
+                except MaxDownloadsReached:
+                    self.to_screen('[info] Maximum number of downloaded files reached.')
+                    raise
+                else:
+                    if self.params.get('dump_single_json', False):
+                        self.to_stdout(json.dumps(res, default=json_default))
+        except Exception:
+            # Let the files being post-processed be finished, the error at
+            # hand wins over theirs
+            self.wait_for_post_processing(reraise=False)
+            raise
+        self.wait_for_post_processing()
 
         return self._download_retcode
 
@@ -2073,7 +2383,9 @@ class YoutubeDL(object):
             info = self.filter_requested_info(json.loads('\n'.join(f)))
         try:
             self.process_ie_result(info, download=True)
+            self.wait_for_post_processing()
         except DownloadError:
+            self.wait_for_post_processing(reraise=False)
             webpage_url = info.get('webpage_url')
             if webpage_url is not None:
                 self.report_warning('The info failed to download, trying with "%s"' % webpage_url)
@@ -2089,19 +2401,27 @@ class YoutubeDL(object):
             if k not in ['requested_formats', 'requested_subtitles'])
 
     def post_process(self, filename, ie_info):
-        """Run all the postprocessors on the given file."""
+        """
+        Run all the postprocessors on the given file.
+
+        Returns False if one of them has failed.
+        """
         info = dict(ie_info)
         info['filepath'] = filename
         pps_chain = []
         if ie_info.get('__postprocessors') is not None:
             pps_chain.extend(ie_info['__postprocessors'])
         pps_chain.extend(self._pps)
+        # Consecutive stream copy edits rewrite the file only once
+        pps_chain = FFmpegCopyEditsPP.coalesce(pps_chain)
+        success = True
         for pp in pps_chain:
             files_to_delete = []
             try:
                 files_to_delete, info = pp.run(info)
             except PostProcessingError as e:
                 self.report_error(e.msg)
+                success = False
             if files_to_delete and not self.params.get('keepvideo', False):
                 for old_filename in files_to_delete:
                     self.to_screen('Deleting original file %s (pass -k to keep)' % old_filename)
@@ -2109,6 +2429,7 @@ class YoutubeDL(object):
                         os.remove(encodeFilename(old_filename))
                     except (IOError, OSError):
                         self.report_warning('Unable to remove downloaded original file')
+        return success
 
     def _make_archive_id(self, info_dict):
         video_id = info_dict.get('id')
@@ -2139,15 +2460,7 @@ class YoutubeDL(object):
         if not vid_id:
             return False  # Incomplete video information
 
-        try:
-            with locked_file(fn, 'r', encoding='utf-8') as archive_file:
-                for line in archive_file:
-                    if line.strip() == vid_id:
-                        return True
-        except IOError as ioe:
-            if ioe.errno != errno.ENOENT:
-                raise
-        return False
+        return vid_id in self._get_download_archive(fn)
 
     def record_download_archive(self, info_dict):
         fn = self.params.get('download_archive')
@@ -2155,8 +2468,12 @@ class YoutubeDL(object):
             return
         vid_id = self._make_archive_id(info_dict)
         assert vid_id
-        with locked_file(fn, 'a', encoding='utf-8') as archive_file:
-            archive_file.write(vid_id + '\n')
+        self._get_download_archive(fn).add(vid_id)
+
+    def _get_download_archive(self, fn):
+        if self._archive is None or self._archive.filename != fn:
+            self._archive = DownloadArchive(fn)
+        return self._archive
 
     @staticmethod
     def format_resolution(format, default='unknown'):
@@ -2379,8 +2696,12 @@ class YoutubeDL(object):
         proxy_handler = PerRequestProxyHandler(proxies)
 
         debuglevel = 1 if self.params.get('debug_printtraffic') else 0
-        https_handler = make_HTTPS_handler(self.params, debuglevel=debuglevel)
-        ydlh = YoutubeDLHandler(self.params, debuglevel=debuglevel)
+        # Shared by all HTTP(S) requests, including the fragment downloaders
+        self._connection_pool = HTTPConnectionPool()
+        https_handler = make_HTTPS_handler(
+            self.params, debuglevel=debuglevel, connection_pool=self._connection_pool)
+        ydlh = YoutubeDLHandler(
+            self.params, debuglevel=debuglevel, connection_pool=self._connection_pool)
         redirect_handler = YoutubeDLRedirectHandler()
         data_handler = compat_urllib_request_DataHandler()
 
@@ -2419,7 +2740,11 @@ class YoutubeDL(object):
             encoding = preferredencoding()
         return encoding
 
-    def _write_thumbnails(self, info_dict, filename):
+    def _thumbnail_downloads(self, info_dict, filename):
+        """
+        Return the downloads of the requested thumbnails, see
+        _download_sidecars().
+        """
         if self.params.get('writethumbnail', False):
             thumbnails = info_dict.get('thumbnails')
             if thumbnails:
@@ -2427,12 +2752,13 @@ class YoutubeDL(object):
         elif self.params.get('write_all_thumbnails', False):
             thumbnails = info_dict.get('thumbnails')
         else:
-            return
+            return []
 
         if not thumbnails:
             # No thumbnails present, so return immediately
-            return
+            return []
 
+        downloads = []
         for t in thumbnails:
             thumb_ext = determine_ext(t['url'], 'jpg')
             suffix = '_%s' % t['id'] if len(thumbnails) > 1 else ''
@@ -2445,12 +2771,17 @@ class YoutubeDL(object):
             else:
                 self.to_screen('[%s] %s: Downloading thumbnail %s...' %
                                (info_dict['extractor'], info_dict['id'], thumb_display_id))
-                try:
-                    uf = self.urlopen(t['url'])
-                    with open(encodeFilename(thumb_filename), 'wb') as thumbf:
-                        shutil.copyfileobj(uf, thumbf)
-                    self.to_screen('[%s] %s: Writing thumbnail %sto: %s' %
-                                   (info_dict['extractor'], info_dict['id'], thumb_display_id, thumb_filename))
-                except (compat_urllib_error.URLError, compat_http_client.HTTPException, socket.error) as err:
-                    self.report_warning('Unable to download thumbnail "%s": %s' %
-                                        (t['url'], error_to_compat_str(err)))
+                downloads.append(functools.partial(
+                    self._download_thumbnail, info_dict, t, thumb_display_id))
+        return downloads
+
+    def _download_thumbnail(self, info_dict, t, thumb_display_id):
+        try:
+            uf = self.urlopen(t['url'])
+            with open(encodeFilename(t['filename']), 'wb') as thumbf:
+                shutil.copyfileobj(uf, thumbf)
+            self.to_screen('[%s] %s: Writing thumbnail %sto: %s' %
+                           (info_dict['extractor'], info_dict['id'], thumb_display_id, t['filename']))
+        except (compat_urllib_error.URLError, compat_http_client.HTTPException, socket.error) as err:
+            self.report_warning('Unable to download thumbnail "%s": %s' %
+                                (t['url'], error_to_compat_str(err)))
@@ -9,6 +9,7 @@ import codecs
 import io
 import os
 import random
+import re
 import sys
 
 
@@ -24,6 +25,7 @@ from .utils import (
     DateRange,
     decodeOption,
     DEFAULT_OUTTMPL,
+    DownloadArchive,
     DownloadError,
     expand_path,
     match_filter_func,
@@ -42,6 +44,7 @@ from .downloader import (
 )
 from .extractor import gen_extractors, list_extractors
 from .extractor.adobepass import MSO_INFO
+from .server import YoutubeDLServer
 from .YoutubeDL import YoutubeDL
 
 
@@ -172,6 +175,8 @@ def _real_main(argv=None):
             parser.error('max sleep interval must be greater than or equal to min sleep interval')
     else:
         opts.max_sleep_interval = opts.sleep_interval
+    if opts.progress_interval is not None and opts.progress_interval < 0:
+        parser.error('progress interval must be positive or 0')
     if opts.ap_mso and opts.ap_mso not in MSO_INFO:
         parser.error('Unsupported TV Provider, use --ap-list-mso to get a list of supported TV Providers')
 
@@ -188,6 +193,8 @@ def _real_main(argv=None):
         opts.retries = parse_retries(opts.retries)
     if opts.fragment_retries is not None:
         opts.fragment_retries = parse_retries(opts.fragment_retries)
+    if opts.concurrent_fragments is not None and opts.concurrent_fragments <= 0:
+        parser.error('concurrent fragments must be positive')
     if opts.buffersize is not None:
         numeric_buffersize = FileDownloader.parse_bytes(opts.buffersize)
         if numeric_buffersize is None:
@@ -198,6 +205,26 @@ def _real_main(argv=None):
         if not numeric_chunksize:
             parser.error('invalid http chunk size specified')
         opts.http_chunk_size = numeric_chunksize
+    if opts.http_cache_size is not None:
+        numeric_cache_size = FileDownloader.parse_bytes(opts.http_cache_size)
+        if numeric_cache_size is None:
+            parser.error('invalid http cache size specified')
+        opts.http_cache_size = numeric_cache_size
+    if opts.http_connections is not None and opts.http_connections <= 0:
+        parser.error('http connections must be positive')
+    if opts.playlist_workers is not None and opts.playlist_workers <= 0:
+        parser.error('playlist workers must be positive')
+    if opts.sidecar_workers is not None and opts.sidecar_workers <= 0:
+        parser.error('sidecar workers must be positive')
+    if opts.postprocessor_workers is not None and opts.postprocessor_workers <= 0:
+        parser.error('postprocessor workers must be positive')
+    if opts.serve is not None:
+        mobj = re.match(r'^(?:(?P<host>[^:]+):)?(?P<port>\d+)$', opts.serve)
+        if not mobj:
+            parser.error('invalid server address specified')
+        serve_address = (mobj.group('host') or '127.0.0.1', int(mobj.group('port')))
+    if opts.serve_workers <= 0:
+        parser.error('server workers must be positive')
     if opts.playliststart <= 0:
         raise ValueError('Playlist start must be positive')
     if opts.playlistend not in (-1, None) and opts.playlistend < opts.playliststart:
@@ -246,6 +273,8 @@ def _real_main(argv=None):
     any_getting = opts.geturl or opts.gettitle or opts.getid or opts.getthumbnail or opts.getdescription or opts.getfilename or opts.getformat or opts.getduration or opts.dumpjson or opts.dump_single_json
     any_printing = opts.print_json
     download_archive_fn = expand_path(opts.download_archive) if opts.download_archive is not None else opts.download_archive
+    if opts.index_download_archive and download_archive_fn is None:
+        parser.error('--index-download-archive requires --download-archive')
 
     # PostProcessors
     postprocessors = []
@@ -352,16 +381,23 @@ def _real_main(argv=None):
         'fragment_retries': opts.fragment_retries,
         'skip_unavailable_fragments': opts.skip_unavailable_fragments,
         'keep_fragments': opts.keep_fragments,
+        'concurrent_fragments': opts.concurrent_fragments,
         'buffersize': opts.buffersize,
         'noresizebuffer': opts.noresizebuffer,
         'http_chunk_size': opts.http_chunk_size,
+        'http_connections': opts.http_connections,
         'continuedl': opts.continue_dl,
         'noprogress': opts.noprogress,
         'progress_with_newline': opts.progress_with_newline,
+        'progress_interval': opts.progress_interval,
         'playliststart': opts.playliststart,
         'playlistend': opts.playlistend,
         'playlistreverse': opts.playlist_reverse,
         'playlistrandom': opts.playlist_random,
+        'playlist_workers': opts.playlist_workers,
+        'parallel_formats': opts.parallel_formats,
+        'sidecar_workers': opts.sidecar_workers,
+        'sidecar_background': opts.sidecar_background,
         'noplaylist': opts.noplaylist,
         'logtostderr': opts.outtmpl == '-',
         'consoletitle': opts.consoletitle,
@@ -393,6 +429,8 @@ def _real_main(argv=None):
         'max_views': opts.max_views,
         'daterange': date,
         'cachedir': opts.cachedir,
+        'http_cache': opts.http_cache,
+        'http_cache_size': opts.http_cache_size,
         'youtube_print_sig_code': opts.youtube_print_sig_code,
         'age_limit': opts.age_limit,
         'download_archive': download_archive_fn,
@@ -412,6 +450,7 @@ def _real_main(argv=None):
         'mark_watched': opts.mark_watched,
         'merge_output_format': opts.merge_output_format,
         'postprocessors': postprocessors,
+        'postprocessor_workers': opts.postprocessor_workers,
         'fixup': opts.fixup,
         'source_address': opts.source_address,
         'call_home': opts.call_home,
@@ -439,6 +478,17 @@ def _real_main(argv=None):
         'usetitle': opts.usetitle if opts.usetitle is True else None,
     }
 
+    if opts.serve is not None:
+        server = YoutubeDLServer(serve_address, ydl_opts, opts.serve_workers)
+        write_string('[server] Listening on %s:%d\n' % server.server_address[:2], out=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        sys.exit(0)
+
     with YoutubeDL(ydl_opts) as ydl:
         # Update version
         if opts.update_self:
@@ -448,9 +498,15 @@ def _real_main(argv=None):
         if opts.rm_cachedir:
             ydl.cache.remove()
 
+        if opts.index_download_archive:
+            archive = DownloadArchive(download_archive_fn)
+            ydl.to_screen(
+                '[download] Indexed %d videos of the download archive in %s'
+                % (archive.write_index(), archive.index_filename))
+
         # Maybe do nothing
         if (len(all_urls) < 1) and (opts.load_info_filename is None):
-            if opts.update_self or opts.rm_cachedir:
+            if opts.update_self or opts.rm_cachedir or opts.index_download_archive:
                 sys.exit()
 
             ydl.warn_if_short_id(sys.argv[1:] if argv is None else argv)
@@ -2,7 +2,11 @@ from __future__ import unicode_literals
 
 from math import ceil
 
-from .compat import compat_b64decode
+from .compat import (
+    compat_b64decode,
+    compat_struct_pack,
+    compat_struct_unpack,
+)
 from .utils import bytes_to_intlist, intlist_to_bytes
 
 BLOCK_SIZE_BYTES = 16
@@ -18,20 +22,16 @@ def aes_ctr_decrypt(data, key, counter):
                                returns the next counter block
     @returns {int[]}           decrypted data
     """
-    expanded_key = key_expansion(key)
     block_count = int(ceil(float(len(data)) / BLOCK_SIZE_BYTES))
+    counter_blocks = []
+    for _ in range(block_count):
+        counter_blocks += counter.next_value()
 
-    decrypted_data = []
-    for i in range(block_count):
-        counter_block = counter.next_value()
-        block = data[i * BLOCK_SIZE_BYTES: (i + 1) * BLOCK_SIZE_BYTES]
-        block += [0] * (BLOCK_SIZE_BYTES - len(block))
+    key_stream = _bytes_to_words(intlist_to_bytes(counter_blocks))
+    key_stream = _encrypt_words(key_stream, _key_schedule(intlist_to_bytes(key))[0])
+    key_stream = bytes_to_intlist(_words_to_bytes(key_stream))
 
-        cipher_counter_block = aes_encrypt(counter_block, expanded_key)
-        decrypted_data += xor(block, cipher_counter_block)
-    decrypted_data = decrypted_data[:len(data)]
-
-    return decrypted_data
+    return xor(data, key_stream)
 
 
 def aes_cbc_decrypt(data, key, iv):
@@ -43,21 +43,27 @@ def aes_cbc_decrypt(data, key, iv):
     @param {int[]} iv          16-Byte IV
     @returns {int[]}           decrypted data
     """
-    expanded_key = key_expansion(key)
-    block_count = int(ceil(float(len(data)) / BLOCK_SIZE_BYTES))
+    return bytes_to_intlist(aes_cbc_decrypt_bytes(
+        intlist_to_bytes(data), intlist_to_bytes(key), intlist_to_bytes(iv)))
 
-    decrypted_data = []
-    previous_cipher_block = iv
-    for i in range(block_count):
-        block = data[i * BLOCK_SIZE_BYTES: (i + 1) * BLOCK_SIZE_BYTES]
-        block += [0] * (BLOCK_SIZE_BYTES - len(block))
 
-        decrypted_block = aes_decrypt(block, expanded_key)
-        decrypted_data += xor(decrypted_block, previous_cipher_block)
-        previous_cipher_block = block
-    decrypted_data = decrypted_data[:len(data)]
+def aes_cbc_decrypt_bytes(data, key, iv):
+    """
+    Decrypt with aes in CBC mode, operating on byte strings
+
+    @param {bytes} data        cipher (bytes, bytearray or memoryview)
+    @param {bytes} key         16/24/32-Byte cipher key
+    @param {bytes} iv          16-Byte IV
+    @returns {bytes}           decrypted data
+    """
+    data = _to_bytes(data)
+    length = len(data)
+    data += b'\0' * (-length % BLOCK_SIZE_BYTES)
 
-    return decrypted_data
+    decrypted_words = _decrypt_words(
+        _bytes_to_words(data), _key_schedule(_to_bytes(key))[1],
+        _bytes_to_words(_to_bytes(iv)))
+    return _words_to_bytes(decrypted_words)[:length]
 
 
 def aes_cbc_encrypt(data, key, iv):
@@ -69,23 +75,13 @@ def aes_cbc_encrypt(data, key, iv):
     @param {int[]} iv          16-Byte IV
     @returns {int[]}           encrypted data
     """
-    expanded_key = key_expansion(key)
-    block_count = int(ceil(float(len(data)) / BLOCK_SIZE_BYTES))
-
-    encrypted_data = []
-    previous_cipher_block = iv
-    for i in range(block_count):
-        block = data[i * BLOCK_SIZE_BYTES: (i + 1) * BLOCK_SIZE_BYTES]
-        remaining_length = BLOCK_SIZE_BYTES - len(block)
-        block += [remaining_length] * remaining_length
-        mixed_block = xor(block, previous_cipher_block)
-
-        encrypted_block = aes_encrypt(mixed_block, expanded_key)
-        encrypted_data += encrypted_block
+    remaining_length = -len(data) % BLOCK_SIZE_BYTES
+    data = intlist_to_bytes(data + [remaining_length] * remaining_length)
 
-        previous_cipher_block = encrypted_block
-
-    return encrypted_data
+    encrypted_words = _encrypt_words(
+        _bytes_to_words(data), _key_schedule(intlist_to_bytes(key))[0],
+        _bytes_to_words(intlist_to_bytes(iv)))
+    return bytes_to_intlist(_words_to_bytes(encrypted_words))
 
 
 def key_expansion(data):
@@ -358,4 +354,164 @@ def inc(data):
     return data
 
 
-__all__ = ['aes_encrypt', 'key_expansion', 'aes_ctr_decrypt', 'aes_cbc_decrypt', 'aes_decrypt_text']
+# The functions below implement the cipher on 32-bit big-endian words, with
+# SubBytes, ShiftRows and MixColumns folded into four lookup tables per
+# direction (see the "Fast implementation on 32-bit processors" section of
+# the Rijndael proposal).  They are used for all the bulk modes of operation.
+
+def _make_t_tables():
+    te, td = [[], [], [], []], [[], [], [], []]
+    for x in range(256):
+        s = SBOX[x]
+        word = (rijndael_mul(s, 2) << 24) | (s << 16) | (s << 8) | rijndael_mul(s, 3)
+        for table in te:
+            table.append(word)
+            word = (word >> 8) | ((word & 0xFF) << 24)
+        s = SBOX_INV[x]
+        word = ((rijndael_mul(s, 0xE) << 24) | (rijndael_mul(s, 0x9) << 16)
+                | (rijndael_mul(s, 0xD) << 8) | rijndael_mul(s, 0xB))
+        for table in td:
+            table.append(word)
+            word = (word >> 8) | ((word & 0xFF) << 24)
+    return tuple(map(tuple, te)), tuple(map(tuple, td))
+
+
+(_TE0, _TE1, _TE2, _TE3), (_TD0, _TD1, _TD2, _TD3) = _make_t_tables()
+_KEY_SCHEDULE_CACHE = {}
+
+
+def _to_bytes(data):
+    return data if isinstance(data, bytes) else bytes(bytearray(data))
+
+
+def _bytes_to_words(data):
+    return compat_struct_unpack('>%dI' % (len(data) // 4), data)
+
+
+def _words_to_bytes(words):
+    return compat_struct_pack('>%dI' % len(words), *words)
+
+
+def _sub_word(word):
+    return ((SBOX[word >> 24] << 24) | (SBOX[(word >> 16) & 0xFF] << 16)
+            | (SBOX[(word >> 8) & 0xFF] << 8) | SBOX[word & 0xFF])
+
+
+def _key_schedule(key):
+    """
+    Generate (and cache) the encryption and decryption round keys
+
+    @param {bytes} key  16/24/32-Byte cipher key
+    @returns {tuple}    (encryption, decryption) round keys as 44/52/60 words each
+    """
+    schedule = _KEY_SCHEDULE_CACHE.get(key)
+    if schedule is not None:
+        return schedule
+
+    key_size_words = len(key) // 4
+    rounds = key_size_words + 6
+    enc = list(_bytes_to_words(key))
+    for i in range(key_size_words, 4 * (rounds + 1)):
+        temp = enc[-1]
+        if i % key_size_words == 0:
+            temp = _sub_word(((temp << 8) & 0xFFFFFFFF) | (temp >> 24)) ^ (RCON[i // key_size_words] << 24)
+        elif key_size_words > 6 and i % key_size_words == 4:
+            temp = _sub_word(temp)
+        enc.append(enc[i - key_size_words] ^ temp)
+
+    # Equivalent inverse cipher: reverse the round order and apply
+    # InvMixColumns to all but the first and last round keys
+    dec = []
+    for r in range(rounds, -1, -1):
+        round_key = enc[4 * r:4 * r + 4]
+        if 0 < r < rounds:
+            round_key = [
+                _TD0[SBOX[w >> 24]] ^ _TD1[SBOX[(w >> 16) & 0xFF]]
+                ^ _TD2[SBOX[(w >> 8) & 0xFF]] ^ _TD3[SBOX[w & 0xFF]]
+                for w in round_key]
+        dec += round_key
+
+    if len(_KEY_SCHEDULE_CACHE) >= 64:
+        _KEY_SCHEDULE_CACHE.clear()
+    schedule = _KEY_SCHEDULE_CACHE[key] = (tuple(enc), tuple(dec))
+    return schedule
+
+
+def _encrypt_words(words, rk, iv=None):
+    """
+    Encrypt a sequence of blocks given as 32-bit words, in ECB mode
+    or, if an IV is given, in CBC mode
+    """
+    te0, te1, te2, te3, sbox = _TE0, _TE1, _TE2, _TE3, SBOX
+    last = len(rk) - 4
+    out = []
+    if iv is not None:
+        c0, c1, c2, c3 = iv
+    for i in range(0, len(words), 4):
+        s0, s1, s2, s3 = words[i:i + 4]
+        if iv is not None:
+            s0 ^= c0
+            s1 ^= c1
+            s2 ^= c2
+            s3 ^= c3
+        s0 ^= rk[0]
+        s1 ^= rk[1]
+        s2 ^= rk[2]
+        s3 ^= rk[3]
+        for r in range(4, last, 4):
+            t0 = te0[s0 >> 24] ^ te1[(s1 >> 16) & 0xFF] ^ te2[(s2 >> 8) & 0xFF] ^ te3[s3 & 0xFF] ^ rk[r]
+            t1 = te0[s1 >> 24] ^ te1[(s2 >> 16) & 0xFF] ^ te2[(s3 >> 8) & 0xFF] ^ te3[s0 & 0xFF] ^ rk[r + 1]
+            t2 = te0[s2 >> 24] ^ te1[(s3 >> 16) & 0xFF] ^ te2[(s0 >> 8) & 0xFF] ^ te3[s1 & 0xFF] ^ rk[r + 2]
+            s3 = te0[s3 >> 24] ^ te1[(s0 >> 16) & 0xFF] ^ te2[(s1 >> 8) & 0xFF] ^ te3[s2 & 0xFF] ^ rk[r + 3]
+            s0, s1, s2 = t0, t1, t2
+        c0 = ((sbox[s0 >> 24] << 24) | (sbox[(s1 >> 16) & 0xFF] << 16)
+              | (sbox[(s2 >> 8) & 0xFF] << 8) | sbox[s3 & 0xFF]) ^ rk[last]
+        c1 = ((sbox[s1 >> 24] << 24) | (sbox[(s2 >> 16) & 0xFF] << 16)
+              | (sbox[(s3 >> 8) & 0xFF] << 8) | sbox[s0 & 0xFF]) ^ rk[last + 1]
+        c2 = ((sbox[s2 >> 24] << 24) | (sbox[(s3 >> 16) & 0xFF] << 16)
+              | (sbox[(s0 >> 8) & 0xFF] << 8) | sbox[s1 & 0xFF]) ^ rk[last + 2]
+        c3 = ((sbox[s3 >> 24] << 24) | (sbox[(s0 >> 16) & 0xFF] << 16)
+              | (sbox[(s1 >> 8) & 0xFF] << 8) | sbox[s2 & 0xFF]) ^ rk[last + 3]
+        out += (c0, c1, c2, c3)
+    return out
+
+
+def _decrypt_words(words, rk, iv=None):
+    """
+    Decrypt a sequence of blocks given as 32-bit words, in ECB mode
+    or, if an IV is given, in CBC mode
+    """
+    td0, td1, td2, td3, sbox = _TD0, _TD1, _TD2, _TD3, SBOX_INV
+    last = len(rk) - 4
+    out = []
+    if iv is not None:
+        p0, p1, p2, p3 = iv
+    for i in range(0, len(words), 4):
+        c0, c1, c2, c3 = words[i:i + 4]
+        s0 = c0 ^ rk[0]
+        s1 = c1 ^ rk[1]
+        s2 = c2 ^ rk[2]
+        s3 = c3 ^ rk[3]
+        for r in range(4, last, 4):
+            t0 = td0[s0 >> 24] ^ td1[(s3 >> 16) & 0xFF] ^ td2[(s2 >> 8) & 0xFF] ^ td3[s1 & 0xFF] ^ rk[r]
+            t1 = td0[s1 >> 24] ^ td1[(s0 >> 16) & 0xFF] ^ td2[(s3 >> 8) & 0xFF] ^ td3[s2 & 0xFF] ^ rk[r + 1]
+            t2 = td0[s2 >> 24] ^ td1[(s1 >> 16) & 0xFF] ^ td2[(s0 >> 8) & 0xFF] ^ td3[s3 & 0xFF] ^ rk[r + 2]
+            s3 = td0[s3 >> 24] ^ td1[(s2 >> 16) & 0xFF] ^ td2[(s1 >> 8) & 0xFF] ^ td3[s0 & 0xFF] ^ rk[r + 3]
+            s0, s1, s2 = t0, t1, t2
+        t0 = ((sbox[s0 >> 24] << 24) | (sbox[(s3 >> 16) & 0xFF] << 16)
+              | (sbox[(s2 >> 8) & 0xFF] << 8) | sbox[s1 & 0xFF]) ^ rk[last]
+        t1 = ((sbox[s1 >> 24] << 24) | (sbox[(s0 >> 16) & 0xFF] << 16)
+              | (sbox[(s3 >> 8) & 0xFF] << 8) | sbox[s2 & 0xFF]) ^ rk[last + 1]
+        t2 = ((sbox[s2 >> 24] << 24) | (sbox[(s1 >> 16) & 0xFF] << 16)
+              | (sbox[(s0 >> 8) & 0xFF] << 8) | sbox[s3 & 0xFF]) ^ rk[last + 2]
+        t3 = ((sbox[s3 >> 24] << 24) | (sbox[(s2 >> 16) & 0xFF] << 16)
+              | (sbox[(s1 >> 8) & 0xFF] << 8) | sbox[s0 & 0xFF]) ^ rk[last + 3]
+        if iv is not None:
+            out += (t0 ^ p0, t1 ^ p1, t2 ^ p2, t3 ^ p3)
+            p0, p1, p2, p3 = c0, c1, c2, c3
+        else:
+            out += (t0, t1, t2, t3)
+    return out
+
+
+__all__ = ['aes_encrypt', 'key_expansion', 'aes_ctr_decrypt', 'aes_cbc_decrypt', 'aes_cbc_decrypt_bytes', 'aes_decrypt_text']
@@ -1,16 +1,26 @@
 from __future__ import unicode_literals
 
+import email
 import errno
+import hashlib
 import io
 import json
 import os
 import re
 import shutil
+import threading
+import time
 import traceback
 
-from .compat import compat_getenv
+from .compat import (
+    compat_basestring,
+    compat_getenv,
+    compat_urllib_response,
+)
 from .utils import (
     expand_path,
+    int_or_none,
+    unified_timestamp,
     write_json_file,
 )
 
@@ -94,3 +104,230 @@ class Cache(object):
             self._ydl.to_screen('.', skip_eol=True)
             shutil.rmtree(cachedir)
         self._ydl.to_screen('.')
+
+
+class ResponseCache(object):
+    """
+    Disk cache of HTTP responses to extractor requests
+
+    Entries live in the "http" section of the cache directory: a .json file
+    with the metadata and headers of the response and a .data file with its
+    (decoded) body. Entries are keyed by the request, including the cookies
+    sent along with it, and responses setting cookies are not stored, since
+    replaying them would not update the cookie jar. An entry is reused
+    without touching the network while it
+    is fresh according to Cache-Control max-age (or Expires), afterwards it is
+    revalidated with its ETag/Last-Modified validators. Once the entries take
+    more than http_cache_size bytes the least recently used ones are evicted.
+    """
+
+    _SECTION = 'http'
+    DEFAULT_SIZE = 100 * 1024 * 1024
+    # These describe the transfer rather than the stored (decoded) body
+    _SKIPPED_HEADERS = (
+        'connection', 'content-encoding', 'content-length', 'keep-alive',
+        'transfer-encoding')
+
+    def __init__(self, ydl):
+        self._ydl = ydl
+        self._lock = threading.Lock()
+        # key -> [size of the entry, time of last use], built on first store
+        self._index = None
+
+    @property
+    def enabled(self):
+        return bool(self._ydl.params.get('http_cache')) and self._ydl.cache.enabled
+
+    @property
+    def max_size(self):
+        max_size = self._ydl.params.get('http_cache_size')
+        return self.DEFAULT_SIZE if max_size is None else max_size
+
+    def _get_cache_fn(self, key, dtype):
+        return self._ydl.cache._get_cache_fn(self._SECTION, key, dtype)
+
+    def key(self, request):
+        """ Return the cache key of request, None if it can't be cached """
+        if isinstance(request, compat_basestring):
+            url, headers = request, []
+        else:
+            if request.get_method() != 'GET':
+                return None
+            url = request.get_full_url()
+            # The faked X-Forwarded-For address changes with each run
+            headers = sorted(
+                (name.lower(), value) for name, value in request.header_items()
+                if name.lower() != 'x-forwarded-for')
+        cookies = self._ydl._calc_cookies({'url': url})
+        return hashlib.sha1(
+            json.dumps([url, headers, cookies]).encode('utf-8')).hexdigest()
+
+    def load(self, key):
+        """ Return the (metadata, body) of the cached response, None if missing """
+        try:
+            with io.open(self._get_cache_fn(key, 'json'), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            with open(self._get_cache_fn(key, 'data'), 'rb') as f:
+                body = f.read()
+        except (IOError, OSError, ValueError):
+            return None
+        if len(body) != entry.get('size'):
+            # Entry being written by another process
+            return None
+        return entry, body
+
+    @staticmethod
+    def is_fresh(entry):
+        return time.time() < entry['expires']
+
+    @staticmethod
+    def validators(entry):
+        """ Return the headers for revalidating a stale entry """
+        validators = {}
+        if entry.get('etag'):
+            validators['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            validators['If-Modified-Since'] = entry['last_modified']
+        return validators
+
+    @staticmethod
+    def _expiry(headers):
+        """ Return the time until which the response is fresh, None if it must not be stored """
+        now = time.time()
+        directives = {}
+        for directive in headers.get('Cache-Control', '').lower().split(','):
+            name, _, value = directive.strip().partition('=')
+            directives[name] = value.strip('"')
+        if 'no-store' in directives:
+            return None
+        if 'no-cache' in directives:
+            return now
+        max_age = int_or_none(directives.get('max-age'))
+        if max_age is None:
+            expires = unified_timestamp(headers.get('Expires'))
+            if expires is None:
+                return now
+            max_age = expires - (unified_timestamp(headers.get('Date')) or now)
+        max_age -= int_or_none(headers.get('Age')) or 0
+        return now + max(max_age, 0)
+
+    def store(self, key, urlh):
+        """
+        Store the response behind urlh if it can be cached
+
+        Returns a response handle that can be read in place of urlh.
+        """
+        headers = urlh.headers
+        if urlh.getcode() != 200 or headers.get('Set-Cookie'):
+            return urlh
+        expires = self._expiry(headers)
+        entry = {
+            'url': urlh.geturl(),
+            'headers': [
+                [name, value] for name, value in headers.items()
+                if name.lower() not in self._SKIPPED_HEADERS],
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'expires': expires,
+        }
+        if expires is None or (
+                not self.is_fresh(entry) and not self.validators(entry)):
+            return urlh
+        body = urlh.read()
+        entry['size'] = len(body)
+        fn = self._get_cache_fn(key, 'data')
+        try:
+            try:
+                os.makedirs(os.path.dirname(fn))
+            except OSError as ose:
+                if ose.errno != errno.EEXIST:
+                    raise
+            with open(fn, 'wb') as f:
+                f.write(body)
+            write_json_file(entry, self._get_cache_fn(key, 'json'))
+        except (IOError, OSError) as err:
+            self._ydl.report_warning(
+                'Writing response to HTTP cache failed: %s' % err)
+        else:
+            self._use(key, len(body) + os.path.getsize(self._get_cache_fn(key, 'json')))
+        return compat_urllib_response.addinfourl(
+            io.BytesIO(body), headers, urlh.geturl(), urlh.getcode())
+
+    def revalidated(self, key, entry, body, headers):
+        """ Refresh entry after a 304 Not Modified response with headers """
+        expires = self._expiry(headers)
+        if expires is not None:
+            entry['expires'] = expires
+            for name in ('ETag', 'Last-Modified'):
+                if headers.get(name):
+                    entry[name.lower().replace('-', '_')] = headers[name]
+            try:
+                write_json_file(entry, self._get_cache_fn(key, 'json'))
+            except (IOError, OSError):
+                pass
+        return self.response(key, entry, body)
+
+    def response(self, key, entry, body):
+        """ Return a response handle reading the cached body """
+        try:
+            os.utime(self._get_cache_fn(key, 'json'), None)
+        except OSError:
+            pass
+        self._use(key)
+        headers = email.message_from_string(''.join(
+            '%s: %s\n' % (name, value) for name, value in entry['headers']))
+        return compat_urllib_response.addinfourl(
+            io.BytesIO(body), headers, entry['url'], 200)
+
+    def _load_index(self):
+        index = {}
+        dn = os.path.dirname(self._get_cache_fn('index', 'json'))
+        try:
+            fns = os.listdir(dn)
+        except OSError:
+            fns = []
+        for fn in fns:
+            key, ext = os.path.splitext(fn)
+            if ext != '.json':
+                continue
+            try:
+                meta_stat = os.stat(os.path.join(dn, fn))
+                size = os.path.getsize(os.path.join(dn, key + '.data'))
+            except OSError:
+                continue
+            index[key] = [meta_stat.st_size + size, meta_stat.st_mtime]
+        return index
+
+    def _use(self, key, size=None):
+        """ Mark key as used, with its new size if it has been stored """
+        with self._lock:
+            if self._index is None:
+                if size is None:
+                    return
+                self._index = self._load_index()
+            entry = self._index.get(key)
+            if entry is None:
+                if size is None:
+                    return
+                entry = self._index[key] = [size, None]
+            elif size is not None:
+                entry[0] = size
+            entry[1] = time.time()
+            if size is not None:
+                self._evict()
+
+    def _evict(self):
+        total = sum(size for size, _ in self._index.values())
+        if total <= self.max_size:
+            return
+        for key, (size, _) in sorted(
+                self._index.items(), key=lambda item: item[1][1]):
+            if total <= self.max_size:
+                break
+            for dtype in ('json', 'data'):
+                try:
+                    os.remove(self._get_cache_fn(key, dtype))
+                except OSError:
+                    pass
+            del self._index[key]
+            total -= size
@@ -43,7 +43,8 @@ def get_suitable_downloader(info_dict, params={}):
         if ed.can_download(info_dict):
             return ed
 
-    if protocol.startswith('m3u8') and info_dict.get('is_live'):
+    if (protocol.startswith('m3u8') and info_dict.get('is_live')
+            and params.get('hls_prefer_native') is not True):
         return FFmpegFD
 
     if protocol == 'm3u8' and params.get('hls_prefer_native') is True:
@@ -3,6 +3,7 @@ from __future__ import division, unicode_literals
 import os
 import re
 import sys
+import threading
 import time
 import random
 
@@ -51,17 +52,31 @@ class FileDownloader(object):
     http_chunk_size:    Size of a chunk for chunk-based HTTP downloading. May be
                         useful for bypassing bandwidth throttling imposed by
                         a webserver (experimental)
+    http_connections:   Number of connections to use for a single HTTP download.
+                        When greater than 1 and the server supports ranged
+                        requests, the file is split into as many byte ranges
+                        downloaded in parallel into a preallocated .part file.
+                        Segment progress is kept in a .ytdl file so that every
+                        range is resumed on its own.
+    progress_interval:  Minimum number of seconds between two "downloading"
+                        progress updates passed to the progress hooks
+                        (including the progress bar), updates coming in
+                        between are dropped. Other statuses are always
+                        passed on. Default is 0.1, 0 reports every update.
 
     Subclasses of this one must re-define the real_download method.
     """
 
     _TEST_FILE_SIZE = 10241
+    _DEFAULT_PROGRESS_INTERVAL = 0.1
     params = None
 
     def __init__(self, ydl, params):
         """Create a FileDownloader object with the given options."""
         self.ydl = ydl
         self._progress_hooks = []
+        self._progress_lock = threading.Lock()
+        self._last_progress = None
         self.params = params
         self.add_progress_hook(self.report_progress)
 
@@ -336,7 +351,7 @@ class FileDownloader(object):
             and os.path.exists(encodeFilename(filename))
         )
 
-        if not hasattr(filename, 'write'):
+        if not hasattr(filename, 'write') and not info_dict.get('_memory_stream'):
             continuedl_and_exists = (
                 self.params.get('continuedl', True)
                 and os.path.isfile(encodeFilename(filename))
@@ -370,6 +385,19 @@ class FileDownloader(object):
         raise NotImplementedError('This method must be implemented by subclasses')
 
     def _hook_progress(self, status):
+        if status['status'] == 'downloading':
+            interval = self.params.get('progress_interval')
+            if interval is None:
+                interval = self._DEFAULT_PROGRESS_INTERVAL
+            # Updates are snapshots of the whole download, so dropping the
+            # ones superseded within the interval loses nothing but redraws
+            with self._progress_lock:
+                now = time.time()
+                if self._last_progress is not None and 0 <= now - self._last_progress < interval:
+                    return
+                self._last_progress = now
+        else:
+            self._last_progress = None
         for ph in self._progress_hooks:
             ph(status)
 
@@ -389,3 +417,56 @@ class FileDownloader(object):
 
         self.to_screen('[debug] %s command line: %s' % (
             exe, shell_quote(str_args)))
+
+
+class CombinedProgress(object):
+    """
+    Reports the progress of several files downloaded at once as a single
+    progress line, through the report_progress() of reporter.
+
+    hook(index) returns the progress hook of the index-th download; the
+    downloaders themselves should not print their progress.
+    """
+
+    def __init__(self, reporter, count):
+        self._reporter = reporter
+        self._statuses = [None] * count
+        self._start = time.time()
+        self._lock = threading.Lock()
+
+    def hook(self, index):
+        return lambda status: self._update(index, status)
+
+    def _update(self, index, status):
+        with self._lock:
+            if status['status'] not in ('downloading', 'finished'):
+                return
+            self._statuses[index] = status
+            self._reporter.report_progress(self._combine())
+
+    def _combine(self):
+        statuses = self._statuses
+        finished = all(s and s['status'] == 'finished' for s in statuses)
+        combined = {
+            'status': 'finished' if finished else 'downloading',
+            'elapsed': time.time() - self._start,
+        }
+        sizes = [
+            s and (s.get('total_bytes') or s.get('total_bytes_estimate'))
+            for s in statuses]
+        if all(sizes):
+            exact = all(s.get('total_bytes') for s in statuses)
+            combined['total_bytes' if exact else 'total_bytes_estimate'] = sum(sizes)
+        if finished:
+            return combined
+        combined['downloaded_bytes'] = sum(
+            (s.get('total_bytes') if s['status'] == 'finished' else s.get('downloaded_bytes')) or 0
+            for s in statuses if s)
+        running = [s for s in statuses if s and s['status'] == 'downloading']
+        speeds = [s.get('speed') for s in running]
+        if speeds and None not in speeds:
+            combined['speed'] = sum(speeds)
+        etas = [s.get('eta') for s in running]
+        if all(s is not None for s in statuses) and etas and None not in etas:
+            combined['eta'] = max(etas)
+        return combined
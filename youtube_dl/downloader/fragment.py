@@ -1,14 +1,19 @@
 from __future__ import division, unicode_literals
 
+import io
 import os
+import threading
 import time
 import json
 
 from .common import FileDownloader
 from .http import HttpFD
+from ..compat import compat_urllib_error
 from ..utils import (
+    DownloadError,
     error_to_compat_str,
     encodeFilename,
+    ordered_parallel_map,
     sanitize_open,
     sanitized_Request,
 )
@@ -30,7 +35,11 @@ class FragmentFD(FileDownloader):
     skip_unavailable_fragments:
                         Skip unavailable fragments (DASH and hlsnative only)
     keep_fragments:     Keep downloaded fragments on disk after downloading is
-                        finished
+                        finished. Otherwise fragments are downloaded to memory
+                        and never written to disk on their own.
+    concurrent_fragments:
+                        Number of fragments to download in parallel (DASH,
+                        hlsnative and ISM only). Defaults to 1.
 
     For each incomplete fragment download youtube-dl keeps on disk a special
     bookkeeping file with download state and metadata (in future such files will
@@ -101,13 +110,20 @@ class FragmentFD(FileDownloader):
             'url': frag_url,
             'http_headers': headers or info_dict.get('http_headers'),
         }
+        keep_fragments = self.params.get('keep_fragments', False)
+        if not keep_fragments:
+            # The buffer is reused for all the fragments of ctx
+            if 'fragment_stream' not in ctx:
+                ctx['fragment_stream'] = io.BytesIO()
+            fragment_info_dict['_memory_stream'] = ctx['fragment_stream']
         success = ctx['dl'].download(fragment_filename, fragment_info_dict)
         if not success:
             return False, None
         if fragment_info_dict.get('filetime'):
             ctx['fragment_filetime'] = fragment_info_dict.get('filetime')
-        down, frag_sanitized = sanitize_open(fragment_filename, 'rb')
-        ctx['fragment_filename_sanitized'] = frag_sanitized
+        if not keep_fragments:
+            return True, ctx['fragment_stream'].getvalue()
+        down, _ = sanitize_open(fragment_filename, 'rb')
         frag_content = down.read()
         down.close()
         return True, frag_content
@@ -119,9 +135,20 @@ class FragmentFD(FileDownloader):
         finally:
             if self.__do_ytdl_file(ctx):
                 self._write_ytdl_file(ctx)
-            if not self.params.get('keep_fragments', False):
-                os.remove(encodeFilename(ctx['fragment_filename_sanitized']))
-            del ctx['fragment_filename_sanitized']
+
+    def _make_fragment_downloader(self):
+        return HttpQuietDownloader(
+            self.ydl,
+            {
+                'continuedl': True,
+                'quiet': True,
+                'noprogress': True,
+                'ratelimit': self.params.get('ratelimit'),
+                'retries': self.params.get('retries', 0),
+                'nopart': self.params.get('nopart', False),
+                'test': self.params.get('test', False),
+            }
+        )
 
     def _prepare_frag_download(self, ctx):
         if 'live' not in ctx:
@@ -136,18 +163,7 @@ class FragmentFD(FileDownloader):
         self.to_screen(
             '[%s] Total fragments: %s' % (self.FD_NAME, total_frags_str))
         self.report_destination(ctx['filename'])
-        dl = HttpQuietDownloader(
-            self.ydl,
-            {
-                'continuedl': True,
-                'quiet': True,
-                'noprogress': True,
-                'ratelimit': self.params.get('ratelimit'),
-                'retries': self.params.get('retries', 0),
-                'nopart': self.params.get('nopart', False),
-                'test': self.params.get('test', False),
-            }
-        )
+        dl = self._make_fragment_downloader()
         tmpfilename = self.temp_name(ctx['filename'])
         open_mode = 'wb'
         resume_len = 0
@@ -249,6 +265,168 @@ class FragmentFD(FileDownloader):
 
         return start
 
+    def _concurrent_frag_progress_hook(self, ctx, frag_index, lock, in_flight):
+        """
+        Progress hook for a single fragment downloaded by a worker thread.
+
+        Downloaded bytes of all fragments being downloaded at the moment are
+        tracked in in_flight (guarded by lock) so that the reported progress
+        covers the whole download.
+        """
+        resume_len = ctx['complete_frags_downloaded_bytes']
+        total_frags = ctx['total_frags']
+
+        def frag_progress_hook(s):
+            if s['status'] not in ('downloading', 'finished'):
+                return
+
+            with lock:
+                if s['status'] == 'finished':
+                    in_flight.pop(frag_index, None)
+                    ctx['frags_finished'] += 1
+                    ctx['complete_frags_downloaded_bytes'] += s.get('total_bytes') or 0
+                else:
+                    in_flight[frag_index] = s['downloaded_bytes']
+                frags_finished = ctx['frags_finished']
+                downloaded_bytes = ctx['complete_frags_downloaded_bytes'] + sum(in_flight.values())
+
+                time_now = time.time()
+                state = {
+                    'status': 'downloading',
+                    'downloaded_bytes': downloaded_bytes,
+                    'fragment_index': frags_finished,
+                    'fragment_count': total_frags,
+                    'filename': ctx['filename'],
+                    'tmpfilename': ctx['tmpfilename'],
+                    'elapsed': time_now - ctx['started'],
+                    'speed': self.calc_speed(
+                        ctx['started'], time_now, downloaded_bytes - resume_len),
+                }
+                if frags_finished:
+                    estimated_size = (
+                        ctx['complete_frags_downloaded_bytes'] / frags_finished * total_frags)
+                    state['total_bytes_estimate'] = estimated_size
+                    state['eta'] = self.calc_eta(
+                        ctx['started'], time_now, estimated_size - resume_len,
+                        downloaded_bytes - resume_len)
+                self._hook_progress(state)
+
+        return frag_progress_hook
+
+    def _download_and_append_fragments(self, ctx, fragments, info_dict, pack_func=None):
+        """
+        Download fragments and append them to the destination stream in order.
+
+        fragments is a list of dicts with the following keys:
+            frag_index: 1-based index of the fragment
+            url:        URL of the fragment
+            headers:    (optional) HTTP headers to use for the fragment
+            fatal:      (optional) abort the download if the fragment is
+                        unavailable even if skip_unavailable_fragments is set
+
+        pack_func is an optional function called with the downloaded fragment
+        content and the fragment dict right before appending; it returns the
+        data to be actually written to the destination stream.
+
+        With concurrent_fragments > 1 fragments are downloaded by a pool of
+        worker threads and kept in memory until all the preceding fragments
+        are appended. At most twice as many fragments as there are workers are
+        held this way.
+
+        Returns True on success and False otherwise.
+        """
+        fragment_retries = self.params.get('fragment_retries', 0)
+        skip_unavailable_fragments = self.params.get('skip_unavailable_fragments', True)
+        max_workers = self.params.get('concurrent_fragments') or 1
+
+        fragments = [f for f in fragments if f['frag_index'] > ctx['fragment_index']]
+        # Set once the concurrent download has failed
+        aborted = threading.Event()
+
+        def download_fragment(fragment, frag_ctx):
+            """
+            Returns the fragment content, None if the fragment has been skipped
+            or False if the download must be aborted.
+            """
+            frag_index = fragment['frag_index']
+            fatal = fragment.get('fatal') or not skip_unavailable_fragments
+            count = 0
+            while count <= fragment_retries:
+                try:
+                    success, frag_content = self._download_fragment(
+                        frag_ctx, fragment['url'], info_dict, fragment.get('headers'))
+                    if not success:
+                        return False
+                    return frag_content
+                except compat_urllib_error.HTTPError as err:
+                    # Unavailable (possibly temporary) fragments may be served.
+                    # YouTube, for example, may often return 404 HTTP error for a
+                    # fragment while immediately retrying it with the same request
+                    # data usually succeeds (1-2 attempts is usually enough).
+                    # First we try to retry then either skip or abort.
+                    # See https://github.com/ytdl-org/youtube-dl/issues/10165,
+                    # https://github.com/ytdl-org/youtube-dl/issues/10448).
+                    if aborted.is_set():
+                        return False
+                    count += 1
+                    if count <= fragment_retries:
+                        self.report_retry_fragment(err, frag_index, count, fragment_retries)
+                except DownloadError:
+                    # Don't retry fragment if error occurred during HTTP downloading
+                    # itself since it has own retry settings
+                    if not fatal:
+                        return None
+                    raise
+            if not fatal:
+                return None
+            self.report_error('giving up after %s fragment retries' % fragment_retries)
+            return False
+
+        def append_fragment(fragment, frag_content):
+            if frag_content is None:
+                self.report_skip_fragment(fragment['frag_index'])
+                return
+            if pack_func:
+                frag_content = pack_func(frag_content, fragment)
+            self._append_fragment(ctx, frag_content)
+
+        if max_workers <= 1 or len(fragments) <= 1:
+            for fragment in fragments:
+                frag_content = download_fragment(fragment, ctx)
+                if frag_content is False:
+                    return False
+                append_fragment(fragment, frag_content)
+            return True
+
+        progress_lock = threading.Lock()
+        in_flight = {}
+        ctx['frags_finished'] = ctx['fragment_index']
+
+        def download_fragment_in_worker(fragment):
+            frag_ctx = {
+                'tmpfilename': ctx['tmpfilename'],
+                'fragment_index': fragment['frag_index'] - 1,
+                'dl': self._make_fragment_downloader(),
+            }
+            frag_ctx['dl'].add_progress_hook(self._concurrent_frag_progress_hook(
+                ctx, fragment['frag_index'], progress_lock, in_flight))
+            return fragment, download_fragment(fragment, frag_ctx), frag_ctx
+
+        results = ordered_parallel_map(
+            download_fragment_in_worker, fragments, max_workers)
+        try:
+            for fragment, frag_content, frag_ctx in results:
+                if frag_content is False:
+                    return False
+                ctx['fragment_index'] = fragment['frag_index']
+                if frag_ctx.get('fragment_filetime'):
+                    ctx['fragment_filetime'] = frag_ctx['fragment_filetime']
+                append_fragment(fragment, frag_content)
+        finally:
+            aborted.set()
+            results.close()
+        return True
+
     def _finish_frag_download(self, ctx):
         ctx['dest_stream'].close()
         if self.__do_ytdl_file(ctx):
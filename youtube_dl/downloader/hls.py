@@ -2,60 +2,212 @@ from __future__ import unicode_literals
 
 import re
 import binascii
+import socket
+import time
 try:
     from Crypto.Cipher import AES
-    can_decrypt_frag = True
 except ImportError:
-    can_decrypt_frag = False
+    AES = None
 
 from .fragment import FragmentFD
 from .external import FFmpegFD
 
+from ..aes import aes_cbc_decrypt_bytes
 from ..compat import (
+    compat_http_client,
     compat_urllib_error,
     compat_urlparse,
     compat_struct_pack,
 )
 from ..utils import (
+    error_to_compat_str,
+    float_or_none,
     parse_m3u8_attributes,
     update_url_query,
 )
 
 
+class M3U8Playlist(object):
+    """
+    An HLS playlist, parsed in a single pass
+
+    A playlist with #EXTINF or #EXT-X-TARGETDURATION tags is a media
+    playlist, anything else a master playlist (is_master).
+
+    The segments of a media playlist are dicts with the following keys:
+    url:            Absolute URL of the segment
+    media_sequence: Media sequence number of the segment
+    duration:       Duration of the segment in seconds, None if unknown
+    decrypt_info:   Attributes of the #EXT-X-KEY tag in effect, with an
+                    absolute URI and a binary IV, {'METHOD': 'NONE'} if
+                    there is none. Segments encrypted with the same key
+                    share the same dict.
+    byte_range:     The range of the segment in url as a dict with start and
+                    end (excluded) keys, None for the whole resource
+    ad:             Whether the segment belongs to an ad break
+
+    target_duration is None when missing, endlist tells whether the playlist
+    is complete, key_methods is the set of encryption methods used and
+    init_section holds the attributes of the #EXT-X-MAP tag if any.
+
+    A master playlist has the attribute dicts of its #EXT-X-MEDIA tags in
+    media and its variant streams in variants, as a list of (attributes of
+    the #EXT-X-STREAM-INF tag, absolute URL) tuples.
+
+    extra_query is a dict of query parameters to add to the URLs of the
+    segments and of the keys.
+    """
+
+    _ABSOLUTE_URL_RE = re.compile(r'https?://')
+    # Relative paths that urljoin would just append to the playlist's
+    # directory, without dot segments or a scheme
+    _SIMPLE_PATH_RE = re.compile(r'[^/?#:.][^?#:]*(?:\?.*)?$')
+
+    def __init__(self, manifest, url='', extra_query=None):
+        self.url = url
+        self._base_dir = compat_urlparse.urljoin(url, '_')[:-1]
+        self._extra_query = extra_query
+        self.is_master = '#EXTINF' not in manifest and '#EXT-X-TARGETDURATION' not in manifest
+        self.segments = []
+        self.target_duration = None
+        self.endlist = False
+        self.key_methods = set()
+        self.init_section = None
+        self.media = []
+        self.variants = []
+        if self.is_master:
+            self._parse_master(manifest)
+        else:
+            self._parse_media(manifest)
+
+    def resolve_url(self, uri):
+        """ Return the absolute URL of a URI of the playlist """
+        if self._ABSOLUTE_URL_RE.match(uri):
+            return uri
+        if self._SIMPLE_PATH_RE.match(uri) and '/.' not in uri.partition('?')[0]:
+            return self._base_dir + uri
+        return compat_urlparse.urljoin(self.url, uri)
+
+    def _parse_master(self, manifest):
+        stream_inf = {}
+        for line in manifest.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('#EXT-X-MEDIA:'):
+                self.media.append(parse_m3u8_attributes(line))
+            elif line.startswith('#EXT-X-STREAM-INF:'):
+                stream_inf = parse_m3u8_attributes(line)
+            elif not line.startswith('#'):
+                self.variants.append((stream_inf, self.resolve_url(line)))
+                stream_inf = {}
+
+    @staticmethod
+    def _is_ad_start(line):
+        return (line.startswith('#ANVATO-SEGMENT-INFO') and 'type=ad' in line
+                or line.startswith('#UPLYNK-SEGMENT') and line.endswith(',ad'))
+
+    @staticmethod
+    def _is_ad_end(line):
+        return (line.startswith('#ANVATO-SEGMENT-INFO') and 'type=master' in line
+                or line.startswith('#UPLYNK-SEGMENT') and line.endswith(',segment'))
+
+    def _parse_media(self, manifest):
+        extra_query = self._extra_query
+        media_sequence = 0
+        duration = None
+        decrypt_info = {'METHOD': 'NONE'}
+        byte_range = None
+        range_end = 0
+        ad = False
+        for line in manifest.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            if not line.startswith('#'):
+                url = self.resolve_url(line)
+                if extra_query:
+                    url = update_url_query(url, extra_query)
+                self.segments.append({
+                    'url': url,
+                    'media_sequence': media_sequence,
+                    'duration': duration,
+                    'decrypt_info': decrypt_info,
+                    'byte_range': byte_range,
+                    'ad': ad,
+                })
+                media_sequence += 1
+                duration = byte_range = None
+            elif line.startswith('#EXTINF:'):
+                duration = float_or_none(line[8:].partition(',')[0])
+            elif line.startswith('#EXT-X-BYTERANGE:'):
+                length, _, offset = line[17:].partition('@')
+                start = int(offset) if offset else range_end
+                range_end = start + int(length)
+                byte_range = {'start': start, 'end': range_end}
+            elif line.startswith('#EXT-X-KEY:'):
+                decrypt_info = parse_m3u8_attributes(line[11:])
+                self.key_methods.add(decrypt_info.get('METHOD'))
+                if decrypt_info.get('METHOD') == 'AES-128':
+                    if 'IV' in decrypt_info:
+                        decrypt_info['IV'] = binascii.unhexlify(decrypt_info['IV'][2:].zfill(32))
+                    decrypt_info['URI'] = self.resolve_url(decrypt_info['URI'])
+                    if extra_query:
+                        decrypt_info['URI'] = update_url_query(decrypt_info['URI'], extra_query)
+            elif line.startswith('#EXT-X-MEDIA-SEQUENCE:'):
+                media_sequence = int(line[22:])
+            elif line.startswith('#EXT-X-TARGETDURATION:'):
+                self.target_duration = float_or_none(line[22:])
+            elif line.startswith('#EXT-X-ENDLIST'):
+                self.endlist = True
+            elif line.startswith('#EXT-X-MAP:'):
+                self.init_section = parse_m3u8_attributes(line[11:])
+            elif self._is_ad_start(line):
+                ad = True
+            elif self._is_ad_end(line):
+                ad = False
+
+
 class HlsFD(FragmentFD):
     """ A limited implementation that does not require ffmpeg """
 
     FD_NAME = 'hlsnative'
 
+    # Used when a live playlist has no #EXT-X-TARGETDURATION tag
+    _DEFAULT_TARGET_DURATION = 10
+    # Give up on a live stream after this many reloads with no new fragments
+    _LIVE_MAX_STALE_RELOADS = 10
+
     @staticmethod
     def can_download(manifest, info_dict):
-        UNSUPPORTED_FEATURES = (
-            r'#EXT-X-KEY:METHOD=(?!NONE|AES-128)',  # encrypted streams [1]
-            # r'#EXT-X-BYTERANGE',  # playlists composed of byte ranges of media files [2]
-
-            # Live streams heuristic does not always work (e.g. geo restricted to Germany
-            # http://hls-geo.daserste.de/i/videoportal/Film/c_620000/622873/format,716451,716457,716450,716458,716459,.mp4.csmil/index_4_av.m3u8?null=0)
-            # r'#EXT-X-MEDIA-SEQUENCE:(?!0$)',  # live streams [3]
-
-            # This heuristic also is not correct since segments may not be appended as well.
-            # Twitch vods of finished streams have EXT-X-PLAYLIST-TYPE:EVENT despite
-            # no segments will definitely be appended to the end of the playlist.
-            # r'#EXT-X-PLAYLIST-TYPE:EVENT',  # media segments may be appended to the end of
-            #                                 # event media playlists [4]
-            r'#EXT-X-MAP:',  # media initialization [5]
-
-            # 1. https://tools.ietf.org/html/draft-pantos-http-live-streaming-17#section-4.3.2.4
-            # 2. https://tools.ietf.org/html/draft-pantos-http-live-streaming-17#section-4.3.2.2
-            # 3. https://tools.ietf.org/html/draft-pantos-http-live-streaming-17#section-4.3.3.2
-            # 4. https://tools.ietf.org/html/draft-pantos-http-live-streaming-17#section-4.3.3.5
-            # 5. https://tools.ietf.org/html/draft-pantos-http-live-streaming-17#section-4.3.2.5
-        )
-        check_results = [not re.search(feature, manifest) for feature in UNSUPPORTED_FEATURES]
-        is_aes128_enc = '#EXT-X-KEY:METHOD=AES-128' in manifest
-        check_results.append(can_decrypt_frag or not is_aes128_enc)
-        check_results.append(not (is_aes128_enc and r'#EXT-X-BYTERANGE' in manifest))
-        check_results.append(not info_dict.get('is_live'))
-        return all(check_results)
+        """
+        Tell whether the media playlist manifest, an M3U8Playlist or its
+        text, only uses features supported by hlsnative.
+
+        Unsupported:
+         * encryption methods other than AES-128 [1]
+         * media initialization sections (#EXT-X-MAP) [2]
+         * AES-128 encrypted byte ranges of media files [3]
+
+        The #EXT-X-MEDIA-SEQUENCE and #EXT-X-PLAYLIST-TYPE:EVENT tags are not
+        telling of live streams: some geo restricted streams have a media
+        sequence other than 0 and Twitch VODs of finished streams are EVENT
+        playlists.
+
+        1. https://tools.ietf.org/html/draft-pantos-http-live-streaming-17#section-4.3.2.4
+        2. https://tools.ietf.org/html/draft-pantos-http-live-streaming-17#section-4.3.2.5
+        3. https://tools.ietf.org/html/draft-pantos-http-live-streaming-17#section-4.3.2.2
+        """
+        if not isinstance(manifest, M3U8Playlist):
+            manifest = M3U8Playlist(manifest, info_dict.get('url') or '')
+        if manifest.key_methods - set(('NONE', 'AES-128')):
+            return False
+        if manifest.init_section is not None:
+            return False
+        if 'AES-128' in manifest.key_methods and any(
+                segment['byte_range'] for segment in manifest.segments):
+            return False
+        return True
 
     def real_download(self, filename, info_dict):
         man_url = info_dict['url']
@@ -63,11 +215,13 @@ class HlsFD(FragmentFD):
 
         urlh = self.ydl.urlopen(self._prepare_url(info_dict, man_url))
         man_url = urlh.geturl()
-        s = urlh.read().decode('utf-8', 'ignore')
+        playlist = self._parse_playlist(urlh.read().decode('utf-8', 'ignore'), man_url, info_dict)
 
-        if not self.can_download(s, info_dict):
+        if not self.can_download(playlist, info_dict):
             if info_dict.get('extra_param_to_segment_url') or info_dict.get('_decryption_key_url'):
-                self.report_error('pycrypto not found. Please install it.')
+                self.report_error(
+                    'hlsnative has detected features it does not support '
+                    'and the stream cannot be delegated to ffmpeg')
                 return False
             self.report_warning(
                 'hlsnative has detected features it does not support, '
@@ -77,140 +231,180 @@ class HlsFD(FragmentFD):
                 fd.add_progress_hook(ph)
             return fd.real_download(filename, info_dict)
 
-        def is_ad_fragment_start(s):
-            return (s.startswith('#ANVATO-SEGMENT-INFO') and 'type=ad' in s
-                    or s.startswith('#UPLYNK-SEGMENT') and s.endswith(',ad'))
-
-        def is_ad_fragment_end(s):
-            return (s.startswith('#ANVATO-SEGMENT-INFO') and 'type=master' in s
-                    or s.startswith('#UPLYNK-SEGMENT') and s.endswith(',segment'))
-
-        media_frags = 0
-        ad_frags = 0
-        ad_frag_next = False
-        for line in s.splitlines():
-            line = line.strip()
-            if not line:
-                continue
-            if line.startswith('#'):
-                if is_ad_fragment_start(line):
-                    ad_frag_next = True
-                elif is_ad_fragment_end(line):
-                    ad_frag_next = False
-                continue
-            if ad_frag_next:
-                ad_frags += 1
-                continue
-            media_frags += 1
+        fragments, ad_frags, target_duration, endlist = self._playlist_fragments(
+            playlist, info_dict)
+        live = bool(info_dict.get('is_live')) and not endlist
 
         ctx = {
             'filename': filename,
-            'total_frags': media_frags,
+            'total_frags': len(fragments),
             'ad_frags': ad_frags,
+            'live': live,
         }
 
         self._prepare_and_start_frag_download(ctx)
 
-        fragment_retries = self.params.get('fragment_retries', 0)
-        skip_unavailable_fragments = self.params.get('skip_unavailable_fragments', True)
         test = self.params.get('test', False)
 
+        decryption_keys = {}
+
+        def decrypt_fragment(frag_content, fragment):
+            decrypt_info = fragment['decrypt_info']
+            if decrypt_info['METHOD'] != 'AES-128':
+                return frag_content
+            iv = decrypt_info.get('IV') or compat_struct_pack('>8xq', fragment['media_sequence'])
+            key_url = info_dict.get('_decryption_key_url') or decrypt_info['URI']
+            # Keys are cached by URL since a live playlist is parsed anew on
+            # every refresh
+            if not decrypt_info.get('KEY'):
+                if key_url not in decryption_keys:
+                    decryption_keys[key_url] = self.ydl.urlopen(
+                        self._prepare_url(info_dict, key_url)).read()
+                decrypt_info['KEY'] = decryption_keys[key_url]
+            # Don't decrypt the content in tests since the data is explicitly truncated and it's not to a valid block
+            # size (see https://github.com/ytdl-org/youtube-dl/pull/27660). Tests only care that the correct data downloaded,
+            # not what it decrypts to.
+            if test:
+                return frag_content
+            if AES is not None:
+                return AES.new(decrypt_info['KEY'], AES.MODE_CBC, iv).decrypt(frag_content)
+            return aes_cbc_decrypt_bytes(frag_content, decrypt_info['KEY'], iv)
+
+        if live:
+            if not self._download_live_fragments(
+                    ctx, man_url, fragments, target_duration, info_dict, decrypt_fragment):
+                return False
+        else:
+            for frag_index, fragment in enumerate(fragments, 1):
+                fragment['frag_index'] = frag_index
+            # We only download the first fragment during the test
+            if test:
+                fragments = fragments[:1]
+            if not self._download_and_append_fragments(ctx, fragments, info_dict, decrypt_fragment):
+                return False
+
+        self._finish_frag_download(ctx)
+
+        return True
+
+    def _download_live_fragments(self, ctx, man_url, fragments, target_duration, info_dict, pack_func):
+        """
+        Download the fragments of a live media playlist.
+
+        The playlist is reloaded as long as it has no #EXT-X-ENDLIST tag and
+        only the fragments with a media sequence number above the last
+        downloaded one are fetched on every reload. As recommended in
+        RFC 8216, section 6.3.4, the playlist is reloaded after the target
+        duration when it has changed and after half of it otherwise. A failed
+        reload counts as a stale one and is retried up to fragment_retries
+        times in a row.
+        Interrupting the download with Ctrl+C stops the recording and keeps
+        the fragments downloaded so far.
+
+        Returns True on success and False otherwise.
+        """
+        test = self.params.get('test', False)
+        endlist = False
+        last_media_sequence = None
+        frag_index = ctx['fragment_index']
+        fragment_retries = self.params.get('fragment_retries', 0)
+        stale_reloads = reload_errors = 0
+        try:
+            while True:
+                if last_media_sequence is not None:
+                    fragments = [
+                        f for f in fragments if f['media_sequence'] > last_media_sequence]
+                    if fragments and fragments[0]['media_sequence'] > last_media_sequence + 1:
+                        self.report_warning('Missed %d fragments' % (
+                            fragments[0]['media_sequence'] - last_media_sequence - 1))
+                # We only download the first fragment during the test
+                if test:
+                    fragments = fragments[:1]
+                if fragments:
+                    for fragment in fragments:
+                        frag_index += 1
+                        fragment['frag_index'] = frag_index
+                    if not self._download_and_append_fragments(ctx, fragments, info_dict, pack_func):
+                        return False
+                    last_media_sequence = fragments[-1]['media_sequence']
+                    stale_reloads = 0
+                else:
+                    stale_reloads += 1
+                    if stale_reloads > self._LIVE_MAX_STALE_RELOADS:
+                        self.report_warning(
+                            'No new fragments after %d playlist reloads, assuming the stream has ended'
+                            % self._LIVE_MAX_STALE_RELOADS)
+                        return True
+                if endlist or test:
+                    return True
+
+                time.sleep(target_duration if stale_reloads == 0 else target_duration / 2)
+                try:
+                    urlh = self.ydl.urlopen(self._prepare_url(info_dict, man_url))
+                    manifest = urlh.read().decode('utf-8', 'ignore')
+                except (compat_urllib_error.URLError, compat_http_client.HTTPException, socket.error) as err:
+                    reload_errors += 1
+                    if reload_errors > fragment_retries:
+                        self.report_error(
+                            'giving up after %s playlist reload retries' % fragment_retries)
+                        return False
+                    self.to_screen(
+                        '[%s] Got error reloading the playlist: %s. Retrying (attempt %d of %s)...'
+                        % (self.FD_NAME, error_to_compat_str(err), reload_errors,
+                           self.format_retries(fragment_retries)))
+                    fragments = []
+                    continue
+                reload_errors = 0
+                man_url = urlh.geturl()
+                fragments, _, target_duration, endlist = self._parse_fragments(
+                    manifest, man_url, info_dict)
+        except KeyboardInterrupt:
+            # Interrupting is the natural way to stop recording a live
+            # stream, keep what has been downloaded so far
+            self.to_screen('[%s] Interrupted by user' % self.FD_NAME)
+            return True
+
+    @staticmethod
+    def _parse_playlist(manifest, man_url, info_dict):
         extra_query = None
         extra_param_to_segment_url = info_dict.get('extra_param_to_segment_url')
         if extra_param_to_segment_url:
             extra_query = compat_urlparse.parse_qs(extra_param_to_segment_url)
-        i = 0
-        media_sequence = 0
-        decrypt_info = {'METHOD': 'NONE'}
-        byte_range = {}
-        frag_index = 0
-        ad_frag_next = False
-        for line in s.splitlines():
-            line = line.strip()
-            if line:
-                if not line.startswith('#'):
-                    if ad_frag_next:
-                        continue
-                    frag_index += 1
-                    if frag_index <= ctx['fragment_index']:
-                        continue
-                    frag_url = (
-                        line
-                        if re.match(r'^https?://', line)
-                        else compat_urlparse.urljoin(man_url, line))
-                    if extra_query:
-                        frag_url = update_url_query(frag_url, extra_query)
-                    count = 0
-                    headers = info_dict.get('http_headers', {})
-                    if byte_range:
-                        headers['Range'] = 'bytes=%d-%d' % (byte_range['start'], byte_range['end'] - 1)
-                    while count <= fragment_retries:
-                        try:
-                            success, frag_content = self._download_fragment(
-                                ctx, frag_url, info_dict, headers)
-                            if not success:
-                                return False
-                            break
-                        except compat_urllib_error.HTTPError as err:
-                            # Unavailable (possibly temporary) fragments may be served.
-                            # First we try to retry then either skip or abort.
-                            # See https://github.com/ytdl-org/youtube-dl/issues/10165,
-                            # https://github.com/ytdl-org/youtube-dl/issues/10448).
-                            count += 1
-                            if count <= fragment_retries:
-                                self.report_retry_fragment(err, frag_index, count, fragment_retries)
-                    if count > fragment_retries:
-                        if skip_unavailable_fragments:
-                            i += 1
-                            media_sequence += 1
-                            self.report_skip_fragment(frag_index)
-                            continue
-                        self.report_error(
-                            'giving up after %s fragment retries' % fragment_retries)
-                        return False
-                    if decrypt_info['METHOD'] == 'AES-128':
-                        iv = decrypt_info.get('IV') or compat_struct_pack('>8xq', media_sequence)
-                        decrypt_info['KEY'] = decrypt_info.get('KEY') or self.ydl.urlopen(
-                            self._prepare_url(info_dict, info_dict.get('_decryption_key_url') or decrypt_info['URI'])).read()
-                        # Don't decrypt the content in tests since the data is explicitly truncated and it's not to a valid block
-                        # size (see https://github.com/ytdl-org/youtube-dl/pull/27660). Tests only care that the correct data downloaded,
-                        # not what it decrypts to.
-                        if not test:
-                            frag_content = AES.new(
-                                decrypt_info['KEY'], AES.MODE_CBC, iv).decrypt(frag_content)
-                    self._append_fragment(ctx, frag_content)
-                    # We only download the first fragment during the test
-                    if test:
-                        break
-                    i += 1
-                    media_sequence += 1
-                elif line.startswith('#EXT-X-KEY'):
-                    decrypt_url = decrypt_info.get('URI')
-                    decrypt_info = parse_m3u8_attributes(line[11:])
-                    if decrypt_info['METHOD'] == 'AES-128':
-                        if 'IV' in decrypt_info:
-                            decrypt_info['IV'] = binascii.unhexlify(decrypt_info['IV'][2:].zfill(32))
-                        if not re.match(r'^https?://', decrypt_info['URI']):
-                            decrypt_info['URI'] = compat_urlparse.urljoin(
-                                man_url, decrypt_info['URI'])
-                        if extra_query:
-                            decrypt_info['URI'] = update_url_query(decrypt_info['URI'], extra_query)
-                        if decrypt_url != decrypt_info['URI']:
-                            decrypt_info['KEY'] = None
-                elif line.startswith('#EXT-X-MEDIA-SEQUENCE'):
-                    media_sequence = int(line[22:])
-                elif line.startswith('#EXT-X-BYTERANGE'):
-                    splitted_byte_range = line[17:].split('@')
-                    sub_range_start = int(splitted_byte_range[1]) if len(splitted_byte_range) == 2 else byte_range['end']
-                    byte_range = {
-                        'start': sub_range_start,
-                        'end': sub_range_start + int(splitted_byte_range[0]),
-                    }
-                elif is_ad_fragment_start(line):
-                    ad_frag_next = True
-                elif is_ad_fragment_end(line):
-                    ad_frag_next = False
+        return M3U8Playlist(manifest, man_url, extra_query)
 
-        self._finish_frag_download(ctx)
+    def _playlist_fragments(self, playlist, info_dict):
+        """
+        Return a (fragments, ad_frags, target_duration, endlist) tuple for
+        a media playlist.
 
-        return True
+        fragments is a list of the media (non-ad) fragment dicts with url,
+        headers, decrypt_info and media_sequence keys, ad_frags is the number
+        of ad fragments skipped and endlist tells whether the playlist has
+        the #EXT-X-ENDLIST tag.
+        """
+        headers = info_dict.get('http_headers', {})
+        fragments = []
+        ad_frags = 0
+        for segment in playlist.segments:
+            if segment['ad']:
+                ad_frags += 1
+                continue
+            frag_headers = headers
+            byte_range = segment['byte_range']
+            if byte_range:
+                frag_headers = dict(headers)
+                frag_headers['Range'] = 'bytes=%d-%d' % (byte_range['start'], byte_range['end'] - 1)
+            fragments.append({
+                'url': segment['url'],
+                'headers': frag_headers,
+                'decrypt_info': segment['decrypt_info'],
+                'media_sequence': segment['media_sequence'],
+            })
+        return (
+            fragments, ad_frags,
+            playlist.target_duration or self._DEFAULT_TARGET_DURATION,
+            playlist.endlist)
+
+    def _parse_fragments(self, manifest, man_url, info_dict):
+        return self._playlist_fragments(
+            self._parse_playlist(manifest, man_url, info_dict), info_dict)
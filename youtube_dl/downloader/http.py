@@ -1,8 +1,10 @@
 from __future__ import unicode_literals
 
 import errno
+import json
 import os
 import socket
+import threading
 import time
 import random
 import re
@@ -15,9 +17,11 @@ from ..compat import (
 from ..utils import (
     ContentTooShortError,
     encodeFilename,
+    error_to_compat_str,
     int_or_none,
     sanitize_open,
     sanitized_Request,
+    timeconvert,
     write_xattr,
     XAttrMetadataError,
     XAttrUnavailableError,
@@ -25,6 +29,14 @@ from ..utils import (
 
 
 class HttpFD(FileDownloader):
+    """
+    If info_dict contains a '_memory_stream' (e.g. an io.BytesIO), the data is
+    written to it instead of a file. filename is then only used for reporting.
+    """
+
+    # Files are not split into segments smaller than this
+    _MIN_SEGMENT_SIZE = 1024 * 1024
+
     def real_download(self, filename, info_dict):
         url = info_dict['url']
 
@@ -35,7 +47,8 @@ class HttpFD(FileDownloader):
 
         ctx = DownloadContext()
         ctx.filename = filename
-        ctx.tmpfilename = self.temp_name(filename)
+        ctx.memory_stream = info_dict.get('_memory_stream')
+        ctx.tmpfilename = filename if ctx.memory_stream else self.temp_name(filename)
         ctx.stream = None
 
         # Do not include the Accept-Encoding header
@@ -49,6 +62,14 @@ class HttpFD(FileDownloader):
             info_dict.get('downloader_options', {}).get('http_chunk_size')
             or self.params.get('http_chunk_size') or 0)
 
+        connections = self.params.get('http_connections') or 1
+        if (connections > 1 and not is_test and not chunk_size
+                and ctx.tmpfilename != '-' and not ctx.memory_stream):
+            result = self._download_segmented(
+                filename, ctx.tmpfilename, url, headers, connections, info_dict)
+            if result is not None:
+                return result
+
         ctx.open_mode = 'wb'
         ctx.resume_len = 0
         ctx.data_len = None
@@ -56,7 +77,10 @@ class HttpFD(FileDownloader):
         ctx.start_time = time.time()
         ctx.chunk_size = None
 
-        if self.params.get('continuedl', True):
+        if ctx.memory_stream:
+            ctx.memory_stream.seek(0)
+            ctx.memory_stream.truncate()
+        elif self.params.get('continuedl', True):
             # Establish possible resume length
             if os.path.isfile(encodeFilename(ctx.tmpfilename)):
                 ctx.resume_len = os.path.getsize(
@@ -226,10 +250,15 @@ class HttpFD(FileDownloader):
             def retry(e):
                 to_stdout = ctx.tmpfilename == '-'
                 if ctx.stream is not None:
-                    if not to_stdout:
+                    if not to_stdout and not ctx.memory_stream:
                         ctx.stream.close()
                     ctx.stream = None
-                ctx.resume_len = byte_counter if to_stdout else os.path.getsize(encodeFilename(ctx.tmpfilename))
+                if to_stdout:
+                    ctx.resume_len = byte_counter
+                elif ctx.memory_stream:
+                    ctx.resume_len = ctx.memory_stream.tell()
+                else:
+                    ctx.resume_len = os.path.getsize(encodeFilename(ctx.tmpfilename))
                 raise RetryDownload(e)
 
             while True:
@@ -254,7 +283,12 @@ class HttpFD(FileDownloader):
                     break
 
                 # Open destination file just in time
-                if ctx.stream is None:
+                if ctx.stream is None and ctx.memory_stream:
+                    if ctx.open_mode == 'wb':
+                        ctx.memory_stream.seek(0)
+                        ctx.memory_stream.truncate()
+                    ctx.stream = ctx.memory_stream
+                elif ctx.stream is None:
                     try:
                         ctx.stream, ctx.tmpfilename = sanitize_open(
                             ctx.tmpfilename, ctx.open_mode)
@@ -321,7 +355,7 @@ class HttpFD(FileDownloader):
                 self.to_stderr('\n')
                 self.report_error('Did not get any data blocks')
                 return False
-            if ctx.tmpfilename != '-':
+            if ctx.tmpfilename != '-' and not ctx.memory_stream:
                 ctx.stream.close()
 
             if data_len is not None and byte_counter != data_len:
@@ -330,11 +364,16 @@ class HttpFD(FileDownloader):
                     retry(err)
                 raise err
 
-            self.try_rename(ctx.tmpfilename, ctx.filename)
+            last_modified = ctx.data.info().get('last-modified', None)
+            if ctx.memory_stream:
+                if last_modified:
+                    info_dict['filetime'] = timeconvert(last_modified)
+            else:
+                self.try_rename(ctx.tmpfilename, ctx.filename)
 
-            # Update file modification time
-            if self.params.get('updatetime', True):
-                info_dict['filetime'] = self.try_utime(ctx.filename, ctx.data.info().get('last-modified', None))
+                # Update file modification time
+                if self.params.get('updatetime', True):
+                    info_dict['filetime'] = self.try_utime(ctx.filename, last_modified)
 
             self._hook_progress({
                 'downloaded_bytes': byte_counter,
@@ -362,3 +401,253 @@ class HttpFD(FileDownloader):
 
         self.report_error('giving up after %s retries' % retries)
         return False
+
+    def _read_segments_file(self, filename, total_bytes):
+        stream, _ = sanitize_open(self.ytdl_filename(filename), 'r')
+        try:
+            downloader = json.loads(stream.read())['downloader']
+            if downloader['total_bytes'] != total_bytes:
+                return None
+            segments = downloader['segments']
+            for seg in segments:
+                if not 0 <= seg['downloaded'] <= seg['end'] - seg['start'] + 1:
+                    return None
+            return segments
+        except Exception:
+            return None
+        finally:
+            stream.close()
+
+    def _write_segments_file(self, filename, total_bytes, segments):
+        stream, _ = sanitize_open(self.ytdl_filename(filename), 'w')
+        try:
+            stream.write(json.dumps({
+                'downloader': {
+                    'total_bytes': total_bytes,
+                    'segments': segments,
+                },
+            }))
+        finally:
+            stream.close()
+
+    def _download_segmented(self, filename, tmpfilename, url, headers, connections, info_dict):
+        """
+        Download url over several connections, each one fetching its own byte
+        range directly into the right place of tmpfilename.
+
+        Returns None if the file should be downloaded over a single connection
+        instead, otherwise True on success and False on failure.
+        """
+        ytdl_filename = encodeFilename(self.ytdl_filename(filename))
+        tmp_exists = os.path.isfile(encodeFilename(tmpfilename))
+        if tmp_exists and not os.path.isfile(ytdl_filename):
+            # Partial download made over a single connection, keep resuming it
+            return None
+
+        # Find out whether ranged requests are supported and the file size
+        request = sanitized_Request(url, None, headers)
+        request.add_header('Range', 'bytes=0-0')
+        try:
+            probe = self.ydl.urlopen(request)
+        except (compat_urllib_error.URLError, socket.error):
+            return None
+        content_range = probe.headers.get('Content-Range')
+        last_modified = probe.info().get('last-modified')
+        probe.close()
+        mobj = re.search(r'bytes 0-0/(\d+)', content_range or '')
+        if not mobj:
+            return None
+        total_bytes = int(mobj.group(1))
+        connections = min(connections, total_bytes // self._MIN_SEGMENT_SIZE)
+        if connections <= 1:
+            return None
+
+        min_data_len = self.params.get('min_filesize')
+        max_data_len = self.params.get('max_filesize')
+        if min_data_len is not None and total_bytes < min_data_len:
+            self.to_screen('\r[download] File is smaller than min-filesize (%s bytes < %s bytes). Aborting.' % (total_bytes, min_data_len))
+            return False
+        if max_data_len is not None and total_bytes > max_data_len:
+            self.to_screen('\r[download] File is larger than max-filesize (%s bytes > %s bytes). Aborting.' % (total_bytes, max_data_len))
+            return False
+
+        segments = None
+        if tmp_exists and self.params.get('continuedl', True):
+            if os.path.getsize(encodeFilename(tmpfilename)) == total_bytes:
+                segments = self._read_segments_file(filename, total_bytes)
+            if segments is None:
+                self.report_warning(
+                    'Inconsistent state of incomplete segmented download. Restarting from the beginning...')
+            else:
+                self.report_resuming_byte(sum(seg['downloaded'] for seg in segments))
+        if segments is None:
+            segment_size = -(-total_bytes // connections)
+            segments = [{
+                'start': start,
+                'end': min(start + segment_size, total_bytes) - 1,
+                'downloaded': 0,
+            } for start in range(0, total_bytes, segment_size)]
+            try:
+                stream, tmpfilename = sanitize_open(tmpfilename, 'wb')
+                stream.truncate(total_bytes)
+                stream.close()
+            except (OSError, IOError) as err:
+                self.report_error('unable to open for writing: %s' % error_to_compat_str(err))
+                return False
+        self._write_segments_file(filename, total_bytes, segments)
+
+        self.report_destination(filename)
+        if self.params.get('xattr_set_filesize', False):
+            try:
+                write_xattr(tmpfilename, 'user.ytdl.filesize', str(total_bytes).encode('utf-8'))
+            except (XAttrUnavailableError, XAttrMetadataError) as err:
+                self.report_error('unable to set filesize xattr: %s' % str(err))
+
+        retries = self.params.get('retries', 0)
+        ratelimit = self.params.get('ratelimit')
+        lock = threading.Lock()
+        resume_len = sum(seg['downloaded'] for seg in segments)
+        start_time = time.time()
+        state = {
+            'downloaded_bytes': resume_len,
+            'ytdl_written': start_time,
+            'abort': False,
+            'errors': [],
+        }
+
+        class GiveUp(Exception):
+            pass
+
+        def segment_done(seg, byte_count):
+            with lock:
+                seg['downloaded'] += byte_count
+                state['downloaded_bytes'] += byte_count
+                now = time.time()
+                if now - state['ytdl_written'] >= 1:
+                    self._write_segments_file(filename, total_bytes, segments)
+                    state['ytdl_written'] = now
+                self._hook_progress({
+                    'status': 'downloading',
+                    'downloaded_bytes': state['downloaded_bytes'],
+                    'total_bytes': total_bytes,
+                    'tmpfilename': tmpfilename,
+                    'filename': filename,
+                    'eta': self.calc_eta(
+                        start_time, now, total_bytes - resume_len,
+                        state['downloaded_bytes'] - resume_len),
+                    'speed': self.calc_speed(
+                        start_time, now, state['downloaded_bytes'] - resume_len),
+                    'elapsed': now - start_time,
+                })
+
+        def download_segment(seg, stream):
+            seg_len = seg['end'] - seg['start'] + 1
+            range_start = seg['start'] + seg['downloaded']
+            request = sanitized_Request(url, None, headers)
+            request.add_header('Range', 'bytes=%d-%d' % (range_start, seg['end']))
+            data = self.ydl.urlopen(request)
+            try:
+                content_range = data.headers.get('Content-Range') or ''
+                mobj = re.search(r'bytes (\d+)-', content_range)
+                if not mobj or int(mobj.group(1)) != range_start:
+                    raise compat_urllib_error.URLError(
+                        'server ignored range %d-%d' % (range_start, seg['end']))
+                stream.seek(range_start)
+                block_size = self.params.get('buffersize', 1024)
+                byte_counter = 0
+                start = before = time.time()
+                while seg['downloaded'] < seg_len and not state['abort']:
+                    data_block = data.read(min(block_size, seg_len - seg['downloaded']))
+                    if not data_block:
+                        raise ContentTooShortError(seg['downloaded'], seg_len)
+                    stream.write(data_block)
+                    stream.flush()
+                    byte_counter += len(data_block)
+                    segment_done(seg, len(data_block))
+                    if ratelimit:
+                        # Every connection gets an equal share of the rate limit
+                        sleep_time = float(byte_counter) * len(segments) / ratelimit - (time.time() - start)
+                        if sleep_time > 0:
+                            time.sleep(sleep_time)
+                    now = time.time()
+                    if not self.params.get('noresizebuffer', False):
+                        block_size = self.best_block_size(now - before, len(data_block))
+                    before = now
+            finally:
+                data.close()
+
+        def worker(seg):
+            stream = None
+            count = 0
+            try:
+                stream = open(encodeFilename(tmpfilename), 'r+b')
+                while seg['downloaded'] < seg['end'] - seg['start'] + 1 and not state['abort']:
+                    try:
+                        download_segment(seg, stream)
+                    except compat_urllib_error.HTTPError as err:
+                        if err.code < 500 or err.code >= 600:
+                            raise
+                        retry_err = err
+                    except compat_urllib_error.URLError as err:
+                        if not isinstance(getattr(err, 'reason', None), socket.timeout):
+                            raise
+                        retry_err = err
+                    except socket.timeout as err:
+                        retry_err = err
+                    except socket.error as err:
+                        if err.errno not in (errno.ECONNRESET, errno.ETIMEDOUT):
+                            raise
+                        retry_err = err
+                    except ContentTooShortError as err:
+                        retry_err = err
+                    else:
+                        continue
+                    count += 1
+                    if count > retries:
+                        raise GiveUp()
+                    self.report_retry(retry_err, count, retries)
+            except Exception as err:
+                with lock:
+                    state['errors'].append(err)
+                    state['abort'] = True
+            finally:
+                if stream is not None:
+                    stream.close()
+
+        workers = [
+            threading.Thread(target=worker, args=(seg, ))
+            for seg in segments if seg['downloaded'] < seg['end'] - seg['start'] + 1]
+        for t in workers:
+            t.daemon = True
+            t.start()
+        try:
+            for t in workers:
+                while t.is_alive():
+                    t.join(1)
+        finally:
+            with lock:
+                state['abort'] = True
+                self._write_segments_file(filename, total_bytes, segments)
+
+        if state['errors']:
+            err = state['errors'][0]
+            if isinstance(err, GiveUp):
+                self.report_error('giving up after %s retries' % retries)
+                return False
+            raise err
+
+        os.remove(ytdl_filename)
+        self.try_rename(tmpfilename, filename)
+
+        if self.params.get('updatetime', True):
+            info_dict['filetime'] = self.try_utime(filename, last_modified)
+
+        self._hook_progress({
+            'downloaded_bytes': total_bytes,
+            'total_bytes': total_bytes,
+            'filename': filename,
+            'status': 'finished',
+            'elapsed': time.time() - start_time,
+        })
+
+        return True
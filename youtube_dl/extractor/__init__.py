@@ -15,6 +15,13 @@ except ImportError:
     ]
     _ALL_CLASSES.append(GenericIE)
 
+try:
+    # url_pattern_keys of the URL patterns of the extractors by ie_key,
+    # computed by devscripts/make_lazy_extractors.py
+    from .lazy_extractors import _URL_PATTERN_KEYS
+except ImportError:
+    _URL_PATTERN_KEYS = None
+
 
 def gen_extractor_classes():
     """ Return a list of supported extractors.
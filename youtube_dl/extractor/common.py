@@ -36,6 +36,7 @@ from ..downloader.f4m import (
     get_base_url,
     remove_encrypted_media,
 )
+from ..downloader.hls import M3U8Playlist
 from ..utils import (
     NO_DEFAULT,
     age_restricted,
@@ -51,6 +52,7 @@ from ..utils import (
     extract_attributes,
     fix_xml_ampersands,
     float_or_none,
+    FragmentSequence,
     GeoRestrictedError,
     GeoUtils,
     int_or_none,
@@ -62,7 +64,6 @@ from ..utils import (
     parse_codecs,
     parse_duration,
     parse_iso8601,
-    parse_m3u8_attributes,
     parse_resolution,
     RegexNotFoundError,
     sanitized_Request,
@@ -84,6 +85,22 @@ from ..utils import (
 )
 
 
+# The re module only caches a few hundred compiled patterns, far less than
+# what extractors use in a long batch, so _search_regex keeps its own cache
+_REGEX_CACHE = {}
+_REGEX_CACHE_SIZE = 4096
+
+
+def _compile_regex(pattern, flags=0):
+    key = (type(pattern), pattern, flags)
+    regex = _REGEX_CACHE.get(key)
+    if regex is None:
+        if len(_REGEX_CACHE) >= _REGEX_CACHE_SIZE:
+            _REGEX_CACHE.clear()
+        regex = _REGEX_CACHE[key] = re.compile(pattern, flags)
+    return regex
+
+
 class InfoExtractor(object):
     """Information Extractor class.
 
@@ -594,11 +611,13 @@ class InfoExtractor(object):
         else:
             assert False
 
-    def _request_webpage(self, url_or_request, video_id, note=None, errnote=None, fatal=True, data=None, headers={}, query={}, expected_status=None):
+    def _request_webpage(self, url_or_request, video_id, note=None, errnote=None, fatal=True, data=None, headers={}, query={}, expected_status=None, cache=False):
         """
         Return the response handle.
 
-        See _download_webpage docstring for arguments specification.
+        See _download_webpage docstring for arguments specification. Unlike
+        there, cache is off by default since a cacheable response is read
+        completely before being returned.
         """
         if note is None:
             self.report_download_webpage(video_id)
@@ -625,13 +644,32 @@ class InfoExtractor(object):
                 url_or_request = update_url_query(url_or_request, query)
             if data is not None or headers:
                 url_or_request = sanitized_Request(url_or_request, data, headers)
+
+        response_cache = getattr(self._downloader, 'response_cache', None)
+        cache_key = cached = None
+        if cache and response_cache is not None and response_cache.enabled:
+            cache_key = response_cache.key(url_or_request)
+            cached = cache_key and response_cache.load(cache_key)
+            if cached:
+                entry, body = cached
+                if response_cache.is_fresh(entry):
+                    return response_cache.response(cache_key, entry, body)
+                validators = response_cache.validators(entry)
+                if isinstance(url_or_request, compat_urllib_request.Request):
+                    url_or_request = update_Request(url_or_request, headers=validators)
+                else:
+                    url_or_request = sanitized_Request(url_or_request, None, validators)
+
         exceptions = [compat_urllib_error.URLError, compat_http_client.HTTPException, socket.error]
         if hasattr(ssl, 'CertificateError'):
             exceptions.append(ssl.CertificateError)
         try:
-            return self._downloader.urlopen(url_or_request)
+            urlh = self._downloader.urlopen(url_or_request)
         except tuple(exceptions) as err:
             if isinstance(err, compat_urllib_error.HTTPError):
+                if cached and err.code == 304:
+                    return response_cache.revalidated(
+                        cache_key, cached[0], cached[1], err.info())
                 if self.__can_accept_status_code(err, expected_status):
                     # Retain reference to error to prevent file object from
                     # being closed before it can be read. Works around the
@@ -651,8 +689,11 @@ class InfoExtractor(object):
             else:
                 self._downloader.report_warning(errmsg)
                 return False
+        if cache_key:
+            urlh = response_cache.store(cache_key, urlh)
+        return urlh
 
-    def _download_webpage_handle(self, url_or_request, video_id, note=None, errnote=None, fatal=True, encoding=None, data=None, headers={}, query={}, expected_status=None):
+    def _download_webpage_handle(self, url_or_request, video_id, note=None, errnote=None, fatal=True, encoding=None, data=None, headers={}, query={}, expected_status=None, cache=True):
         """
         Return a tuple (page content as string, URL handle).
 
@@ -662,7 +703,7 @@ class InfoExtractor(object):
         if isinstance(url_or_request, (compat_str, str)):
             url_or_request = url_or_request.partition('#')[0]
 
-        urlh = self._request_webpage(url_or_request, video_id, note, errnote, fatal, data=data, headers=headers, query=query, expected_status=expected_status)
+        urlh = self._request_webpage(url_or_request, video_id, note, errnote, fatal, data=data, headers=headers, query=query, expected_status=expected_status, cache=cache)
         if urlh is False:
             assert not fatal
             return False
@@ -754,7 +795,7 @@ class InfoExtractor(object):
     def _download_webpage(
             self, url_or_request, video_id, note=None, errnote=None,
             fatal=True, tries=1, timeout=5, encoding=None, data=None,
-            headers={}, query={}, expected_status=None):
+            headers={}, query={}, expected_status=None, cache=True):
         """
         Return the data of the page as a string.
 
@@ -787,6 +828,10 @@ class InfoExtractor(object):
                   returning True if it should be accepted
             Note that this argument does not affect success status codes (2xx)
             which are always accepted.
+        cache -- whether the response may be taken from and stored in the
+            HTTP response cache (when enabled with the http_cache option).
+            Should be False for requests whose response depends on state
+            not carried by the request itself (e.g. session cookies).
         """
 
         success = False
@@ -796,7 +841,7 @@ class InfoExtractor(object):
                 res = self._download_webpage_handle(
                     url_or_request, video_id, note, errnote, fatal,
                     encoding=encoding, data=data, headers=headers, query=query,
-                    expected_status=expected_status)
+                    expected_status=expected_status, cache=cache)
                 success = True
             except compat_http_client.IncompleteRead as e:
                 try_count += 1
@@ -813,7 +858,7 @@ class InfoExtractor(object):
             self, url_or_request, video_id, note='Downloading XML',
             errnote='Unable to download XML', transform_source=None,
             fatal=True, encoding=None, data=None, headers={}, query={},
-            expected_status=None):
+            expected_status=None, cache=True):
         """
         Return a tuple (xml as an compat_etree_Element, URL handle).
 
@@ -822,7 +867,7 @@ class InfoExtractor(object):
         res = self._download_webpage_handle(
             url_or_request, video_id, note, errnote, fatal=fatal,
             encoding=encoding, data=data, headers=headers, query=query,
-            expected_status=expected_status)
+            expected_status=expected_status, cache=cache)
         if res is False:
             return res
         xml_string, urlh = res
@@ -834,7 +879,7 @@ class InfoExtractor(object):
             self, url_or_request, video_id,
             note='Downloading XML', errnote='Unable to download XML',
             transform_source=None, fatal=True, encoding=None,
-            data=None, headers={}, query={}, expected_status=None):
+            data=None, headers={}, query={}, expected_status=None, cache=True):
         """
         Return the xml as an compat_etree_Element.
 
@@ -844,7 +889,7 @@ class InfoExtractor(object):
             url_or_request, video_id, note=note, errnote=errnote,
             transform_source=transform_source, fatal=fatal, encoding=encoding,
             data=data, headers=headers, query=query,
-            expected_status=expected_status)
+            expected_status=expected_status, cache=cache)
         return res if res is False else res[0]
 
     def _parse_xml(self, xml_string, video_id, transform_source=None, fatal=True):
@@ -863,7 +908,7 @@ class InfoExtractor(object):
             self, url_or_request, video_id, note='Downloading JSON metadata',
             errnote='Unable to download JSON metadata', transform_source=None,
             fatal=True, encoding=None, data=None, headers={}, query={},
-            expected_status=None):
+            expected_status=None, cache=True):
         """
         Return a tuple (JSON object, URL handle).
 
@@ -872,7 +917,7 @@ class InfoExtractor(object):
         res = self._download_webpage_handle(
             url_or_request, video_id, note, errnote, fatal=fatal,
             encoding=encoding, data=data, headers=headers, query=query,
-            expected_status=expected_status)
+            expected_status=expected_status, cache=cache)
         if res is False:
             return res
         json_string, urlh = res
@@ -884,7 +929,7 @@ class InfoExtractor(object):
             self, url_or_request, video_id, note='Downloading JSON metadata',
             errnote='Unable to download JSON metadata', transform_source=None,
             fatal=True, encoding=None, data=None, headers={}, query={},
-            expected_status=None):
+            expected_status=None, cache=True):
         """
         Return the JSON object as a dict.
 
@@ -894,7 +939,7 @@ class InfoExtractor(object):
             url_or_request, video_id, note=note, errnote=errnote,
             transform_source=transform_source, fatal=fatal, encoding=encoding,
             data=data, headers=headers, query=query,
-            expected_status=expected_status)
+            expected_status=expected_status, cache=cache)
         return res if res is False else res[0]
 
     def _parse_json(self, json_string, video_id, transform_source=None, fatal=True):
@@ -985,11 +1030,16 @@ class InfoExtractor(object):
         In case of failure return a default value or raise a WARNING or a
         RegexNotFoundError, depending on fatal, specifying the field name.
         """
+        def search(p):
+            if isinstance(p, compiled_regex_type):
+                return re.search(p, string, flags)
+            return _compile_regex(p, flags).search(string)
+
         if isinstance(pattern, (str, compat_str, compiled_regex_type)):
-            mobj = re.search(pattern, string, flags)
+            mobj = search(pattern)
         else:
             for p in pattern:
-                mobj = re.search(p, string, flags)
+                mobj = search(p)
                 if mobj:
                     break
 
@@ -1082,22 +1132,32 @@ class InfoExtractor(object):
         return compat_getpass('Type %s and press [Return]: ' % note)
 
     # Helper functions for extracting OpenGraph info
+    # The patterns are built once per property
+    _OG_REGEXES = {}
+    _META_REGEXES = {}
+
     @staticmethod
     def _og_regexes(prop):
-        content_re = r'content=(?:"([^"]+?)"|\'([^\']+?)\'|\s*([^\s"\'=<>`]+?))'
-        property_re = (r'(?:name|property)=(?:\'og[:-]%(prop)s\'|"og[:-]%(prop)s"|\s*og[:-]%(prop)s\b)'
-                       % {'prop': re.escape(prop)})
-        template = r'<meta[^>]+?%s[^>]+?%s'
-        return [
-            template % (property_re, content_re),
-            template % (content_re, property_re),
-        ]
+        regexes = InfoExtractor._OG_REGEXES.get(prop)
+        if regexes is None:
+            content_re = r'content=(?:"([^"]+?)"|\'([^\']+?)\'|\s*([^\s"\'=<>`]+?))'
+            property_re = (r'(?:name|property)=(?:\'og[:-]%(prop)s\'|"og[:-]%(prop)s"|\s*og[:-]%(prop)s\b)'
+                           % {'prop': re.escape(prop)})
+            template = r'<meta[^>]+?%s[^>]+?%s'
+            regexes = InfoExtractor._OG_REGEXES[prop] = (
+                template % (property_re, content_re),
+                template % (content_re, property_re),
+            )
+        return list(regexes)
 
     @staticmethod
     def _meta_regex(prop):
-        return r'''(?isx)<meta
+        regex = InfoExtractor._META_REGEXES.get(prop)
+        if regex is None:
+            regex = InfoExtractor._META_REGEXES[prop] = r'''(?isx)<meta
                     (?=[^>]+(?:itemprop|name|property|id|http-equiv)=(["\']?)%s\1)
                     [^>]+?content=(["\'])(?P<content>.*?)\2''' % re.escape(prop)
+        return regex
 
     def _og_search_property(self, prop, html, name=None, **kargs):
         if not isinstance(prop, (list, tuple)):
@@ -1656,10 +1716,7 @@ class InfoExtractor(object):
 
         formats = []
 
-        format_url = lambda u: (
-            u
-            if re.match(r'^https?://', u)
-            else compat_urlparse.urljoin(m3u8_url, u))
+        playlist = M3U8Playlist(m3u8_doc, m3u8_url)
 
         # References:
         # 1. https://tools.ietf.org/html/draft-pantos-http-live-streaming-21
@@ -1675,9 +1732,10 @@ class InfoExtractor(object):
         # master playlist tags MUST NOT appear in a media playlist and vice versa.
         # As of [1, 4.3.3.1] #EXT-X-TARGETDURATION tag is REQUIRED for every
         # media playlist and MUST NOT appear in master playlist thus we can
-        # clearly detect media playlist with this criterion.
+        # clearly detect media playlist with this criterion (M3U8Playlist
+        # also looks for #EXTINF, required for every media segment).
 
-        if '#EXT-X-TARGETDURATION' in m3u8_doc:  # media playlist, return as is
+        if not playlist.is_master:  # media playlist, return as is
             return [{
                 'url': m3u8_url,
                 'format_id': m3u8_id,
@@ -1687,10 +1745,8 @@ class InfoExtractor(object):
             }]
 
         groups = {}
-        last_stream_inf = {}
 
-        def extract_media(x_media_line):
-            media = parse_m3u8_attributes(x_media_line)
+        def extract_media(media):
             # As per [1, 4.3.4.1] TYPE, GROUP-ID and NAME are REQUIRED
             media_type, group_id, name = media.get('TYPE'), media.get('GROUP-ID'), media.get('NAME')
             if not (media_type and group_id and name):
@@ -1706,7 +1762,7 @@ class InfoExtractor(object):
                         format_id.append(v)
                 f = {
                     'format_id': '-'.join(format_id),
-                    'url': format_url(media_url),
+                    'url': playlist.resolve_url(media_url),
                     'manifest_url': m3u8_url,
                     'language': media.get('LANGUAGE'),
                     'ext': ext,
@@ -1717,17 +1773,17 @@ class InfoExtractor(object):
                     f['vcodec'] = 'none'
                 formats.append(f)
 
-        def build_stream_name():
+        def build_stream_name(stream_inf):
             # Despite specification does not mention NAME attribute for
             # EXT-X-STREAM-INF tag it still sometimes may be present (see [1]
             # or vidio test in TestInfoExtractor.test_parse_m3u8_formats)
             # 1. http://www.vidio.com/watch/165683-dj_ambred-booyah-live-2015
-            stream_name = last_stream_inf.get('NAME')
+            stream_name = stream_inf.get('NAME')
             if stream_name:
                 return stream_name
             # If there is no NAME in EXT-X-STREAM-INF it will be obtained
             # from corresponding rendition group
-            stream_group_id = last_stream_inf.get('VIDEO')
+            stream_group_id = stream_inf.get('VIDEO')
             if not stream_group_id:
                 return
             stream_group = groups.get(stream_group_id)
@@ -1739,88 +1795,79 @@ class InfoExtractor(object):
         # parse EXT-X-MEDIA tags before EXT-X-STREAM-INF in order to have the
         # chance to detect video only formats when EXT-X-STREAM-INF tags
         # precede EXT-X-MEDIA tags in HLS manifest such as [3].
-        for line in m3u8_doc.splitlines():
-            if line.startswith('#EXT-X-MEDIA:'):
-                extract_media(line)
-
-        for line in m3u8_doc.splitlines():
-            if line.startswith('#EXT-X-STREAM-INF:'):
-                last_stream_inf = parse_m3u8_attributes(line)
-            elif line.startswith('#') or not line.strip():
-                continue
-            else:
-                tbr = float_or_none(
-                    last_stream_inf.get('AVERAGE-BANDWIDTH')
-                    or last_stream_inf.get('BANDWIDTH'), scale=1000)
-                format_id = []
-                if m3u8_id:
-                    format_id.append(m3u8_id)
-                stream_name = build_stream_name()
-                # Bandwidth of live streams may differ over time thus making
-                # format_id unpredictable. So it's better to keep provided
-                # format_id intact.
-                if not live:
-                    format_id.append(stream_name if stream_name else '%d' % (tbr if tbr else len(formats)))
-                manifest_url = format_url(line.strip())
-                f = {
-                    'format_id': '-'.join(format_id),
-                    'url': manifest_url,
-                    'manifest_url': m3u8_url,
-                    'tbr': tbr,
-                    'ext': ext,
-                    'fps': float_or_none(last_stream_inf.get('FRAME-RATE')),
-                    'protocol': entry_protocol,
-                    'preference': preference,
-                }
-                resolution = last_stream_inf.get('RESOLUTION')
-                if resolution:
-                    mobj = re.search(r'(?P<width>\d+)[xX](?P<height>\d+)', resolution)
-                    if mobj:
-                        f['width'] = int(mobj.group('width'))
-                        f['height'] = int(mobj.group('height'))
-                # Unified Streaming Platform
-                mobj = re.search(
-                    r'audio.*?(?:%3D|=)(\d+)(?:-video.*?(?:%3D|=)(\d+))?', f['url'])
+        for media in playlist.media:
+            extract_media(media)
+
+        for stream_inf, manifest_url in playlist.variants:
+            tbr = float_or_none(
+                stream_inf.get('AVERAGE-BANDWIDTH')
+                or stream_inf.get('BANDWIDTH'), scale=1000)
+            format_id = []
+            if m3u8_id:
+                format_id.append(m3u8_id)
+            stream_name = build_stream_name(stream_inf)
+            # Bandwidth of live streams may differ over time thus making
+            # format_id unpredictable. So it's better to keep provided
+            # format_id intact.
+            if not live:
+                format_id.append(stream_name if stream_name else '%d' % (tbr if tbr else len(formats)))
+            f = {
+                'format_id': '-'.join(format_id),
+                'url': manifest_url,
+                'manifest_url': m3u8_url,
+                'tbr': tbr,
+                'ext': ext,
+                'fps': float_or_none(stream_inf.get('FRAME-RATE')),
+                'protocol': entry_protocol,
+                'preference': preference,
+            }
+            resolution = stream_inf.get('RESOLUTION')
+            if resolution:
+                mobj = re.search(r'(?P<width>\d+)[xX](?P<height>\d+)', resolution)
                 if mobj:
-                    abr, vbr = mobj.groups()
-                    abr, vbr = float_or_none(abr, 1000), float_or_none(vbr, 1000)
-                    f.update({
-                        'vbr': vbr,
-                        'abr': abr,
-                    })
-                codecs = parse_codecs(last_stream_inf.get('CODECS'))
-                f.update(codecs)
-                audio_group_id = last_stream_inf.get('AUDIO')
-                # As per [1, 4.3.4.1.1] any EXT-X-STREAM-INF tag which
-                # references a rendition group MUST have a CODECS attribute.
-                # However, this is not always respected, for example, [2]
-                # contains EXT-X-STREAM-INF tag which references AUDIO
-                # rendition group but does not have CODECS and despite
-                # referencing an audio group it represents a complete
-                # (with audio and video) format. So, for such cases we will
-                # ignore references to rendition groups and treat them
-                # as complete formats.
-                if audio_group_id and codecs and f.get('vcodec') != 'none':
-                    audio_group = groups.get(audio_group_id)
-                    if audio_group and audio_group[0].get('URI'):
-                        # TODO: update acodec for audio only formats with
-                        # the same GROUP-ID
-                        f['acodec'] = 'none'
-                formats.append(f)
-
-                # for DailyMotion
-                progressive_uri = last_stream_inf.get('PROGRESSIVE-URI')
-                if progressive_uri:
-                    http_f = f.copy()
-                    del http_f['manifest_url']
-                    http_f.update({
-                        'format_id': f['format_id'].replace('hls-', 'http-'),
-                        'protocol': 'http',
-                        'url': progressive_uri,
-                    })
-                    formats.append(http_f)
-
-                last_stream_inf = {}
+                    f['width'] = int(mobj.group('width'))
+                    f['height'] = int(mobj.group('height'))
+            # Unified Streaming Platform
+            mobj = re.search(
+                r'audio.*?(?:%3D|=)(\d+)(?:-video.*?(?:%3D|=)(\d+))?', f['url'])
+            if mobj:
+                abr, vbr = mobj.groups()
+                abr, vbr = float_or_none(abr, 1000), float_or_none(vbr, 1000)
+                f.update({
+                    'vbr': vbr,
+                    'abr': abr,
+                })
+            codecs = parse_codecs(stream_inf.get('CODECS'))
+            f.update(codecs)
+            audio_group_id = stream_inf.get('AUDIO')
+            # As per [1, 4.3.4.1.1] any EXT-X-STREAM-INF tag which
+            # references a rendition group MUST have a CODECS attribute.
+            # However, this is not always respected, for example, [2]
+            # contains EXT-X-STREAM-INF tag which references AUDIO
+            # rendition group but does not have CODECS and despite
+            # referencing an audio group it represents a complete
+            # (with audio and video) format. So, for such cases we will
+            # ignore references to rendition groups and treat them
+            # as complete formats.
+            if audio_group_id and codecs and f.get('vcodec') != 'none':
+                audio_group = groups.get(audio_group_id)
+                if audio_group and audio_group[0].get('URI'):
+                    # TODO: update acodec for audio only formats with
+                    # the same GROUP-ID
+                    f['acodec'] = 'none'
+            formats.append(f)
+
+            # for DailyMotion
+            progressive_uri = stream_inf.get('PROGRESSIVE-URI')
+            if progressive_uri:
+                http_f = f.copy()
+                del http_f['manifest_url']
+                http_f.update({
+                    'format_id': f['format_id'].replace('hls-', 'http-'),
+                    'protocol': 'http',
+                    'url': progressive_uri,
+                })
+                formats.append(http_f)
         return formats
 
     @staticmethod
@@ -2263,47 +2310,30 @@ class InfoExtractor(object):
                             if '%(Number' in media_template and 's' not in representation_ms_info:
                                 segment_duration = None
                                 if 'total_number' not in representation_ms_info and 'segment_duration' in representation_ms_info:
-                                    segment_duration = float_or_none(representation_ms_info['segment_duration'], representation_ms_info['timescale'])
-                                    representation_ms_info['total_number'] = int(math.ceil(float(period_duration) / segment_duration))
-                                representation_ms_info['fragments'] = [{
-                                    media_location_key: media_template % {
-                                        'Number': segment_number,
-                                        'Bandwidth': bandwidth,
-                                    },
-                                    'duration': segment_duration,
-                                } for segment_number in range(
-                                    representation_ms_info['start_number'],
-                                    representation_ms_info['total_number'] + representation_ms_info['start_number'])]
+                                    segment_duration = representation_ms_info['segment_duration']
+                                    representation_ms_info['total_number'] = int(math.ceil(
+                                        float(period_duration) / float_or_none(segment_duration, representation_ms_info['timescale'])))
+                                timeline = [(
+                                    representation_ms_info['start_number'], 0, segment_duration,
+                                    representation_ms_info['total_number'])]
                             else:
                                 # $Number*$ or $Time$ in media template with S list available
                                 # Example $Number*$: http://www.svtplay.se/klipp/9023742/stopptid-om-bjorn-borg
                                 # Example $Time$: https://play.arkena.com/embed/avp/v2/player/media/b41dda37-d8e7-4d3f-b1b5-9a9db578bdfe/1/129411
-                                representation_ms_info['fragments'] = []
+                                timeline = []
                                 segment_time = 0
-                                segment_d = None
                                 segment_number = representation_ms_info['start_number']
-
-                                def add_segment_url():
-                                    segment_url = media_template % {
-                                        'Time': segment_time,
-                                        'Bandwidth': bandwidth,
-                                        'Number': segment_number,
-                                    }
-                                    representation_ms_info['fragments'].append({
-                                        media_location_key: segment_url,
-                                        'duration': float_or_none(segment_d, representation_ms_info['timescale']),
-                                    })
-
-                                for num, s in enumerate(representation_ms_info['s']):
+                                for s in representation_ms_info['s']:
                                     segment_time = s.get('t') or segment_time
-                                    segment_d = s['d']
-                                    add_segment_url()
-                                    segment_number += 1
-                                    for r in range(s.get('r', 0)):
-                                        segment_time += segment_d
-                                        add_segment_url()
-                                        segment_number += 1
-                                    segment_time += segment_d
+                                    count = max(s.get('r', 0), 0) + 1
+                                    timeline.append((segment_number, segment_time, s['d'], count))
+                                    segment_number += count
+                                    segment_time += s['d'] * count
+                            # Fragments are only formatted when accessed, most
+                            # formats are never downloaded
+                            representation_ms_info['fragments'] = FragmentSequence(
+                                media_template, timeline, representation_ms_info['timescale'],
+                                bandwidth, media_location_key)
                         elif 'segment_urls' in representation_ms_info and 's' in representation_ms_info:
                             # No media template
                             # Example: https://www.youtube.com/watch?v=iXZV5uAYMJI
@@ -2346,15 +2376,14 @@ class InfoExtractor(object):
                                 # NB: mpd_url may be empty when MPD manifest is parsed from a string
                                 'url': mpd_url or base_url,
                                 'fragment_base_url': base_url,
-                                'fragments': [],
+                                'fragments': representation_ms_info['fragments'],
                                 'protocol': 'http_dash_segments',
                             })
                             if 'initialization_url' in representation_ms_info:
                                 initialization_url = representation_ms_info['initialization_url']
                                 if not f.get('url'):
                                     f['url'] = initialization_url
-                                f['fragments'].append({location_key(initialization_url): initialization_url})
-                            f['fragments'].extend(representation_ms_info['fragments'])
+                                f['fragments'] = [{location_key(initialization_url): initialization_url}] + f['fragments']
                         else:
                             # Assuming direct URL to unfragmented media.
                             f['url'] = base_url
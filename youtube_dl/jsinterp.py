@@ -1,5 +1,6 @@
 from __future__ import unicode_literals
 
+import itertools
 import json
 import operator
 import re
@@ -27,6 +28,45 @@ _ASSIGN_OPERATORS.append(('=', lambda cur, right: right))
 _NAME_RE = r'[a-zA-Z_$][a-zA-Z_$0-9]*'
 
 
+def _js_split(obj, argvals):
+    assert argvals == ('',)
+    return list(obj)
+
+
+def _js_join(obj, argvals):
+    assert len(argvals) == 1
+    return argvals[0].join(obj)
+
+
+def _js_reverse(obj, argvals):
+    assert len(argvals) == 0
+    obj.reverse()
+    return obj
+
+
+def _js_slice(obj, argvals):
+    assert len(argvals) == 1
+    return obj[argvals[0]:]
+
+
+def _js_splice(obj, argvals):
+    assert isinstance(obj, list)
+    index, howMany = argvals
+    res = []
+    for i in range(index, min(index + howMany, len(obj))):
+        res.append(obj.pop(index))
+    return res
+
+
+_BUILTIN_METHODS = {
+    'split': _js_split,
+    'join': _js_join,
+    'reverse': _js_reverse,
+    'slice': _js_slice,
+    'splice': _js_splice,
+}
+
+
 class JSInterpreter(object):
     def __init__(self, code, objects=None):
         if objects is None:
@@ -34,8 +74,22 @@ class JSInterpreter(object):
         self.code = code
         self._functions = {}
         self._objects = objects
+        self._paren_ids = itertools.count()
 
     def interpret_statement(self, stmt, local_vars, allow_recursion=100):
+        func, should_abort = self.compile_statement(stmt, allow_recursion)
+        return func(local_vars), should_abort
+
+    def interpret_expression(self, expr, local_vars, allow_recursion):
+        return self.compile_expression(expr, allow_recursion)(local_vars)
+
+    def compile_statement(self, stmt, allow_recursion=100):
+        """
+        Parse a statement once
+
+        Returns a tuple (func, should_abort), where func takes the dict of
+        local variables and returns the value of the statement.
+        """
         if allow_recursion < 0:
             raise ExtractorError('Recursion limit reached')
 
@@ -53,13 +107,15 @@ class JSInterpreter(object):
                 # Try interpreting it as an expression
                 expr = stmt
 
-        v = self.interpret_expression(expr, local_vars, allow_recursion)
-        return v, should_abort
+        return self.compile_expression(expr, allow_recursion), should_abort
 
-    def interpret_expression(self, expr, local_vars, allow_recursion):
+    def compile_expression(self, expr, allow_recursion=100):
+        """
+        Parse an expression once into a function of the local variables
+        """
         expr = expr.strip()
         if expr == '':  # Empty expression
-            return None
+            return lambda local_vars: None
 
         if expr.startswith('('):
             parens_count = 0
@@ -69,15 +125,22 @@ class JSInterpreter(object):
                 else:
                     parens_count -= 1
                     if parens_count == 0:
-                        sub_expr = expr[1:m.start()]
-                        sub_result = self.interpret_expression(
-                            sub_expr, local_vars, allow_recursion)
+                        sub_expr = self.compile_expression(
+                            expr[1:m.start()], allow_recursion)
                         remaining_expr = expr[m.end():].strip()
                         if not remaining_expr:
-                            return sub_result
-                        else:
-                            expr = json.dumps(sub_result) + remaining_expr
-                        break
+                            return sub_expr
+                        # The value of the parenthesized expression is
+                        # stored in a hidden local variable that takes its
+                        # place in the rest of the expression
+                        sub_name = '$$paren%d' % next(self._paren_ids)
+                        rest_expr = self.compile_expression(
+                            sub_name + remaining_expr, allow_recursion)
+
+                        def eval_parens(local_vars):
+                            local_vars[sub_name] = sub_expr(local_vars)
+                            return rest_expr(local_vars)
+                        return eval_parens
             else:
                 raise ExtractorError('Premature end of parens in %r' % expr)
 
@@ -88,127 +151,142 @@ class JSInterpreter(object):
                 (?P<expr>.*)$''' % (_NAME_RE, re.escape(op)), expr)
             if not m:
                 continue
-            right_val = self.interpret_expression(
-                m.group('expr'), local_vars, allow_recursion - 1)
-
-            if m.groupdict().get('index'):
-                lvar = local_vars[m.group('out')]
-                idx = self.interpret_expression(
-                    m.group('index'), local_vars, allow_recursion)
-                assert isinstance(idx, int)
-                cur = lvar[idx]
-                val = opfunc(cur, right_val)
-                lvar[idx] = val
-                return val
-            else:
-                cur = local_vars.get(m.group('out'))
-                val = opfunc(cur, right_val)
-                local_vars[m.group('out')] = val
-                return val
+            return self._compile_assignment(
+                m.group('out'), m.group('index'), opfunc,
+                self.compile_expression(m.group('expr'), allow_recursion - 1),
+                allow_recursion)
 
         if expr.isdigit():
-            return int(expr)
+            int_val = int(expr)
+            return lambda local_vars: int_val
 
         var_m = re.match(
             r'(?!if|return|true|false)(?P<name>%s)$' % _NAME_RE,
             expr)
         if var_m:
-            return local_vars[var_m.group('name')]
+            name = var_m.group('name')
+            return lambda local_vars: local_vars[name]
 
         try:
-            return json.loads(expr)
+            json_val = json.loads(expr)
         except ValueError:
             pass
+        else:
+            if isinstance(json_val, (list, dict)):
+                # Mutable values must not be shared between calls
+                return lambda local_vars: json.loads(expr)
+            return lambda local_vars: json_val
 
         m = re.match(
             r'(?P<in>%s)\[(?P<idx>.+)\]$' % _NAME_RE, expr)
         if m:
-            val = local_vars[m.group('in')]
-            idx = self.interpret_expression(
-                m.group('idx'), local_vars, allow_recursion - 1)
-            return val[idx]
+            in_name = m.group('in')
+            idx_expr = self.compile_expression(m.group('idx'), allow_recursion - 1)
+            return lambda local_vars: local_vars[in_name][idx_expr(local_vars)]
 
         m = re.match(
             r'(?P<var>%s)(?:\.(?P<member>[^(]+)|\[(?P<member2>[^]]+)\])\s*(?:\(+(?P<args>[^()]*)\))?$' % _NAME_RE,
             expr)
         if m:
-            variable = m.group('var')
-            member = remove_quotes(m.group('member') or m.group('member2'))
             arg_str = m.group('args')
-
-            if variable in local_vars:
-                obj = local_vars[variable]
-            else:
-                if variable not in self._objects:
-                    self._objects[variable] = self.extract_object(variable)
-                obj = self._objects[variable]
-
-            if arg_str is None:
-                # Member access
-                if member == 'length':
-                    return len(obj)
-                return obj[member]
-
-            assert expr.endswith(')')
-            # Function call
-            if arg_str == '':
-                argvals = tuple()
-            else:
-                argvals = tuple([
-                    self.interpret_expression(v, local_vars, allow_recursion)
-                    for v in arg_str.split(',')])
-
-            if member == 'split':
-                assert argvals == ('',)
-                return list(obj)
-            if member == 'join':
-                assert len(argvals) == 1
-                return argvals[0].join(obj)
-            if member == 'reverse':
-                assert len(argvals) == 0
-                obj.reverse()
-                return obj
-            if member == 'slice':
-                assert len(argvals) == 1
-                return obj[argvals[0]:]
-            if member == 'splice':
-                assert isinstance(obj, list)
-                index, howMany = argvals
-                res = []
-                for i in range(index, min(index + howMany, len(obj))):
-                    res.append(obj.pop(index))
-                return res
-
-            return obj[member](argvals)
+            arg_exprs = None
+            if arg_str is not None:
+                assert expr.endswith(')')
+                arg_exprs = [
+                    self.compile_expression(v, allow_recursion)
+                    for v in arg_str.split(',')] if arg_str else []
+            return self._compile_member(
+                m.group('var'), remove_quotes(m.group('member') or m.group('member2')),
+                arg_exprs)
 
         for op, opfunc in _OPERATORS:
             m = re.match(r'(?P<x>.+?)%s(?P<y>.+)' % re.escape(op), expr)
             if not m:
                 continue
-            x, abort = self.interpret_statement(
-                m.group('x'), local_vars, allow_recursion - 1)
+            x, abort = self.compile_statement(
+                m.group('x'), allow_recursion - 1)
             if abort:
                 raise ExtractorError(
                     'Premature left-side return of %s in %r' % (op, expr))
-            y, abort = self.interpret_statement(
-                m.group('y'), local_vars, allow_recursion - 1)
+            y, abort = self.compile_statement(
+                m.group('y'), allow_recursion - 1)
             if abort:
                 raise ExtractorError(
                     'Premature right-side return of %s in %r' % (op, expr))
-            return opfunc(x, y)
+            return self._compile_operator(opfunc, x, y)
 
         m = re.match(
             r'^(?P<func>%s)\((?P<args>[a-zA-Z0-9_$,]*)\)$' % _NAME_RE, expr)
         if m:
-            fname = m.group('func')
-            argvals = tuple([
-                int(v) if v.isdigit() else local_vars[v]
-                for v in m.group('args').split(',')]) if len(m.group('args')) > 0 else tuple()
+            return self._compile_call(m.group('func'), [
+                self._compile_argument(v)
+                for v in m.group('args').split(',')] if len(m.group('args')) > 0 else [])
+
+        raise ExtractorError('Unsupported JS expression %r' % expr)
+
+    def _compile_assignment(self, out, index, opfunc, right_expr, allow_recursion):
+        if index:
+            idx_expr = self.compile_expression(index, allow_recursion)
+
+            def assign_index(local_vars):
+                right_val = right_expr(local_vars)
+                lvar = local_vars[out]
+                idx = idx_expr(local_vars)
+                assert isinstance(idx, int)
+                val = opfunc(lvar[idx], right_val)
+                lvar[idx] = val
+                return val
+            return assign_index
+
+        def assign(local_vars):
+            val = opfunc(local_vars.get(out), right_expr(local_vars))
+            local_vars[out] = val
+            return val
+        return assign
+
+    def _compile_member(self, variable, member, arg_exprs):
+        def get_obj(local_vars):
+            if variable in local_vars:
+                return local_vars[variable]
+            if variable not in self._objects:
+                self._objects[variable] = self.extract_object(variable)
+            return self._objects[variable]
+
+        if arg_exprs is None:
+            # Member access
+            if member == 'length':
+                return lambda local_vars: len(get_obj(local_vars))
+            return lambda local_vars: get_obj(local_vars)[member]
+
+        # Function call
+        method = _BUILTIN_METHODS.get(member)
+        if method is None:
+            def method(obj, argvals):
+                return obj[member](argvals)
+
+        def call_member(local_vars):
+            obj = get_obj(local_vars)
+            return method(obj, tuple([a(local_vars) for a in arg_exprs]))
+        return call_member
+
+    @staticmethod
+    def _compile_argument(arg):
+        if arg.isdigit():
+            int_val = int(arg)
+            return lambda local_vars: int_val
+        return lambda local_vars: local_vars[arg]
+
+    @staticmethod
+    def _compile_operator(opfunc, x, y):
+        return lambda local_vars: opfunc(x(local_vars), y(local_vars))
+
+    def _compile_call(self, fname, arg_exprs):
+        def call(local_vars):
+            argvals = tuple([a(local_vars) for a in arg_exprs])
             if fname not in self._functions:
                 self._functions[fname] = self.extract_function(fname)
             return self._functions[fname](argvals)
-
-        raise ExtractorError('Unsupported JS expression %r' % expr)
+        return call
 
     def extract_object(self, objname):
         _FUNC_NAME_RE = r'''(?:[a-zA-Z$0-9]+|"[a-zA-Z$0-9]+"|'[a-zA-Z$0-9]+')'''
@@ -248,14 +326,23 @@ class JSInterpreter(object):
         return self.build_function(argnames, func_m.group('code'))
 
     def call_function(self, funcname, *args):
-        f = self.extract_function(funcname)
-        return f(args)
+        if funcname not in self._functions:
+            self._functions[funcname] = self.extract_function(funcname)
+        return self._functions[funcname](args)
 
     def build_function(self, argnames, code):
+        stmts = code.split(';')
+        # Statements are compiled the first time they are reached, so that
+        # unsupported code after a return statement is never parsed
+        compiled = [None] * len(stmts)
+
         def resf(args):
             local_vars = dict(zip(argnames, args))
-            for stmt in code.split(';'):
-                res, abort = self.interpret_statement(stmt, local_vars)
+            for i, stmt in enumerate(stmts):
+                if compiled[i] is None:
+                    compiled[i] = self.compile_statement(stmt)
+                func, abort = compiled[i]
+                res = func(local_vars)
                 if abort:
                     break
             return res
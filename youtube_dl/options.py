@@ -180,6 +180,19 @@ def parseOpts(overrideArguments=None):
         '--config-location',
         dest='config_location', metavar='PATH',
         help='Location of the configuration file; either the path to the config or its containing directory.')
+    general.add_option(
+        '--serve',
+        dest='serve', metavar='[HOST:]PORT', default=None,
+        help='Run as a server answering JSON requests on the given port '
+             '(on localhost unless a host is given) with warm youtube-dl instances '
+             'instead of processing URLs. POST {"urls": [...], "params": {...}, "download": false} '
+             'as application/json to get the info dict or the error for each URL. '
+             'Requests with an Origin header or an unexpected Host header are refused, '
+             'but anyone able to connect can run youtube-dl with any options')
+    general.add_option(
+        '--serve-workers',
+        dest='serve_workers', metavar='N', default=4, type=int,
+        help='Number of requests the server processes at the same time (default is %default)')
     general.add_option(
         '--flat-playlist',
         action='store_const', dest='extract_flat', const='in_playlist',
@@ -344,6 +357,12 @@ def parseOpts(overrideArguments=None):
         '--download-archive', metavar='FILE',
         dest='download_archive',
         help='Download only videos not listed in the archive file. Record the IDs of all downloaded videos in it.')
+    selection.add_option(
+        '--index-download-archive',
+        dest='index_download_archive', action='store_true', default=False,
+        help='Write an index of the --download-archive file to FILE.idx, so that the archive is not read as a whole '
+             'on start-up any more, only the lines recorded after the index was written. '
+             'Run it again from time to time to include the new lines')
     selection.add_option(
         '--include-ads',
         dest='include_ads', action='store_true',
@@ -474,6 +493,10 @@ def parseOpts(overrideArguments=None):
         '--keep-fragments',
         action='store_true', dest='keep_fragments', default=False,
         help='Keep downloaded fragments on disk after downloading is finished; fragments are erased by default')
+    downloader.add_option(
+        '--concurrent-fragments',
+        dest='concurrent_fragments', metavar='N', default=1, type=int,
+        help='Number of fragments to download in parallel (default is %default) (DASH, hlsnative and ISM)')
     downloader.add_option(
         '--buffer-size',
         dest='buffersize', metavar='SIZE', default='1024',
@@ -487,6 +510,12 @@ def parseOpts(overrideArguments=None):
         dest='http_chunk_size', metavar='SIZE', default=None,
         help='Size of a chunk for chunk-based HTTP downloading (e.g. 10485760 or 10M) (default is disabled). '
              'May be useful for bypassing bandwidth throttling imposed by a webserver (experimental)')
+    downloader.add_option(
+        '--http-connections',
+        dest='http_connections', metavar='N', default=1, type=int,
+        help='Number of parallel connections used to download a single file over HTTP, '
+             'each fetching its own byte range (default is %default). '
+             'May be useful against per-connection throttling')
     downloader.add_option(
         '--test',
         action='store_true', dest='test', default=False,
@@ -499,6 +528,22 @@ def parseOpts(overrideArguments=None):
         '--playlist-random',
         action='store_true',
         help='Download playlist videos in random order')
+    downloader.add_option(
+        '--playlist-workers',
+        dest='playlist_workers', metavar='N', default=1, type=int,
+        help='Number of playlist videos to extract, and of playlist pages to fetch, in parallel ahead of the one being downloaded (default is %default)')
+    downloader.add_option(
+        '--parallel-formats',
+        action='store_true', dest='parallel_formats', default=False,
+        help='Download the formats to be merged (e.g. with -f bestvideo+bestaudio) at the same time, reporting their progress as a whole')
+    downloader.add_option(
+        '--sidecar-workers',
+        dest='sidecar_workers', metavar='N', default=1, type=int,
+        help='Number of subtitles and thumbnails of a video to download at the same time (default is %default)')
+    downloader.add_option(
+        '--sidecar-background',
+        action='store_true', dest='sidecar_background', default=False,
+        help='Download the subtitles and thumbnails of a video while the video itself is being downloaded')
     downloader.add_option(
         '--xattr-set-filesize',
         dest='xattr_set_filesize', action='store_true',
@@ -506,7 +551,7 @@ def parseOpts(overrideArguments=None):
     downloader.add_option(
         '--hls-prefer-native',
         dest='hls_prefer_native', action='store_true', default=None,
-        help='Use the native HLS downloader instead of ffmpeg')
+        help='Use the native HLS downloader instead of ffmpeg, also for live streams')
     downloader.add_option(
         '--hls-prefer-ffmpeg',
         dest='hls_prefer_native', action='store_false', default=None,
@@ -643,6 +688,10 @@ def parseOpts(overrideArguments=None):
         '--no-progress',
         action='store_true', dest='noprogress', default=False,
         help='Do not print progress bar')
+    verbosity.add_option(
+        '--progress-interval', metavar='SECONDS',
+        dest='progress_interval', type=float, default=None,
+        help='Minimum time between two progress updates, of the progress bar and of the progress hooks (default is 0.1, 0 reports every update)')
     verbosity.add_option(
         '--console-title',
         action='store_true', dest='consoletitle', default=False,
@@ -767,6 +816,14 @@ def parseOpts(overrideArguments=None):
         '--rm-cache-dir',
         action='store_true', dest='rm_cachedir',
         help='Delete all filesystem cache files')
+    filesystem.add_option(
+        '--http-cache',
+        action='store_true', dest='http_cache', default=False,
+        help='Keep the webpages and API responses downloaded by extractors in the cache directory and reuse them while they are fresh or still valid according to the server')
+    filesystem.add_option(
+        '--http-cache-size',
+        dest='http_cache_size', metavar='SIZE', default=None,
+        help='Maximum size of the HTTP response cache, least recently used responses being evicted first (e.g. 50M or 1G) (default is 100M)')
 
     thumbnail = optparse.OptionGroup(parser, 'Thumbnail images')
     thumbnail.add_option(
@@ -862,6 +919,10 @@ def parseOpts(overrideArguments=None):
         '--convert-subs', '--convert-subtitles',
         metavar='FORMAT', dest='convertsubtitles', default=None,
         help='Convert the subtitles to other format (currently supported: srt|ass|vtt|lrc)')
+    postproc.add_option(
+        '--postprocessor-workers',
+        dest='postprocessor_workers', metavar='N', default=1, type=int,
+        help='Number of downloaded files to post-process at the same time (default is %default). With more than one, files are post-processed in the background while the next videos are downloaded and the download archive is only updated once the post-processing of a video has succeeded')
 
     parser.add_option_group(general)
     parser.add_option_group(network)
@@ -5,7 +5,10 @@ from __future__ import unicode_literals
 import os
 import subprocess
 
-from .ffmpeg import FFmpegPostProcessor
+from .ffmpeg import (
+    FFmpegCopyEdit,
+    FFmpegPostProcessor,
+)
 
 from ..utils import (
     check_executable,
@@ -27,20 +30,18 @@ class EmbedThumbnailPP(FFmpegPostProcessor):
         super(EmbedThumbnailPP, self).__init__(downloader)
         self._already_have_thumbnail = already_have_thumbnail
 
-    def run(self, info):
-        filename = info['filepath']
-        temp_filename = prepend_extension(filename, 'temp')
-
+    def _prepare_thumbnail(self, info):
+        """ Return the filename of the jpg or png thumbnail to embed, None if missing """
         if not info.get('thumbnails'):
             self._downloader.to_screen('[embedthumbnail] There aren\'t any thumbnails to embed')
-            return [], info
+            return None
 
         thumbnail_filename = info['thumbnails'][-1]['filename']
 
         if not os.path.exists(encodeFilename(thumbnail_filename)):
             self._downloader.report_warning(
                 'Skipping embedding the thumbnail because the file is missing.')
-            return [], info
+            return None
 
         def is_webp(path):
             with open(encodeFilename(path), 'rb') as f:
@@ -74,21 +75,42 @@ class EmbedThumbnailPP(FFmpegPostProcessor):
             os.rename(encodeFilename(escaped_thumbnail_jpg_filename), encodeFilename(thumbnail_jpg_filename))
             thumbnail_filename = thumbnail_jpg_filename
 
-        if info['ext'] == 'mp3':
-            options = [
-                '-c', 'copy', '-map', '0', '-map', '1',
-                '-metadata:s:v', 'title="Album cover"', '-metadata:s:v', 'comment="Cover (Front)"']
+        return thumbnail_filename
 
-            self._downloader.to_screen('[ffmpeg] Adding thumbnail to "%s"' % filename)
+    def copy_edit(self, info):
+        # Only the cover of mp3 files is added by ffmpeg
+        if info['ext'] != 'mp3':
+            return NotImplemented
 
-            self.run_ffmpeg_multiple_files([filename, thumbnail_filename], temp_filename, options)
+        thumbnail_filename = self._prepare_thumbnail(info)
+        if thumbnail_filename is None:
+            return None
 
-            if not self._already_have_thumbnail:
-                os.remove(encodeFilename(thumbnail_filename))
-            os.remove(encodeFilename(filename))
-            os.rename(encodeFilename(temp_filename), encodeFilename(filename))
+        def opts(first_input):
+            return [
+                ('-c', 'copy'), ('-map', '0'), ('-map', '%d' % first_input),
+                ('-metadata:s:v', 'title="Album cover"'), ('-metadata:s:v', 'comment="Cover (Front)"')]
+
+        return FFmpegCopyEdit(
+            'Adding thumbnail to "%s"' % info['filepath'], opts,
+            inputs=[thumbnail_filename],
+            temp_files=[] if self._already_have_thumbnail else [thumbnail_filename])
+
+    def run(self, info):
+        filename = info['filepath']
+        temp_filename = prepend_extension(filename, 'temp')
+
+        if info['ext'] == 'mp3':
+            edit = self.copy_edit(info)
+            if edit is None:
+                return [], info
+            return self.run_copy_edits(info, [edit])
+
+        thumbnail_filename = self._prepare_thumbnail(info)
+        if thumbnail_filename is None:
+            return [], info
 
-        elif info['ext'] in ['m4a', 'mp4']:
+        if info['ext'] in ['m4a', 'mp4']:
             atomicparsley = next((x
                                   for x in ['AtomicParsley', 'atomicparsley']
                                   if check_executable(x, ['-v'])), None)
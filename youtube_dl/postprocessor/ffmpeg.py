@@ -47,6 +47,11 @@ ACODECS = {
 }
 
 
+# Versions of the executables by path, post-processors are created for every
+# video and running the executables each time is slow
+_EXECUTABLE_VERSIONS = {}
+
+
 class FFmpegPostProcessorError(PostProcessingError):
     pass
 
@@ -77,6 +82,8 @@ class FFmpegPostProcessor(PostProcessor):
         prefer_ffmpeg = True
 
         def get_ffmpeg_version(path):
+            if path in _EXECUTABLE_VERSIONS:
+                return _EXECUTABLE_VERSIONS[path]
             ver = get_exe_version(path, args=['-version'])
             if ver:
                 regexs = [
@@ -88,6 +95,7 @@ class FFmpegPostProcessor(PostProcessor):
                     mobj = re.match(regex, ver)
                     if mobj:
                         ver = mobj.group(1)
+            _EXECUTABLE_VERSIONS[path] = ver
             return ver
 
         self.basename = None
@@ -238,6 +246,39 @@ class FFmpegPostProcessor(PostProcessor):
     def run_ffmpeg(self, path, out_path, opts):
         self.run_ffmpeg_multiple_files([path], out_path, opts)
 
+    def run_copy_edits(self, info, edits):
+        """
+        Apply the FFmpegCopyEdit list edits to info['filepath'] with a single
+        ffmpeg invocation, replacing the file.
+
+        Returns the same as run().
+        """
+        filename = info['filepath']
+        temp_filename = prepend_extension(filename, 'temp')
+        input_files = [filename]
+        opts = []
+        seen_opts = set()
+        files_to_delete = []
+        for edit in edits:
+            self._downloader.to_screen('[ffmpeg] %s' % edit.note)
+            edit_opts = edit.opts
+            if callable(edit_opts):
+                edit_opts = edit_opts(len(input_files))
+            input_files.extend(edit.inputs)
+            for opt in edit_opts:
+                # e.g. "-c copy" or "-f mp4" may be wanted by several edits
+                if opt not in seen_opts:
+                    seen_opts.add(opt)
+                    opts.extend(opt)
+            files_to_delete.extend(edit.files_to_delete)
+        self.run_ffmpeg_multiple_files(input_files, temp_filename, opts)
+        for edit in edits:
+            for temp_file in edit.temp_files:
+                os.remove(encodeFilename(temp_file))
+        os.remove(encodeFilename(filename))
+        os.rename(encodeFilename(temp_filename), encodeFilename(filename))
+        return files_to_delete, info
+
     def _ffmpeg_filename_argument(self, fn):
         # Always use 'file:' because the filename may contain ':' (ffmpeg
         # interprets that as a protocol) or can start with '-' (-- is broken in
@@ -246,6 +287,110 @@ class FFmpegPostProcessor(PostProcessor):
         return 'file:' + fn if fn != '-' else fn
 
 
+class FFmpegCopyEdit(object):
+    """
+    Edit of a media file that ffmpeg can do while copying its streams.
+
+    note:            Message describing the edit
+    opts:            List of option tuples (e.g. ('-c', 'copy')), or a
+                     function returning it given the index of the first
+                     of inputs on the ffmpeg command line
+    inputs:          Additional input files
+    files_to_delete: Files that can be deleted once the edit is done
+                     (unless -k is given)
+    temp_files:      Files to remove once the edit is done
+    """
+
+    def __init__(self, note, opts, inputs=[], files_to_delete=[], temp_files=[]):
+        self.note = note
+        self.opts = opts
+        self.inputs = inputs
+        self.files_to_delete = files_to_delete
+        self.temp_files = temp_files
+
+
+class FFmpegCopyEditPP(FFmpegPostProcessor):
+    """
+    Post-processor that only edits the downloaded file with stream copies.
+
+    Subclasses define copy_edit(info), returning an FFmpegCopyEdit or None
+    if there is nothing to do, so that consecutive edits can be applied by
+    FFmpegCopyEditsPP in a single pass over the file.
+    """
+
+    def copy_edit(self, info):
+        raise NotImplementedError('This method must be implemented by subclasses')
+
+    def run(self, info):
+        edit = self.copy_edit(info)
+        if edit is None:
+            return [], info
+        return self.run_copy_edits(info, [edit])
+
+
+class FFmpegCopyEditsPP(PostProcessor):
+    """
+    Runs a sequence of post-processors whose copy edits are applied with as
+    few ffmpeg invocations as possible (usually one), so that the file is
+    rewritten once instead of once per post-processor.
+
+    Post-processors with a copy_edit() method contribute edits, those with
+    _LEAVES_MEDIA_FILE set are run in between without affecting the batch.
+    copy_edit() may return NotImplemented when the work can't be done as a
+    copy edit of this file, the pending edits are then applied and the
+    post-processor is run on its own.
+    """
+
+    def __init__(self, downloader=None, pps=[]):
+        super(FFmpegCopyEditsPP, self).__init__(downloader)
+        self.pps = pps
+
+    @classmethod
+    def coalesce(cls, pps):
+        """ Return pps with the sequences of copy editing post-processors batched """
+        result = []
+        batch = []
+        for pp in list(pps) + [None]:
+            if pp is not None and (hasattr(pp, 'copy_edit') or getattr(pp, '_LEAVES_MEDIA_FILE', False)):
+                batch.append(pp)
+                continue
+            if len([b for b in batch if hasattr(b, 'copy_edit')]) > 1:
+                result.append(cls(batch[0]._downloader, batch))
+            else:
+                result.extend(batch)
+            batch = []
+            if pp is not None:
+                result.append(pp)
+        return result
+
+    def run(self, info):
+        files_to_delete = []
+        edits = []
+        editor = None
+
+        def apply_edits(info):
+            files, info = editor.run_copy_edits(info, edits)
+            files_to_delete.extend(files)
+            del edits[:]
+            return info
+
+        for pp in self.pps:
+            edit = pp.copy_edit(info) if hasattr(pp, 'copy_edit') else NotImplemented
+            if edit is None:
+                continue
+            if edit is not NotImplemented:
+                edits.append(edit)
+                editor = editor or pp
+                continue
+            if edits and not getattr(pp, '_LEAVES_MEDIA_FILE', False):
+                info = apply_edits(info)
+            files, info = pp.run(info)
+            files_to_delete.extend(files)
+        if edits:
+            info = apply_edits(info)
+        return files_to_delete, info
+
+
 class FFmpegExtractAudioPP(FFmpegPostProcessor):
     def __init__(self, downloader=None, preferredcodec=None, preferredquality=None, nopostoverwrites=False):
         FFmpegPostProcessor.__init__(self, downloader)
@@ -372,15 +517,15 @@ class FFmpegVideoConvertorPP(FFmpegPostProcessor):
         return [path], information
 
 
-class FFmpegEmbedSubtitlePP(FFmpegPostProcessor):
-    def run(self, information):
+class FFmpegEmbedSubtitlePP(FFmpegCopyEditPP):
+    def copy_edit(self, information):
         if information['ext'] not in ('mp4', 'webm', 'mkv'):
             self._downloader.to_screen('[ffmpeg] Subtitles can only be embedded in mp4, webm or mkv files')
-            return [], information
+            return None
         subtitles = information.get('requested_subtitles')
         if not subtitles:
             self._downloader.to_screen('[ffmpeg] There aren\'t any subtitles to embed')
-            return [], information
+            return None
 
         filename = information['filepath']
 
@@ -400,38 +545,34 @@ class FFmpegEmbedSubtitlePP(FFmpegPostProcessor):
                     self._downloader.to_screen('[ffmpeg] Only WebVTT subtitles can be embedded in webm files')
 
         if not sub_langs:
-            return [], information
-
-        input_files = [filename] + sub_filenames
-
-        opts = [
-            '-map', '0',
-            '-c', 'copy',
-            # Don't copy the existing subtitles, we may be running the
-            # postprocessor a second time
-            '-map', '-0:s',
-            # Don't copy Apple TV chapters track, bin_data (see #19042, #19024,
-            # https://trac.ffmpeg.org/ticket/6016)
-            '-map', '-0:d',
-        ]
-        if information['ext'] == 'mp4':
-            opts += ['-c:s', 'mov_text']
-        for (i, lang) in enumerate(sub_langs):
-            opts.extend(['-map', '%d:0' % (i + 1)])
-            lang_code = ISO639Utils.short2long(lang) or lang
-            opts.extend(['-metadata:s:s:%d' % i, 'language=%s' % lang_code])
-
-        temp_filename = prepend_extension(filename, 'temp')
-        self._downloader.to_screen('[ffmpeg] Embedding subtitles in \'%s\'' % filename)
-        self.run_ffmpeg_multiple_files(input_files, temp_filename, opts)
-        os.remove(encodeFilename(filename))
-        os.rename(encodeFilename(temp_filename), encodeFilename(filename))
-
-        return sub_filenames, information
-
+            return None
 
-class FFmpegMetadataPP(FFmpegPostProcessor):
-    def run(self, info):
+        def opts(first_input):
+            opts = [
+                ('-map', '0'),
+                ('-c', 'copy'),
+                # Don't copy the existing subtitles, we may be running the
+                # postprocessor a second time
+                ('-map', '-0:s'),
+                # Don't copy Apple TV chapters track, bin_data (see #19042, #19024,
+                # https://trac.ffmpeg.org/ticket/6016)
+                ('-map', '-0:d'),
+            ]
+            if information['ext'] == 'mp4':
+                opts.append(('-c:s', 'mov_text'))
+            for (i, lang) in enumerate(sub_langs):
+                opts.append(('-map', '%d:0' % (first_input + i)))
+                lang_code = ISO639Utils.short2long(lang) or lang
+                opts.append(('-metadata:s:s:%d' % i, 'language=%s' % lang_code))
+            return opts
+
+        return FFmpegCopyEdit(
+            'Embedding subtitles in \'%s\'' % filename, opts,
+            inputs=sub_filenames, files_to_delete=sub_filenames)
+
+
+class FFmpegMetadataPP(FFmpegCopyEditPP):
+    def copy_edit(self, info):
         metadata = {}
 
         def add(meta_list, info_list=None):
@@ -471,20 +612,19 @@ class FFmpegMetadataPP(FFmpegPostProcessor):
 
         if not metadata:
             self._downloader.to_screen('[ffmpeg] There isn\'t any metadata to add')
-            return [], info
+            return None
 
         filename = info['filepath']
-        temp_filename = prepend_extension(filename, 'temp')
-        in_filenames = [filename]
+        in_filenames = []
         options = []
 
         if info['ext'] == 'm4a':
-            options.extend(['-vn', '-acodec', 'copy'])
+            options.extend([('-vn',), ('-acodec', 'copy')])
         else:
-            options.extend(['-c', 'copy'])
+            options.append(('-c', 'copy'))
 
         for (name, value) in metadata.items():
-            options.extend(['-metadata', '%s=%s' % (name, value)])
+            options.append(('-metadata', '%s=%s' % (name, value)))
 
         chapters = info.get('chapters', [])
         if chapters:
@@ -503,15 +643,15 @@ class FFmpegMetadataPP(FFmpegPostProcessor):
                         metadata_file_content += 'title=%s\n' % ffmpeg_escape(chapter_title)
                 f.write(metadata_file_content)
                 in_filenames.append(metadata_filename)
-                options.extend(['-map_metadata', '1'])
 
-        self._downloader.to_screen('[ffmpeg] Adding metadata to \'%s\'' % filename)
-        self.run_ffmpeg_multiple_files(in_filenames, temp_filename, options)
-        if chapters:
-            os.remove(metadata_filename)
-        os.remove(encodeFilename(filename))
-        os.rename(encodeFilename(temp_filename), encodeFilename(filename))
-        return [], info
+        def opts(first_input):
+            if in_filenames:
+                return options + [('-map_metadata', '%d' % first_input)]
+            return options
+
+        return FFmpegCopyEdit(
+            'Adding metadata to \'%s\'' % filename, opts,
+            inputs=in_filenames, temp_files=in_filenames)
 
 
 class FFmpegMergerPP(FFmpegPostProcessor):
@@ -542,59 +682,42 @@ class FFmpegMergerPP(FFmpegPostProcessor):
         return True
 
 
-class FFmpegFixupStretchedPP(FFmpegPostProcessor):
-    def run(self, info):
+class FFmpegFixupStretchedPP(FFmpegCopyEditPP):
+    def copy_edit(self, info):
         stretched_ratio = info.get('stretched_ratio')
         if stretched_ratio is None or stretched_ratio == 1:
-            return [], info
-
-        filename = info['filepath']
-        temp_filename = prepend_extension(filename, 'temp')
-
-        options = ['-c', 'copy', '-aspect', '%f' % stretched_ratio]
-        self._downloader.to_screen('[ffmpeg] Fixing aspect ratio in "%s"' % filename)
-        self.run_ffmpeg(filename, temp_filename, options)
-
-        os.remove(encodeFilename(filename))
-        os.rename(encodeFilename(temp_filename), encodeFilename(filename))
+            return None
 
-        return [], info
+        return FFmpegCopyEdit(
+            'Fixing aspect ratio in "%s"' % info['filepath'],
+            [('-c', 'copy'), ('-aspect', '%f' % stretched_ratio)])
 
 
-class FFmpegFixupM4aPP(FFmpegPostProcessor):
-    def run(self, info):
+class FFmpegFixupM4aPP(FFmpegCopyEditPP):
+    def copy_edit(self, info):
         if info.get('container') != 'm4a_dash':
-            return [], info
-
-        filename = info['filepath']
-        temp_filename = prepend_extension(filename, 'temp')
-
-        options = ['-c', 'copy', '-f', 'mp4']
-        self._downloader.to_screen('[ffmpeg] Correcting container in "%s"' % filename)
-        self.run_ffmpeg(filename, temp_filename, options)
-
-        os.remove(encodeFilename(filename))
-        os.rename(encodeFilename(temp_filename), encodeFilename(filename))
+            return None
 
-        return [], info
+        return FFmpegCopyEdit(
+            'Correcting container in "%s"' % info['filepath'],
+            [('-c', 'copy'), ('-f', 'mp4')])
 
 
-class FFmpegFixupM3u8PP(FFmpegPostProcessor):
-    def run(self, info):
+class FFmpegFixupM3u8PP(FFmpegCopyEditPP):
+    def copy_edit(self, info):
         filename = info['filepath']
-        if self.get_audio_codec(filename) == 'aac':
-            temp_filename = prepend_extension(filename, 'temp')
-
-            options = ['-c', 'copy', '-f', 'mp4', '-bsf:a', 'aac_adtstoasc']
-            self._downloader.to_screen('[ffmpeg] Fixing malformed AAC bitstream in "%s"' % filename)
-            self.run_ffmpeg(filename, temp_filename, options)
+        if self.get_audio_codec(filename) != 'aac':
+            return None
 
-            os.remove(encodeFilename(filename))
-            os.rename(encodeFilename(temp_filename), encodeFilename(filename))
-        return [], info
+        return FFmpegCopyEdit(
+            'Fixing malformed AAC bitstream in "%s"' % filename,
+            [('-c', 'copy'), ('-f', 'mp4'), ('-bsf:a', 'aac_adtstoasc')])
 
 
 class FFmpegSubtitlesConvertorPP(FFmpegPostProcessor):
+    # Only the subtitle files are converted
+    _LEAVES_MEDIA_FILE = True
+
     def __init__(self, downloader=None, format=None):
         super(FFmpegSubtitlesConvertorPP, self).__init__(downloader)
         self.format = format
@@ -0,0 +1,218 @@
+from __future__ import unicode_literals
+
+import json
+import re
+import threading
+
+from .compat import (
+    compat_http_server,
+    compat_socketserver,
+    compat_str,
+)
+from .utils import (
+    error_to_compat_str,
+    FragmentSequence,
+    YoutubeDLError,
+)
+from .version import __version__
+from .YoutubeDL import YoutubeDL
+
+
+class YoutubeDLServer(compat_socketserver.ThreadingMixIn, compat_http_server.HTTPServer):
+    """
+    HTTP server running requests on a pool of warm YoutubeDL instances.
+
+    It saves the start-up cost of youtube-dl (importing the extractors,
+    setting up the opener, loading the cookies, probing ffmpeg) for every
+    query. Requests are JSON objects POSTed to any path with the
+    application/json content type:
+
+        {
+            "urls": ["https://..."],    (or "url": "https://...")
+            "params": {...},            (optional, overrides of the params)
+            "download": false           (optional, default is false)
+        }
+
+    The response is a JSON object with a "results" list holding, for each
+    URL, either {"url": ..., "info": {...}} or {"url": ..., "error": "..."}.
+    A GET request returns the version and the number of workers.
+
+    At most workers requests are run at the same time, the others wait for
+    an instance to be free. Requests overriding the params the opener is
+    built from get a YoutubeDL instance of their own, which takes the place
+    of a free one meanwhile. Overrides of the params only read when the
+    postprocessors are set up are ignored.
+
+    Anyone able to connect can make youtube-dl write files and run commands
+    with any params, so the server should only listen on localhost. Since
+    web pages can make browsers send requests to localhost too, requests
+    with an Origin header, with a Host header naming neither the host the
+    server was started with, localhost nor an IP address (DNS rebinding) or
+    with another port are refused, and so are POST requests of another
+    content type, which browsers do not send cross-origin without a CORS
+    preflight this server never approves.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    # Changing these requires setting up a new opener
+    _OPENER_PARAMS = (
+        'cookiefile', 'debug_printtraffic', 'nocheckcertificate', 'proxy',
+        'socket_timeout', 'source_address')
+    # Only read when the YoutubeDL instances are created
+    _FIXED_PARAMS = ('postprocessors',)
+
+    def __init__(self, address, params, workers=4):
+        compat_http_server.HTTPServer.__init__(self, address, _RequestHandler)
+        self.host = address[0].lower()
+        self.params = params
+        self.workers = workers
+        self._cond = threading.Condition()
+        self._idle = [YoutubeDL(params) for _ in range(workers)]
+        self._instances = list(self._idle)
+
+    def _acquire(self):
+        with self._cond:
+            while not self._idle:
+                self._cond.wait()
+            return self._idle.pop()
+
+    def _release(self, ydl):
+        with self._cond:
+            self._idle.append(ydl)
+            self._cond.notify()
+
+    def process_request_data(self, urls, overrides=None, download=False):
+        """Run a request and return its list of results"""
+        overrides = dict(
+            (k, v) for k, v in (overrides or {}).items()
+            if k not in self._FIXED_PARAMS)
+        ydl = self._acquire()
+        if any(p in overrides for p in self._OPENER_PARAMS):
+            params = dict(self.params)
+            params.update(overrides)
+            try:
+                with YoutubeDL(params) as own_ydl:
+                    return self._run(own_ydl, urls, download)
+            finally:
+                self._release(ydl)
+
+        saved_params = dict(ydl.params)
+        # The params dict is shared with the handlers of the opener, it has
+        # to be updated in place
+        ydl.params.update(overrides)
+        try:
+            return self._run(ydl, urls, download)
+        finally:
+            ydl.params.clear()
+            ydl.params.update(saved_params)
+            self._release(ydl)
+
+    def _run(self, ydl, urls, download):
+        results = []
+        for url in urls:
+            try:
+                info = ydl.extract_info(url, download=download)
+                if download:
+                    ydl.wait_for_post_processing()
+            except YoutubeDLError as err:
+                results.append({'url': url, 'error': error_to_compat_str(err)})
+                continue
+            if info is None:
+                results.append({'url': url, 'error': 'Unable to extract %s' % url})
+            else:
+                results.append({'url': url, 'info': _public_fields(info)})
+        return results
+
+    def server_close(self):
+        compat_http_server.HTTPServer.server_close(self)
+        for ydl in self._instances:
+            ydl.__exit__(None, None, None)
+
+
+def _public_fields(obj):
+    # Keys starting with __ are for internal use and may hold objects
+    if isinstance(obj, dict):
+        return dict(
+            (k, _public_fields(v)) for k, v in obj.items()
+            if not (isinstance(k, compat_str) and k.startswith('__')))
+    if isinstance(obj, (list, tuple, FragmentSequence)):
+        return [_public_fields(v) for v in obj]
+    return obj
+
+
+class _RequestHandler(compat_http_server.BaseHTTPRequestHandler):
+    server_version = 'youtube-dl/%s' % __version__
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, obj):
+        body = json.dumps(obj, default=compat_str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', len(body))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _check_request(self):
+        """Refuse the request and return False unless it may be processed"""
+        if self.headers.get('Origin') is not None:
+            self._send_json(403, {'error': 'Cross-origin requests are not allowed'})
+            return False
+        mobj = re.match(r'^(?P<host>\[[0-9a-fA-F:.]+\]|[^:]+)(?::(?P<port>\d+))?$', self.headers.get('Host') or '')
+        if not mobj or int(mobj.group('port') or 80) != self.server.server_address[1]:
+            allowed = False
+        else:
+            host = mobj.group('host').lower()
+            allowed = (
+                host in (self.server.host, 'localhost')
+                or host.startswith('[')
+                or re.match(r'^\d{1,3}(?:\.\d{1,3}){3}$', host) is not None)
+        if not allowed:
+            self._send_json(403, {'error': 'Invalid Host header'})
+            return False
+        return True
+
+    def do_GET(self):
+        if not self._check_request():
+            return
+        self._send_json(200, {
+            'version': __version__,
+            'workers': self.server.workers,
+        })
+
+    def do_POST(self):
+        if not self._check_request():
+            return
+        content_type = self.headers.get('Content-Type') or ''
+        if content_type.partition(';')[0].strip().lower() != 'application/json':
+            self._send_json(415, {'error': 'Invalid request: the content type must be application/json'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            request = json.loads(self.rfile.read(length).decode('utf-8'))
+        except ValueError as err:
+            self._send_json(400, {'error': 'Invalid request: %s' % error_to_compat_str(err)})
+            return
+        if not isinstance(request, dict):
+            self._send_json(400, {'error': 'Invalid request: expected an object'})
+            return
+        urls = request.get('urls')
+        if urls is None and request.get('url') is not None:
+            urls = [request['url']]
+        if not isinstance(urls, list) or not all(isinstance(u, compat_str) for u in urls):
+            self._send_json(400, {'error': 'Invalid request: expected a list of URLs in urls'})
+            return
+        overrides = request.get('params')
+        if overrides is not None and not isinstance(overrides, dict):
+            self._send_json(400, {'error': 'Invalid request: params must be an object'})
+            return
+        try:
+            results = self.server.process_request_data(
+                urls, overrides, bool(request.get('download')))
+        except Exception as err:
+            self._send_json(500, {'error': error_to_compat_str(err)})
+            return
+        self._send_json(200, {'results': results})
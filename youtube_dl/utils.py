@@ -4,6 +4,7 @@
 from __future__ import unicode_literals
 
 import base64
+import bisect
 import binascii
 import calendar
 import codecs
@@ -15,22 +16,25 @@ import email.utils
 import email.header
 import errno
 import functools
-import gzip
+import hashlib
 import io
 import itertools
 import json
 import locale
 import math
+import mmap
 import operator
 import os
 import platform
 import random
 import re
+import select
 import socket
 import ssl
 import subprocess
 import sys
 import tempfile
+import threading
 import time
 import traceback
 import xml.etree.ElementTree
@@ -1829,7 +1833,7 @@ def write_json_file(obj, fn):
 
     try:
         with tf:
-            json.dump(obj, tf)
+            json.dump(obj, tf, default=json_default)
         if sys.platform == 'win32':
             # Need to remove existing file on Windows, else os.rename raises
             # WindowsError or FileExistsError.
@@ -2535,6 +2539,148 @@ def _create_http_connection(ydl_handler, http_class, is_https, *args, **kwargs):
     return hc
 
 
+class HTTPConnectionPool(object):
+    """
+    Pool of idle keep-alive HTTP(S) connections.
+
+    Connections are keyed by (scheme, host, tunnel host, socks proxy) and
+    at most max_per_host of them are kept per key. Connections that have
+    been idle for more than idle_timeout seconds or that the server has
+    closed meanwhile are dropped.
+    """
+
+    def __init__(self, max_per_host=6, idle_timeout=30):
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._idle = {}
+
+    def acquire(self, key):
+        """Return an idle connection for key or None"""
+        now = time.time()
+        expired = []
+        conn = None
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                candidate, last_used = idle.pop()
+                if now - last_used <= self.idle_timeout and not self._dropped(candidate):
+                    conn = candidate
+                    break
+                expired.append(candidate)
+        for candidate in expired:
+            candidate.close()
+        return conn
+
+    @staticmethod
+    def _dropped(conn):
+        # An idle connection becomes readable once the server has closed it
+        if conn.sock is None:
+            return False
+        try:
+            return bool(select.select([conn.sock], [], [], 0)[0])
+        except (select.error, socket.error, ValueError):
+            return True
+
+    def release(self, key, conn, reusable=True):
+        """Give conn back to the pool once its response has been consumed"""
+        if reusable:
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                if len(idle) < self.max_per_host:
+                    idle.append((conn, time.time()))
+                    return
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            conns = [conn for idle in self._idle.values() for conn, _ in idle]
+            self._idle = {}
+        for conn in conns:
+            conn.close()
+
+
+class _KeepAliveHTTPResponse(compat_http_client.HTTPResponse):
+    # Hands the connection back to its pool when the body has been read
+    _pool = None
+    _pool_key = None
+    _pool_conn = None
+
+    def _close_conn(self):
+        # At the end of the body the file is closed before the response is
+        complete = not self.closed or self.length == 0
+        compat_http_client.HTTPResponse._close_conn(self)
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.release(self._pool_key, self._pool_conn, complete and not self.will_close)
+
+
+def _keepalive_open(ydl_handler, http_class, req, pool_key):
+    """
+    Equivalent of AbstractHTTPHandler.do_open() that reuses the connections
+    of ydl_handler's connection pool instead of closing them.
+    """
+    pool = ydl_handler._connection_pool
+    host = req.host
+    if not host:
+        raise compat_urllib_error.URLError('no host given')
+
+    headers = dict(req.unredirected_hdrs)
+    headers.update((k, v) for k, v in req.headers.items() if k not in headers)
+    headers = dict((name.title(), val) for name, val in headers.items())
+    headers['Connection'] = 'keep-alive'
+    tunnel_headers = {}
+    if req._tunnel_host and 'Proxy-Authorization' in headers:
+        tunnel_headers['Proxy-Authorization'] = headers.pop('Proxy-Authorization')
+    request_kwargs = {}
+    if sys.version_info >= (3, 6):
+        request_kwargs['encode_chunked'] = req.has_header('Transfer-encoding')
+
+    method = req.get_method()
+    while True:
+        conn = pool.acquire(pool_key)
+        reused = conn is not None
+        if not reused:
+            conn = http_class(host, timeout=req.timeout)
+            conn.set_debuglevel(ydl_handler._debuglevel)
+            if req._tunnel_host:
+                conn.set_tunnel(req._tunnel_host, headers=tunnel_headers)
+            conn.response_class = _KeepAliveHTTPResponse
+        sent = False
+        try:
+            if reused and req.timeout is not socket._GLOBAL_DEFAULT_TIMEOUT:
+                conn.timeout = req.timeout
+                if conn.sock:
+                    conn.sock.settimeout(req.timeout)
+            conn.request(
+                method, req.selector, req.data, headers, **request_kwargs)
+            sent = True
+            resp = conn.getresponse()
+        except (socket.error, compat_http_client.BadStatusLine) as err:
+            conn.close()
+            # The server may have dropped the reused connection in the
+            # meantime. Since the request may have been processed anyway,
+            # only idempotent ones are sent again.
+            if reused and method in ('GET', 'HEAD'):
+                continue
+            if not sent:
+                raise compat_urllib_error.URLError(err)
+            raise
+        except Exception:
+            conn.close()
+            raise
+        break
+
+    # The connection is released to the pool, or closed if the response
+    # will_close, once the body has been read
+    resp._pool_key = pool_key
+    resp._pool_conn = conn
+    resp._pool = pool
+    resp.url = req.get_full_url()
+    resp.msg = resp.reason
+    return resp
+
+
 def handle_youtubedl_headers(headers):
     filtered_headers = headers
 
@@ -2545,6 +2691,87 @@ def handle_youtubedl_headers(headers):
     return filtered_headers
 
 
+class _DecompressingReader(io.RawIOBase):
+    """
+    Raw stream decoding a gzip or deflate encoded file object on the fly.
+
+    Concatenated gzip members are decoded one after the other, junk after
+    the end of the compressed data is ignored
+    (see http://stackoverflow.com/q/4928560/35070).
+    """
+
+    _CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, fp, encoding):
+        self._fp = fp
+        self._gzip = encoding == 'gzip'
+        # deflate is supposed to be zlib wrapped but is raw more often than not
+        self._decompressor = zlib.decompressobj(
+            16 + zlib.MAX_WBITS if self._gzip else -zlib.MAX_WBITS)
+        self._started = False
+        self._finished = False
+        self._buf = b''
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def _decompress(self, data):
+        try:
+            return self._decompressor.decompress(data)
+        except zlib.error as e:
+            if self._gzip or self._started:
+                raise IOError('Error decoding response: %s' % e)
+            self._decompressor = zlib.decompressobj()
+            try:
+                return self._decompressor.decompress(data)
+            except zlib.error as e:
+                raise IOError('Error decoding response: %s' % e)
+        finally:
+            self._started = True
+
+    def _fill(self):
+        data = self._fp.read(self._CHUNK_SIZE)
+        if not data:
+            self._finished = True
+            out = self._decompressor.flush()
+            # Decompression objects only know where the stream ends since
+            # Python 3.3
+            if self._started and not getattr(self._decompressor, 'eof', True):
+                raise IOError('Error decoding response: truncated %s stream' % (
+                    'gzip' if self._gzip else 'deflate'))
+            return out
+        out = [self._decompress(data)]
+        while self._decompressor.unused_data:
+            # End of the compressed stream
+            unused_data = self._decompressor.unused_data
+            if not self._gzip or not b'\x1f\x8b'.startswith(unused_data[:2]):
+                self._finished = True
+                break
+            if len(unused_data) < 2:
+                # Can't tell yet
+                break
+            self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            out.append(self._decompress(unused_data))
+        return b''.join(out)
+
+    def readinto(self, b):
+        while self._pos >= len(self._buf):
+            if self._finished:
+                return 0
+            self._buf = self._fill()
+            self._pos = 0
+        n = min(len(b), len(self._buf) - self._pos)
+        b[:n] = self._buf[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._fp.close()
+        io.RawIOBase.close(self)
+
+
 class YoutubeDLHandler(compat_urllib_request.HTTPHandler):
     """Handler for HTTP requests and responses.
 
@@ -2561,9 +2788,13 @@ class YoutubeDLHandler(compat_urllib_request.HTTPHandler):
 
     Andrew Rowls, the author of that code, agreed to release it to the
     public domain.
+
+    If a connection_pool (an HTTPConnectionPool) is given, connections are
+    kept alive and reused for later requests (Python 3 only).
     """
 
     def __init__(self, params, *args, **kwargs):
+        self._connection_pool = kwargs.pop('connection_pool', None)
         compat_urllib_request.HTTPHandler.__init__(self, *args, **kwargs)
         self._params = params
 
@@ -2575,9 +2806,12 @@ class YoutubeDLHandler(compat_urllib_request.HTTPHandler):
             conn_class = make_socks_conn_class(conn_class, socks_proxy)
             del req.headers['Ytdl-socks-proxy']
 
-        return self.do_open(functools.partial(
-            _create_http_connection, self, conn_class, False),
-            req)
+        http_class = functools.partial(
+            _create_http_connection, self, conn_class, False)
+        if self._connection_pool is not None and sys.version_info >= (3, 0):
+            return _keepalive_open(
+                self, http_class, req, ('http', req.host, req._tunnel_host, socks_proxy))
+        return self.do_open(http_class, req)
 
     @staticmethod
     def deflate(data):
@@ -2619,31 +2853,11 @@ class YoutubeDLHandler(compat_urllib_request.HTTPHandler):
 
     def http_response(self, req, resp):
         old_resp = resp
-        # gzip
-        if resp.headers.get('Content-encoding', '') == 'gzip':
-            content = resp.read()
-            gz = gzip.GzipFile(fileobj=io.BytesIO(content), mode='rb')
-            try:
-                uncompressed = io.BytesIO(gz.read())
-            except IOError as original_ioerror:
-                # There may be junk add the end of the file
-                # See http://stackoverflow.com/q/4928560/35070 for details
-                for i in range(1, 1024):
-                    try:
-                        gz = gzip.GzipFile(fileobj=io.BytesIO(content[:-i]), mode='rb')
-                        uncompressed = io.BytesIO(gz.read())
-                    except IOError:
-                        continue
-                    break
-                else:
-                    raise original_ioerror
-            resp = compat_urllib_request.addinfourl(uncompressed, old_resp.headers, old_resp.url, old_resp.code)
-            resp.msg = old_resp.msg
-            del resp.headers['Content-encoding']
-        # deflate
-        if resp.headers.get('Content-encoding', '') == 'deflate':
-            gz = io.BytesIO(self.deflate(resp.read()))
-            resp = compat_urllib_request.addinfourl(gz, old_resp.headers, old_resp.url, old_resp.code)
+        # gzip and deflate are decoded as the response is read
+        content_encoding = resp.headers.get('Content-encoding', '')
+        if content_encoding in ('gzip', 'deflate'):
+            decoded = io.BufferedReader(_DecompressingReader(resp, content_encoding))
+            resp = compat_urllib_request.addinfourl(decoded, old_resp.headers, old_resp.url, old_resp.code)
             resp.msg = old_resp.msg
             del resp.headers['Content-encoding']
         # Percent-encode redirect URL of Location HTTP header to satisfy RFC 3986 (see
@@ -2713,6 +2927,7 @@ def make_socks_conn_class(base_class, socks_proxy):
 
 class YoutubeDLHTTPSHandler(compat_urllib_request.HTTPSHandler):
     def __init__(self, params, https_conn_class=None, *args, **kwargs):
+        self._connection_pool = kwargs.pop('connection_pool', None)
         compat_urllib_request.HTTPSHandler.__init__(self, *args, **kwargs)
         self._https_conn_class = https_conn_class or compat_http_client.HTTPSConnection
         self._params = params
@@ -2731,9 +2946,13 @@ class YoutubeDLHTTPSHandler(compat_urllib_request.HTTPSHandler):
             conn_class = make_socks_conn_class(conn_class, socks_proxy)
             del req.headers['Ytdl-socks-proxy']
 
-        return self.do_open(functools.partial(
-            _create_http_connection, self, conn_class, True),
-            req, **kwargs)
+        http_class = functools.partial(
+            _create_http_connection, self, conn_class, True)
+        if self._connection_pool is not None and sys.version_info >= (3, 0):
+            return _keepalive_open(
+                self, functools.partial(http_class, **kwargs), req,
+                ('https', req.host, req._tunnel_host, socks_proxy))
+        return self.do_open(http_class, req, **kwargs)
 
 
 class YoutubeDLCookieJar(compat_cookiejar.MozillaCookieJar):
@@ -3303,6 +3522,175 @@ class locked_file(object):
     def read(self, *args):
         return self.f.read(*args)
 
+    def seek(self, *args):
+        return self.f.seek(*args)
+
+    def tell(self):
+        return self.f.tell()
+
+
+class DownloadArchive(object):
+    """
+    In-memory index of a download archive file.
+
+    The archive is a text file with one "extractor id" line per downloaded
+    video. It is parsed once and afterwards a lookup that misses only reads
+    the lines appended since the previous read, e.g. by other youtube-dl
+    processes sharing the same archive.
+
+    write_index() writes a sorted index of the hashed lines next to the
+    archive, in <archive>.idx. The part of the archive the index covers is
+    then looked up with a binary search in the memory-mapped index instead
+    of being loaded, only the lines appended afterwards are read. The
+    archive itself is left untouched. The hashes are 64 bits long, so a
+    false positive is unlikely even with billions of lines.
+    """
+
+    _INDEX_MAGIC = b'YTDLIDX1'
+    # Magic, archive bytes covered, digest of the last covered bytes
+    _INDEX_HEADER = '>8sQ8s'
+    _INDEX_HEADER_SIZE = 24
+    _INDEX_KEY_SIZE = 8
+    # Length of the end of the covered part of the archive checked against
+    # the index, to detect an archive rewritten since the index was written
+    _INDEX_CHECK_SIZE = 4096
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._ids = set()
+        self._pos = 0
+        self._index = None
+        # Videos may be recorded by background post-processing threads
+        self._lock = threading.Lock()
+
+    @property
+    def index_filename(self):
+        return self.filename + '.idx'
+
+    @classmethod
+    def _index_key(cls, vid_id):
+        return hashlib.sha1(vid_id.encode('utf-8')).digest()[:cls._INDEX_KEY_SIZE]
+
+    def _covered_digest(self, covered):
+        if not covered:
+            return hashlib.sha1(b'').digest()[:8]
+        with open(encodeFilename(self.filename), 'rb') as f:
+            f.seek(max(0, covered - self._INDEX_CHECK_SIZE))
+            return hashlib.sha1(f.read(min(covered, self._INDEX_CHECK_SIZE))).digest()[:8]
+
+    def _load_index(self):
+        try:
+            with open(encodeFilename(self.index_filename), 'rb') as f:
+                index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (IOError, OSError, ValueError):
+            return
+        valid = False
+        if len(index) >= self._INDEX_HEADER_SIZE:
+            magic, covered, digest = compat_struct_unpack(
+                self._INDEX_HEADER, index[:self._INDEX_HEADER_SIZE])
+            try:
+                valid = (
+                    magic == self._INDEX_MAGIC
+                    and os.path.getsize(encodeFilename(self.filename)) >= covered
+                    and self._covered_digest(covered) == digest)
+            except (IOError, OSError):
+                pass
+        if not valid:
+            # Not an index or the archive has been rewritten since it was
+            # written
+            index.close()
+            return
+        self._index = index
+        self._pos = covered
+
+    def _index_contains(self, vid_id):
+        if self._index is None:
+            return False
+        key = self._index_key(vid_id)
+        size = self._INDEX_KEY_SIZE
+        lo = 0
+        hi = (len(self._index) - self._INDEX_HEADER_SIZE) // size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            pos = self._INDEX_HEADER_SIZE + mid * size
+            mid_key = self._index[pos:pos + size]
+            if mid_key == key:
+                return True
+            if mid_key < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return False
+
+    def _update(self):
+        try:
+            if self._pos == 0 and self._index is None:
+                self._load_index()
+            if os.path.getsize(encodeFilename(self.filename)) < self._pos:
+                # The archive has been truncated or rewritten, start over
+                self._ids = set()
+                self._pos = 0
+                if self._index is not None:
+                    self._index.close()
+                    self._index = None
+            with locked_file(self.filename, 'r', encoding='utf-8') as archive_file:
+                archive_file.seek(self._pos)
+                data = archive_file.read()
+                self._pos = archive_file.tell()
+        except (IOError, OSError) as err:
+            if err.errno != errno.ENOENT:
+                raise
+            return
+        self._ids.update(line.strip() for line in data.splitlines())
+        self._ids.discard('')
+
+    def __contains__(self, vid_id):
+        if vid_id in self._ids:
+            return True
+        with self._lock:
+            self._update()
+            if self._index_contains(vid_id):
+                return True
+        return vid_id in self._ids
+
+    def add(self, vid_id):
+        with self._lock:
+            with locked_file(self.filename, 'a', encoding='utf-8') as archive_file:
+                archive_file.write(vid_id + '\n')
+            self._ids.add(vid_id)
+
+    def write_index(self):
+        """
+        Write the index of the whole archive, replacing any previous one.
+        Returns the number of videos in the index.
+        """
+        try:
+            with locked_file(self.filename, 'r', encoding='utf-8') as archive_file:
+                data = archive_file.read()
+                covered = archive_file.tell()
+        except (IOError, OSError) as err:
+            if err.errno != errno.ENOENT:
+                raise
+            data = ''
+            covered = 0
+        keys = set(
+            self._index_key(line.strip()) for line in data.splitlines() if line.strip())
+        header = compat_struct_pack(
+            self._INDEX_HEADER, self._INDEX_MAGIC, covered, self._covered_digest(covered))
+        index_fn = encodeFilename(self.index_filename)
+        tmp_fn = index_fn + b'.tmp' if isinstance(index_fn, bytes) else index_fn + '.tmp'
+        with open(tmp_fn, 'wb') as f:
+            f.write(header)
+            f.write(b''.join(sorted(keys)))
+        if sys.platform == 'win32':
+            # os.rename does not replace existing files on Windows
+            try:
+                os.unlink(index_fn)
+            except OSError:
+                pass
+        os.rename(tmp_fn, index_fn)
+        return len(keys)
+
 
 def get_filesystem_encoding():
     encoding = sys.getfilesystemencoding()
@@ -3756,6 +4144,575 @@ def detect_exe_version(output, version_re=None, unrecognized='present'):
         return unrecognized
 
 
+def ordered_parallel_map(func, iterable, workers, lookahead=None):
+    """
+    Generator yielding func(item) for each item of iterable, in order.
+
+    func is called for up to workers items at once in background threads and
+    for at most lookahead (twice the number of workers by default) items
+    ahead of the consumer. An exception raised by func is re-raised by the
+    generator when the corresponding result is due. Closing the generator
+    stops the workers from picking up new items and waits for the calls in
+    progress to return.
+    """
+    if lookahead is None:
+        lookahead = 2 * workers
+    it = iter(iterable)
+    cond = threading.Condition()
+    results = {}
+    # Position of the next item to be picked up by a worker, of the next
+    # result to be consumed and of the end of iterable once reached
+    state = {'next': 0, 'consumed': 0, 'end': None, 'abort': False}
+
+    def worker():
+        while True:
+            with cond:
+                while (not state['abort'] and state['end'] is None
+                        and state['next'] - state['consumed'] >= lookahead):
+                    cond.wait()
+                if state['abort'] or state['end'] is not None:
+                    return
+                pos = state['next']
+                try:
+                    item = next(it)
+                except StopIteration:
+                    state['end'] = pos
+                    cond.notify_all()
+                    return
+                except Exception as err:
+                    state['end'] = pos + 1
+                    results[pos] = (False, err)
+                    cond.notify_all()
+                    return
+                state['next'] += 1
+            try:
+                result = (True, func(item))
+            except Exception as err:
+                result = (False, err)
+            with cond:
+                results[pos] = result
+                cond.notify_all()
+
+    threads = []
+    for _ in range(workers):
+        t = threading.Thread(target=worker)
+        t.daemon = True
+        t.start()
+        threads.append(t)
+
+    try:
+        pos = 0
+        while True:
+            with cond:
+                while pos not in results and (state['end'] is None or pos < state['end']):
+                    cond.wait()
+                if pos not in results:
+                    return
+                ok, value = results.pop(pos)
+                state['consumed'] = pos + 1
+                cond.notify_all()
+            if not ok:
+                raise value
+            yield value
+            pos += 1
+    finally:
+        with cond:
+            state['abort'] = True
+            cond.notify_all()
+        # Nothing func does may outlive the consumer
+        for t in threads:
+            t.join()
+
+
+class BoundedWorkerPool(object):
+    """
+    Runs the submitted tasks in up to workers background threads.
+
+    submit() blocks while max_pending tasks (twice the number of workers by
+    default) are queued or running. The first exception raised by a task is
+    re-raised by the next call to submit() or join().
+    """
+
+    def __init__(self, workers, max_pending=None):
+        self.workers = workers
+        self.max_pending = 2 * workers if max_pending is None else max_pending
+        self._cond = threading.Condition()
+        self._tasks = collections.deque()
+        self._pending = 0
+        self._running = 0
+        self._error = None
+
+    def _raise_error(self):
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def submit(self, func, *args, **kwargs):
+        with self._cond:
+            self._raise_error()
+            while self._pending >= self.max_pending:
+                self._cond.wait()
+                self._raise_error()
+            self._tasks.append((func, args, kwargs))
+            self._pending += 1
+            if self._running < self.workers:
+                self._running += 1
+                t = threading.Thread(target=self._work)
+                t.daemon = True
+                t.start()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                if not self._tasks:
+                    self._running -= 1
+                    return
+                func, args, kwargs = self._tasks.popleft()
+            try:
+                func(*args, **kwargs)
+            except Exception as err:
+                with self._cond:
+                    if self._error is None:
+                        self._error = err
+            with self._cond:
+                self._pending -= 1
+                self._cond.notify_all()
+
+    def join(self, reraise=True):
+        """ Wait for all the submitted tasks to be done """
+        with self._cond:
+            while self._pending:
+                self._cond.wait()
+            if reraise:
+                self._raise_error()
+
+
+def _strip_verbose_regex(pattern):
+    # Drop the whitespace and comments that re.VERBOSE ignores
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == '\\':
+            out.append(pattern[i:i + 2])
+            i += 2
+        elif c == '[':
+            j = i + 1
+            if j < n and pattern[j] == '^':
+                j += 1
+            if j < n and pattern[j] == ']':
+                j += 1
+            while j < n and pattern[j] != ']':
+                j += 2 if pattern[j] == '\\' else 1
+            out.append(pattern[i:j + 1])
+            i = j + 1
+        elif c == '#':
+            while i < n and pattern[i] != '\n':
+                i += 1
+        else:
+            if not c.isspace():
+                out.append(c)
+            i += 1
+    return ''.join(out)
+
+
+def _parse_regex(pattern, pos=0, depth=0):
+    """
+    Parse the subset of the regular expression syntax needed by
+    url_pattern_keys into a list of alternatives, each a list of
+    (kind, value, optional, repeated) elements.
+
+    Returns (alternatives, pos after the closing parenthesis) or raises
+    ValueError for anything it does not understand.
+    """
+    alternatives = [[]]
+    n = len(pattern)
+    while pos < n:
+        c = pattern[pos]
+        pos += 1
+        if c == '|':
+            alternatives.append([])
+            continue
+        elif c == ')':
+            if depth == 0:
+                raise ValueError('unbalanced parenthesis')
+            return alternatives, pos
+        elif c == '\\':
+            if pos >= n:
+                raise ValueError('trailing backslash')
+            e = pattern[pos]
+            pos += 1
+            if e in 'dDwWsS':
+                kind, value = 'class', '\\' + e
+            elif e in 'bBA':
+                kind, value = 'anchor', None
+            elif e == 'Z':
+                kind, value = 'end', None
+            elif e in 'nrtfv':
+                kind, value = 'lit', {'n': '\n', 'r': '\r', 't': '\t', 'f': '\f', 'v': '\v'}[e]
+            elif e.isalnum():
+                raise ValueError('unsupported escape')
+            else:
+                kind, value = 'lit', e
+        elif c == '[':
+            j = pos
+            if j < n and pattern[j] == '^':
+                j += 1
+            if j < n and pattern[j] == ']':
+                j += 1
+            while j < n and pattern[j] != ']':
+                j += 2 if pattern[j] == '\\' else 1
+            if j >= n:
+                raise ValueError('unterminated character class')
+            kind, value = 'class', pattern[pos - 1:j + 1]
+            pos = j + 1
+        elif c == '(':
+            if pattern.startswith('?P<', pos):
+                pos = pattern.index('>', pos) + 1
+                kind = 'group'
+            elif pattern.startswith('?:', pos):
+                pos += 2
+                kind = 'group'
+            elif pattern.startswith(('?=', '?!'), pos):
+                pos += 2
+                kind = 'lookaround'
+            elif pattern.startswith(('?<=', '?<!'), pos):
+                pos += 3
+                kind = 'lookaround'
+            elif pattern.startswith('?', pos):
+                mobj = re.match(r'\?[aiLmsux]+\)', pattern[pos:])
+                if not mobj:
+                    raise ValueError('unsupported group')
+                pos += mobj.end()
+                alternatives[-1].append(('anchor', None, False, False))
+                continue
+            else:
+                kind = 'group'
+            value, pos = _parse_regex(pattern, pos, depth + 1)
+        elif c == '^':
+            kind, value = 'anchor', None
+        elif c == '$':
+            kind, value = 'end', None
+        elif c == '.':
+            kind, value = 'class', '.'
+        elif c in '*+?{':
+            raise ValueError('unexpected quantifier')
+        else:
+            kind, value = 'lit', c
+        optional = repeated = False
+        mobj = re.match(r'(?:([?*+])|\{(\d*)(,?)(\d*)\})[?+]?', pattern[pos:])
+        if mobj:
+            pos += mobj.end()
+            if mobj.group(1):
+                optional = mobj.group(1) in '?*'
+                repeated = mobj.group(1) in '*+'
+            else:
+                optional = int(mobj.group(2) or 0) == 0
+                repeated = bool(mobj.group(3)) or int(mobj.group(2) or 0) > 1
+        alternatives[-1].append((kind, value, optional, repeated))
+    if depth:
+        raise ValueError('unbalanced parenthesis')
+    return alternatives, pos
+
+
+def _regex_element_matches(element, chars):
+    # Whether element may consume any of chars
+    kind, value = element[:2]
+    if kind == 'lit':
+        return value in chars
+    elif kind == 'class':
+        return any(re.match(value, c, re.DOTALL) for c in chars)
+    elif kind == 'group':
+        return any(
+            _regex_element_matches(e, chars) for alt in value for e in alt)
+    return False
+
+
+def _regex_ends_with_dot(element):
+    kind, value = element[:2]
+    if kind == 'lit':
+        return value == '.'
+    elif kind == 'group':
+        return all(
+            alt and not alt[-1][2] and _regex_ends_with_dot(alt[-1])
+            for alt in value)
+    return False
+
+
+def _regex_first_chars(elements):
+    """
+    Set of the characters a match of elements may start with, '' standing
+    for the end of the string, or None if it cannot be determined.
+    """
+    if not elements:
+        return None
+    (kind, value, optional, _), rest = elements[0], elements[1:]
+    if kind in ('anchor', 'lookaround'):
+        return _regex_first_chars(rest)
+    elif kind == 'lit':
+        chars = set([value])
+    elif kind == 'end':
+        chars = set([''])
+    elif kind == 'class' and value.startswith('[') and not value.startswith('[^'):
+        chars = set(value[1:-1].replace('\\', ''))
+        if not chars or not chars <= set('/?#'):
+            return None
+    elif kind == 'group':
+        chars = set()
+        for alt in value:
+            alt_chars = _regex_first_chars(alt + rest)
+            if alt_chars is None:
+                return None
+            chars |= alt_chars
+    else:
+        return None
+    if optional:
+        rest_chars = _regex_first_chars(rest)
+        if rest_chars is None:
+            return None
+        chars |= rest_chars
+    return chars
+
+
+_MAX_LITERAL_EXPANSIONS = 64
+
+
+def _regex_literal_strings(elements):
+    # The set of strings matched by elements if they are all literal
+    strings = set([''])
+    for kind, value, optional, repeated in elements:
+        if repeated:
+            return None
+        if kind == 'lit':
+            options = set([value])
+        elif kind == 'group':
+            options = set()
+            for alt in value:
+                alt_strings = _regex_literal_strings(alt)
+                if alt_strings is None:
+                    return None
+                options |= alt_strings
+        else:
+            return None
+        if optional:
+            options.add('')
+        strings = set(a + b for a in strings for b in options)
+        if len(strings) > _MAX_LITERAL_EXPANSIONS:
+            return None
+    return strings
+
+
+def _inline_regex_groups(elements):
+    # Splice the content of plain groups with a single alternative
+    result = []
+    for element in elements:
+        kind, value, optional, repeated = element
+        if kind == 'group' and len(value) == 1 and not optional and not repeated:
+            result.extend(_inline_regex_groups(value[0]))
+        else:
+            result.append(element)
+    return result
+
+
+def _url_alternative_keys(elements):
+    elements = _inline_regex_groups(elements)
+    # Leading alternations are split up so that every branch gets its own keys
+    start = 0
+    while start < len(elements) and elements[start][0] == 'anchor':
+        start += 1
+    if start < len(elements):
+        kind, value, optional, repeated = elements[start]
+        if kind == 'group' and not optional and not repeated:
+            keys = set()
+            for alt in value:
+                alt_keys = _url_alternative_keys(alt + elements[start + 1:])
+                if alt_keys is None:
+                    return None
+                keys |= alt_keys
+            return keys
+    elements = elements[start:]
+
+    # Scheme: "http://", "https?://", "(?:https?:)?//", "(?:https?://)?"...
+    host_start = None
+    for k in range(1, min(len(elements), 16) + 1):
+        strings = _regex_literal_strings(elements[:k])
+        if strings is None:
+            break
+        if any(strings) and all(
+                not s or re.match(r'^(?:[a-z]+:)?//$', s.lower()) for s in strings):
+            host_start = k
+            break
+
+    if host_start is None:
+        prefix = []
+        for kind, value, optional, repeated in elements:
+            if kind != 'lit' or optional or repeated:
+                break
+            prefix.append(value)
+        prefix = ''.join(prefix).lower()
+        if len(prefix) < 2:
+            return None
+        return set([('prefix', prefix)])
+
+    # The host is matched by elements[host_start:host_end], where
+    # elements[host_end:] has to start with a delimiter
+    host_end = host_start
+    while (host_end < len(elements) and elements[host_end][0] != 'end'
+            and not _regex_element_matches(elements[host_end], '/')):
+        host_end += 1
+    delimiters = _regex_first_chars(elements[host_end:])
+    if delimiters is not None and delimiters <= set(['/', '']):
+        index = '/'
+    elif delimiters is not None and delimiters <= set(['/', '?', '#', '']) and not any(
+            _regex_element_matches(e, '?#') for e in elements[host_start:host_end]):
+        index = '/?#'
+    elif host_end < len(elements) and elements[host_end][0] == 'group' and not any(elements[host_end][2:]):
+        # Alternatives spanning the end of the host, e.g. "(?:a\.com/x|b\.com/y)"
+        keys = set()
+        for alt in elements[host_end][1]:
+            alt_keys = _url_alternative_keys(
+                elements[:host_end] + alt + elements[host_end + 1:])
+            if alt_keys is None:
+                return None
+            keys |= alt_keys
+        return keys
+    else:
+        return None
+
+    # Collect the literal strings that the host has to end with
+    tail = set([''])
+    tail_start = host_end
+    while tail_start > host_start:
+        strings = _regex_literal_strings(elements[tail_start - 1:tail_start])
+        if strings is None:
+            break
+        strings = set(a + b for a in strings for b in tail)
+        if len(strings) > _MAX_LITERAL_EXPANSIONS:
+            break
+        tail = strings
+        tail_start -= 1
+
+    # The tail starts a label if it is preceded by dot terminated elements
+    complete = True
+    pos = tail_start
+    while pos > host_start:
+        element = elements[pos - 1]
+        if not _regex_ends_with_dot(element):
+            complete = False
+            break
+        if not element[2]:
+            break
+        pos -= 1
+
+    keys = set()
+    for s in tail:
+        s = s.lower()
+        if not complete:
+            # Preceded by something else: only the labels after the first
+            # dot are known to be complete
+            if '.' not in s:
+                return None
+            s = s.split('.', 1)[1]
+        if not s:
+            return None
+        keys.add((index, s))
+    return keys
+
+
+_URL_PATTERN_KEYS_CACHE = {}
+
+
+def url_pattern_keys(pattern):
+    """
+    Derive dispatch keys from a regular expression matched against URLs
+    with re.match.
+
+    Returns a set of ('/', host), ('/?#', host) and ('prefix', prefix)
+    tuples or None if the pattern cannot be indexed. Every URL matching the
+    pattern yields at least one of these keys in url_dispatch_keys.
+    """
+    if pattern in _URL_PATTERN_KEYS_CACHE:
+        return _URL_PATTERN_KEYS_CACHE[pattern]
+    keys = None
+    try:
+        source = pattern
+        if re.compile(pattern).flags & re.VERBOSE:
+            source = _strip_verbose_regex(pattern)
+        alternatives, _ = _parse_regex(source)
+        keys = set()
+        for alt in alternatives:
+            alt_keys = _url_alternative_keys(alt)
+            if alt_keys is None:
+                keys = None
+                break
+            keys |= alt_keys
+    except (ValueError, re.error):
+        keys = None
+    _URL_PATTERN_KEYS_CACHE[pattern] = keys
+    return keys
+
+
+def url_dispatch_keys(url, prefix_lengths=()):
+    """
+    Keys under which url_pattern_keys indexes the patterns that may match
+    url, prefix_lengths being the lengths of the indexed prefixes.
+    """
+    keys = set()
+    lower_url = url.lower()
+    for length in prefix_lengths:
+        keys.add(('prefix', lower_url[:length]))
+    mobj = re.match(r'(?:[a-z][a-z0-9+.-]*:)?//', lower_url)
+    for start in set((0, mobj.end() if mobj else 0)):
+        for index, delimiters in (('/', r'[^/]*'), ('/?#', r'[^/?#]*')):
+            labels = re.match(delimiters, lower_url[start:]).group(0).split('.')
+            for i in range(len(labels)):
+                keys.add((index, '.'.join(labels[i:])))
+    return keys
+
+
+class URLPatternIndex(object):
+    """
+    Index narrowing down which of a sequence of URL regular expressions may
+    match a URL, without trying each of them.
+
+    Patterns are looked up by host name or by literal prefix; the ones that
+    cannot be indexed are always returned as candidates.
+    """
+
+    def __init__(self, patterns=None, keys=None):
+        """
+        Index patterns, or the precomputed url_pattern_keys of a sequence of
+        patterns passed as keys instead, None standing for the patterns that
+        cannot be indexed.
+        """
+        if keys is None:
+            keys = [
+                url_pattern_keys(pattern) if pattern is not None else None
+                for pattern in patterns]
+        self._index = {}
+        self._unindexed = []
+        self._prefix_lengths = set()
+        self._count = len(keys)
+        for pos, pattern_keys in enumerate(keys):
+            if pattern_keys is None:
+                self._unindexed.append(pos)
+                continue
+            for key in pattern_keys:
+                self._index.setdefault(key, []).append(pos)
+                if key[0] == 'prefix':
+                    self._prefix_lengths.add(len(key[1]))
+
+    def candidates(self, url):
+        """Sorted positions of the patterns that may match url"""
+        if '\n' in url:
+            # "$" also matches before a trailing newline
+            return list(range(self._count))
+        positions = set(self._unindexed)
+        for key in url_dispatch_keys(url, self._prefix_lengths):
+            positions.update(self._index.get(key, ()))
+        return sorted(positions)
+
+
 class PagedList(object):
     def __len__(self):
         # This is only useful for tests
@@ -3770,47 +4727,67 @@ class OnDemandPagedList(PagedList):
         if use_cache:
             self._cache = {}
 
-    def getslice(self, start=0, end=None):
-        res = []
-        for pagenum in itertools.count(start // self._pagesize):
-            firstid = pagenum * self._pagesize
-            nextfirstid = pagenum * self._pagesize + self._pagesize
-            if start >= nextfirstid:
-                continue
+    def _get_page(self, pagenum):
+        page_results = None
+        if self._use_cache:
+            page_results = self._cache.get(pagenum)
+        if page_results is None:
+            page_results = list(self._pagefunc(pagenum))
+        if self._use_cache:
+            self._cache[pagenum] = page_results
+        return page_results
+
+    def getslice(self, start=0, end=None, workers=1):
+        """
+        Return the entries from start to end (excluded).
 
-            page_results = None
-            if self._use_cache:
-                page_results = self._cache.get(pagenum)
-            if page_results is None:
-                page_results = list(self._pagefunc(pagenum))
-            if self._use_cache:
-                self._cache[pagenum] = page_results
-
-            startv = (
-                start % self._pagesize
-                if firstid <= start < nextfirstid
-                else 0)
-
-            endv = (
-                ((end - 1) % self._pagesize) + 1
-                if (end is not None and firstid <= end <= nextfirstid)
-                else None)
-
-            if startv != 0 or endv is not None:
-                page_results = page_results[startv:endv]
-            res.extend(page_results)
-
-            # A little optimization - if current page is not "full", ie. does
-            # not contain page_size videos then we can assume that this page
-            # is the last one - there are no more ids on further pages -
-            # i.e. no need to query again.
-            if len(page_results) + startv < self._pagesize:
-                break
+        With workers > 1 up to workers pages following the one being
+        processed are fetched in parallel in background threads. Since the
+        number of pages is not known, up to workers pages past the last one
+        may be requested in vain.
+        """
+        res = []
+        first_pagenum = start // self._pagesize
+        if end is None:
+            pagenums = itertools.count(first_pagenum)
+        else:
+            pagenums = range(first_pagenum, max(first_pagenum, (end - 1) // self._pagesize) + 1)
+        if workers > 1:
+            pages = ordered_parallel_map(self._get_page, pagenums, workers, lookahead=workers)
+        else:
+            pages = (self._get_page(pagenum) for pagenum in pagenums)
+        try:
+            for pagenum, page_results in enumerate(pages, first_pagenum):
+                firstid = pagenum * self._pagesize
+                nextfirstid = pagenum * self._pagesize + self._pagesize
+
+                startv = (
+                    start % self._pagesize
+                    if firstid <= start < nextfirstid
+                    else 0)
+
+                endv = (
+                    ((end - 1) % self._pagesize) + 1
+                    if (end is not None and firstid <= end <= nextfirstid)
+                    else None)
+
+                if startv != 0 or endv is not None:
+                    page_results = page_results[startv:endv]
+                res.extend(page_results)
+
+                # A little optimization - if current page is not "full", ie. does
+                # not contain page_size videos then we can assume that this page
+                # is the last one - there are no more ids on further pages -
+                # i.e. no need to query again.
+                if len(page_results) + startv < self._pagesize:
+                    break
 
-            # If we got the whole page, but the next page is not interesting,
-            # break out early as well
-            if end == nextfirstid:
-                break
+                # If we got the whole page, but the next page is not interesting,
+                # break out early as well
+                if end == nextfirstid:
+                    break
+        finally:
+            pages.close()
         return res
 
 
@@ -3820,29 +4797,134 @@ class InAdvancePagedList(PagedList):
         self._pagecount = pagecount
         self._pagesize = pagesize
 
-    def getslice(self, start=0, end=None):
+    def _get_page(self, pagenum):
+        return list(self._pagefunc(pagenum))
+
+    def getslice(self, start=0, end=None, workers=1):
+        """
+        Return the entries from start to end (excluded).
+
+        With workers > 1 the pages are fetched by as many background threads,
+        in parallel.
+        """
         res = []
         start_page = start // self._pagesize
         end_page = (
             self._pagecount if end is None else (end // self._pagesize + 1))
         skip_elems = start - start_page * self._pagesize
         only_more = None if end is None else end - start
-        for pagenum in range(start_page, end_page):
-            page = list(self._pagefunc(pagenum))
-            if skip_elems:
-                page = page[skip_elems:]
-                skip_elems = None
-            if only_more is not None:
-                if len(page) < only_more:
-                    only_more -= len(page)
-                else:
-                    page = page[:only_more]
-                    res.extend(page)
-                    break
-            res.extend(page)
+        pagenums = range(start_page, end_page)
+        if workers > 1:
+            pages = ordered_parallel_map(self._get_page, pagenums, workers)
+        else:
+            pages = (self._get_page(pagenum) for pagenum in pagenums)
+        try:
+            for page in pages:
+                if skip_elems:
+                    page = page[skip_elems:]
+                    skip_elems = None
+                if only_more is not None:
+                    if len(page) < only_more:
+                        only_more -= len(page)
+                    else:
+                        page = page[:only_more]
+                        res.extend(page)
+                        break
+                res.extend(page)
+        finally:
+            pages.close()
         return res
 
 
+class FragmentSequence(object):
+    """
+    Sequence of fragment dicts expanded from a location template on access
+
+    template is a %-style template of the fragment location, filled in
+    with the Number, Time and Bandwidth keys. timeline is a list of
+    (number, time, duration, count) runs of count fragments, each of them
+    duration long (in timescale units), the first one having the given
+    number and start time. location_key is the fragment key the location
+    is stored in, 'url' or 'path'.
+
+    Only the runs are kept, so a long stream takes as much memory as its
+    manifest; list + sequence puts the fragments of list first. Pass
+    json_default as the default of json.dump(s) to serialize it as a list.
+    """
+
+    def __init__(self, template, timeline, timescale=1, bandwidth=None,
+                 location_key='url', prefix=None):
+        self.template = template
+        self.timeline = timeline
+        self.timescale = timescale
+        self.bandwidth = bandwidth
+        self.location_key = location_key
+        self.prefix = prefix or []
+        self._offsets = []
+        count = 0
+        for run in timeline:
+            self._offsets.append(count)
+            count += run[3]
+        self._count = count
+
+    def _fragment(self, run, i):
+        number, time_, duration, count = run
+        return {
+            self.location_key: self.template % {
+                'Number': number + i,
+                'Time': time_ + (duration or 0) * i,
+                'Bandwidth': self.bandwidth,
+            },
+            'duration': float_or_none(duration, self.timescale),
+        }
+
+    def __len__(self):
+        return len(self.prefix) + self._count
+
+    def __iter__(self):
+        for fragment in self.prefix:
+            yield fragment
+        for run in self.timeline:
+            for i in range(run[3]):
+                yield self._fragment(run, i)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError('fragment index out of range')
+        if idx < len(self.prefix):
+            return self.prefix[idx]
+        idx -= len(self.prefix)
+        run_idx = bisect.bisect_right(self._offsets, idx) - 1
+        return self._fragment(self.timeline[run_idx], idx - self._offsets[run_idx])
+
+    def __radd__(self, other):
+        return FragmentSequence(
+            self.template, self.timeline, self.timescale, self.bandwidth,
+            self.location_key, list(other) + self.prefix)
+
+    def __eq__(self, other):
+        if not isinstance(other, (list, FragmentSequence)):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        eq = self.__eq__(other)
+        return eq if eq is NotImplemented else not eq
+
+    __hash__ = None
+
+
+def json_default(obj):
+    """ default of json.dump(s) for the lazy sequences of info dicts """
+    if isinstance(obj, FragmentSequence):
+        return list(obj)
+    raise TypeError('%r is not JSON serializable' % obj)
+
+
 def uppercase_escape(s):
     unicode_escape = codecs.getdecoder('unicode_escape')
     return re.sub(